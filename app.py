@@ -1,6 +1,13 @@
 import streamlit as st
 from pathlib import Path
 from inputs import FileUploadInput, LocalDirectoryInput, WebMediaInput
+from inputs.file_upload import (
+    CLOUD_UPLOADS_DIR, get_job_scheduler, get_media_prober, get_media_server, get_upload_catalog,
+    get_upload_store, media_url, render_audio, render_video, thumbnail_source
+)
+from inputs.pdf_viewer import render_pdf_viewer
+from inputs.text_viewer import open_text_document, render_text_viewer
+from storage.api import content_removed
 
 # Page configuration
 st.set_page_config(
@@ -11,17 +18,23 @@ st.set_page_config(
 
 import os
 import json
+import math
+from datetime import timedelta
 
 # Directory for cloud uploads
-CLOUD_UPLOADS_DIR = Path(__file__).parent / "cloud_uploads"
 CLOUD_UPLOADS_DIR.mkdir(exist_ok=True)
 
+# Start the media server (and its /api/ routes) with the first script run
+get_media_server()
+# Probe stored files for duration, resolution and codecs in the background
+get_media_prober()
+
 # Handle API requests via query parameters
 api_action = st.query_params.get("api")
 
 if api_action == "delete":
     # Admin-only delete file API endpoint
-    filename = st.query_params.get("filename")
+    filenames = st.query_params.get_all("filename")
     admin_token = st.query_params.get("admin", "")
     
     # Verify admin access
@@ -34,29 +47,42 @@ if api_action == "delete":
         st.json({"status": "error", "message": "Unauthorized: Admin token not configured"})
         st.stop()
     
-    if not filename:
+    if not filenames:
         st.json({"status": "error", "message": "Missing required parameter: filename"})
         st.stop()
-    
-    # Delete the file
-    file_path = CLOUD_UPLOADS_DIR / filename
-    
-    if file_path.exists() and file_path.is_file():
-        try:
-            file_path.unlink()
+
+    if len(filenames) > 1:
+        # Repeated filename parameters are deleted as one batch
+        outcome = get_upload_store().delete_many(filenames)
+        deleted = [r["name"] for r in outcome["deleted"] if r["name"] not in outcome["errors"]]
+        st.json({
+            "status": "partial" if outcome["missing"] or outcome["errors"] else "success",
+            "deleted": deleted,
+            "not_found": outcome["missing"],
+            "errors": outcome["errors"],
+            "elapsed_ms": round(outcome["elapsed"] * 1000, 1)
+        })
+        st.stop()
+
+    # Delete the file; shared content is kept until its last name is deleted
+    filename = filenames[0]
+    try:
+        record = get_upload_store().delete(filename)
+        if record is not None:
             st.json({
                 "status": "success",
-                "message": f"File '{filename}' deleted successfully"
+                "message": f"File '{filename}' deleted successfully",
+                "content_removed": content_removed(record)
             })
-        except Exception as e:
+        else:
             st.json({
                 "status": "error",
-                "message": f"Failed to delete file: {str(e)}"
+                "message": f"File '{filename}' not found"
             })
-    else:
+    except Exception as e:
         st.json({
             "status": "error",
-            "message": f"File '{filename}' not found"
+            "message": f"Failed to delete file: {str(e)}"
         })
     
     st.stop()
@@ -125,6 +151,8 @@ with st.sidebar:
     if is_admin:
         st.markdown("---")
         st.markdown("### 📂 Admin")
+        snapshot = get_upload_catalog().snapshot
+        st.caption(f"{snapshot.files} file(s), {snapshot.bytes / (1024 ** 3):.2f} GB stored")
         if st.button("Browse files", use_container_width=True):
             st.session_state.show_file_browser = True
 
@@ -136,75 +164,539 @@ with st.sidebar:
     st.markdown("**Document:** PDF, MD, TXT")
 
 
+# Sort choices offered by the file browser, mapped to index columns
+BROWSER_SORT_OPTIONS = {
+    "Newest first": ("uploaded_at", True),
+    "Oldest first": ("uploaded_at", False),
+    "Name (A-Z)": ("name", False),
+    "Name (Z-A)": ("name", True),
+    "Largest first": ("size", True),
+    "Smallest first": ("size", False),
+}
+BROWSER_PAGE_SIZES = [25, 50, 100, 200]
+BROWSER_MEDIA_TYPES = ["All", "Video", "Audio", "Image", "Document", "Unknown"]
+# Minimum picture heights offered by the resolution filter
+BROWSER_MIN_HEIGHTS = {"Any": None, "480p+": 480, "720p+": 720, "1080p+": 1080, "2160p+": 2160}
+# Seconds between checks for uploads changed by other sessions or on disk
+CATALOG_CHECK_SECONDS = 2
+# Seconds between refreshes of background job progress in the file browser
+JOB_PROGRESS_SECONDS = 2
+# Active and failed jobs listed in the jobs panel
+JOB_LIST_LIMIT = 20
+
+
+def _watch_catalog(catalog):
+    """Rerun the app once the shared catalog has moved past the rendered version."""
+    if st.session_state.get("catalog_version", catalog.version) != catalog.version:
+        st.rerun()
+
+
+# Fragments (Streamlit 1.37+) poll without rerunning the page; older versions
+# simply show other sessions' changes on the next interaction
+if hasattr(st, "fragment"):
+    _watch_catalog = st.fragment(run_every=CATALOG_CHECK_SECONDS)(_watch_catalog)
+
+
+def _toggle_browser_item(filename):
+    """Open a file browser entry, or close it if it is already open."""
+    if st.session_state.get("browser_open") == filename:
+        st.session_state.browser_open = None
+    else:
+        st.session_state.browser_open = filename
+
+
+def _change_browser_page(delta):
+    """Move the file browser forward or back by a number of pages."""
+    st.session_state.browser_page = max(1, st.session_state.get("browser_page", 1) + delta)
+
+
+def _toggle_browser_selection(filename):
+    """Add or remove a file browser entry from the multi-selection."""
+    selected = st.session_state.setdefault("browser_selected", set())
+    if st.session_state.get(f"select_{filename}"):
+        selected.add(filename)
+    else:
+        selected.discard(filename)
+
+
+def _set_browser_selection(filenames, selected):
+    """Select or deselect several file browser entries at once."""
+    selection = st.session_state.setdefault("browser_selected", set())
+    for filename in filenames:
+        if selected:
+            selection.add(filename)
+        else:
+            selection.discard(filename)
+        # Let the checkbox pick up its new value on the next run
+        st.session_state.pop(f"select_{filename}", None)
+
+
+def _delete_browser_files(filenames):
+    """Delete several files in one batch and keep a report for the next run."""
+    outcome = get_upload_store().delete_many(filenames)
+    deleted = {record["name"] for record in outcome["deleted"]}
+    _set_browser_selection(deleted | set(outcome["missing"]), False)
+    if st.session_state.get("browser_open") in deleted:
+        st.session_state.browser_open = None
+    st.session_state.browser_delete_report = outcome
+
+
+def _delete_browser_matching(filters):
+    """Delete every file matching the browser's current filters."""
+    names = [record["name"] for record in get_upload_store().index.query(**filters)]
+    _delete_browser_files(names)
+    st.session_state.browser_confirm_matching = False
+
+
+def render_delete_report():
+    """Show the outcome of the last batch delete, once."""
+    outcome = st.session_state.pop("browser_delete_report", None)
+    if outcome is None:
+        return
+    deleted = len(outcome["deleted"]) - len(outcome["errors"])
+    st.success(f"🗑️ Deleted {deleted} file(s) in {outcome['elapsed'] * 1000:.0f} ms")
+    if outcome["missing"] or outcome["errors"]:
+        with st.expander(f"{len(outcome['missing']) + len(outcome['errors'])} file(s) not deleted"):
+            for name in outcome["missing"]:
+                st.caption(f"{name}: not found")
+            for name, error in outcome["errors"].items():
+                st.caption(f"{name}: {error}")
+
+
+def _format_bytes(size):
+    """Format a byte count as MB or GB."""
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:.2f} GB"
+    return f"{size / 1024 ** 2:.1f} MB"
+
+
+def render_quota_panel(quota):
+    """Show storage quota usage and counters, with manual eviction controls."""
+    stats = quota.stats()
+    limit = _format_bytes(stats["max_bytes"]) if stats["max_bytes"] else "unlimited"
+    with st.expander(f"💾 Storage: {_format_bytes(stats['used_bytes'])} of {limit}"):
+        if stats["max_bytes"]:
+            st.progress(min(1.0, stats["used_bytes"] / stats["max_bytes"]))
+        col_files, col_bytes, col_rejected = st.columns(3)
+        with col_files:
+            st.metric("Evicted files", stats["evicted_files"])
+        with col_bytes:
+            st.metric("Evicted", _format_bytes(stats["evicted_bytes"]))
+        with col_rejected:
+            st.metric("Rejected uploads", stats["rejected_uploads"])
+        st.caption(
+            f"Policy: {stats['policy']}; per-file limit: "
+            f"{_format_bytes(stats['max_file_bytes']) if stats['max_file_bytes'] else 'none'}; "
+            "pinned files are never evicted"
+        )
+        if not stats["max_bytes"]:
+            return
+
+        target_mb = st.number_input(
+            "Evict down to (MB)", min_value=0.0, key="quota_target_mb",
+            value=float(int(stats["max_bytes"] * 0.85 / 1024 ** 2)),
+        )
+        col_preview, col_evict = st.columns(2)
+        with col_preview:
+            if st.button("🔍 Preview eviction", key="quota_dry_run", use_container_width=True):
+                plan = quota.evict(target_bytes=int(target_mb * 1024 ** 2), dry_run=True)
+                st.caption(f"Would evict {len(plan['files'])} file(s), freeing "
+                           f"{_format_bytes(plan['freed_bytes'])}")
+                if plan["files"]:
+                    st.code("\n".join(plan["files"][:200]), language=None)
+        with col_evict:
+            if st.button("🧹 Evict now", key="quota_evict", use_container_width=True):
+                result = quota.evict(target_bytes=int(target_mb * 1024 ** 2))
+                st.session_state.quota_evict_report = result
+                st.rerun()
+        report = st.session_state.pop("quota_evict_report", None)
+        if report is not None:
+            st.success(f"Evicted {len(report['files'])} file(s), freeing "
+                       f"{_format_bytes(report['freed_bytes'])}")
+
+
+def _format_seconds(seconds):
+    """Format a latency in seconds, or a dash if there is none yet."""
+    if seconds is None:
+        return "–"
+    return f"{seconds * 1000:.0f} ms" if seconds < 1 else f"{seconds:.1f} s"
+
+
+def _render_job_progress(scheduler):
+    """Show queue metrics, progress of active jobs and recent failures."""
+    metrics = scheduler.metrics()
+    col_queued, col_running, col_failed, col_wait, col_run = st.columns(5)
+    with col_queued:
+        st.metric("Queued", metrics["queued"])
+    with col_running:
+        st.metric("Running", f"{metrics['running']} / {metrics['workers']}")
+    with col_failed:
+        st.metric("Failed", metrics["failed"])
+    with col_wait:
+        st.metric("Wait p95", _format_seconds(metrics["wait_p95_seconds"]))
+    with col_run:
+        st.metric("Run p95", _format_seconds(metrics["run_p95_seconds"]))
+    if metrics["oldest_queued_seconds"]:
+        st.caption(f"Oldest queued job has waited {_format_seconds(metrics['oldest_queued_seconds'])}")
+
+    for job in scheduler.jobs(status=("queued", "running"), limit=JOB_LIST_LIMIT):
+        label = f"{job['kind']} · {job['target']}"
+        if job["status"] == "queued":
+            label += " (queued" + (f", retry {job['attempts'] + 1}" if job["attempts"] else "") + ")"
+        elif job["message"]:
+            label += f" — {job['message']}"
+        st.progress(job["progress"], text=label)
+
+    failed = scheduler.jobs(status="failed", limit=JOB_LIST_LIMIT)
+    if failed:
+        st.caption("Recent failures")
+        for job in failed:
+            st.text(f"{job['kind']} · {job['target']}: {job['message']}")
+        if st.button("🔁 Retry failed jobs", key="jobs_retry_failed"):
+            st.toast(f"Queued {scheduler.retry_failed()} job(s) again")
+
+
+# Progress refreshes in place while the panel is open (Streamlit 1.37+)
+if hasattr(st, "fragment"):
+    _render_job_progress = st.fragment(run_every=JOB_PROGRESS_SECONDS)(_render_job_progress)
+
+
+def _format_duration(seconds):
+    """Format a media duration as H:MM:SS or M:SS."""
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def render_probe_panel(store, prober, total):
+    """Show how many files have been probed for duration, resolution and codecs."""
+    summary = store.index.media_info_summary()
+    with st.expander(f"🔎 Media info: {summary['probed']} of {total} files probed"):
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Mislabelled", summary["mismatched"],
+                      help="Content does not match the file extension, so playback may fail")
+        with col2:
+            st.metric("Unreadable", summary["failed"])
+        with col3:
+            st.metric("Total duration", _format_duration(summary["duration"]))
+        with col4:
+            st.metric("Probe time", f"{prober.stats()['ms_per_file']:.2f} ms/file")
+
+
+def render_jobs_panel(scheduler):
+    """Show background jobs deriving assets from uploads."""
+    metrics = scheduler.metrics()
+    with st.expander(f"⚙️ Background jobs: {metrics['queued']} queued, {metrics['running']} running"):
+        _render_job_progress(scheduler)
+
+
+def render_file_details(store, file_info):
+    """Render the preview and actions for the opened file browser entry."""
+    filename = file_info["name"]
+    store.touch(filename)
+    # Derived assets of the file being viewed are generated first
+    scheduler = get_job_scheduler()
+    scheduler.boost(file_info)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        size_mb = file_info["size"] / (1024 * 1024)
+        st.metric("Size", f"{size_mb:.2f} MB")
+    with col2:
+        st.metric("Type", file_info["type"])
+    with col3:
+        uploaded_at = file_info.get("uploaded_at", "Unknown")
+        if uploaded_at != "Unknown":
+            # Format datetime nicely
+            uploaded_at = uploaded_at.split("T")[0]
+        st.metric("Uploaded", uploaded_at)
+    info = store.index.media_info([filename]).get(filename)
+    if info and info["mismatched"]:
+        st.warning(
+            f"The content looks like {(info['format'] or 'an unknown format').upper()}, which does not "
+            f"match the file extension; it may not play or open correctly"
+        )
+    if info and (info["duration"] or info["width"]):
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Duration", _format_duration(info["duration"]) if info["duration"] else "–")
+        with col2:
+            st.metric("Resolution", f"{info['width']}×{info['height']}" if info["width"] else "–")
+        with col3:
+            codecs = " / ".join(c for c in (info["video_codec"], info["audio_codec"]) if c)
+            st.metric("Codecs", codecs or "–")
+        with col4:
+            st.metric("Bitrate", f"{info['bitrate'] / 1000:,.0f} kbit/s" if info["bitrate"] else "–")
+    jobs = scheduler.jobs_for(file_info)
+    if jobs:
+        st.caption(" · ".join(
+            f"⚙️ {kind}: {job['status']}" + (f" {job['progress']:.0%}" if job["status"] == "running" else "")
+            for kind, job in jobs.items()
+        ))
+    
+    # Preview based on file type
+    file_path = Path(file_info["path"])
+    if not file_path.exists():
+        st.warning("File content is missing from storage")
+        return
+
+    # Stored content is named by digest, so use the file name's extension
+    file_ext = Path(filename).suffix.lower()
+    
+    # Players stream from the media server rather than embedding bytes
+    if file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
+        # Cached downscaled preview, with a link to the full-resolution file
+        st.image(thumbnail_source(file_info), use_container_width=True)
+        original_url = media_url(filename)
+        if original_url:
+            st.markdown(f"[🔍 View original]({original_url})")
+    elif file_ext in ['.mp4', '.webm', '.ogg', '.mov', '.avi', '.mkv']:
+        # MOV/AVI/MKV play from their converted rendition once it is ready
+        render_video(file_info)
+    elif file_ext in ['.mp3', '.wav', '.m4a', '.flac']:
+        # Drawn over precomputed waveform peaks once they are ready
+        render_audio(file_info)
+    elif file_ext == '.pdf' and media_url(filename):
+        render_pdf_viewer(media_url(filename))
+    elif file_ext in ['.txt', '.md']:
+        document = open_text_document(str(file_path), file_info["size"], file_info["mtime"])
+        render_text_viewer(document, key=f"browser_text_{filename}", markdown=file_ext == '.md')
+    
+    # Download, Delete and Pin buttons
+    col_btn1, col_btn2, col_btn3 = st.columns(3)
+    with col_btn1:
+        # Streamed, resumable download; the file is only read when clicked
+        download_url = media_url(filename, download=True)
+        if download_url:
+            st.link_button("⬇️ Download", download_url, use_container_width=True)
+        else:
+            with open(file_path, "rb") as f:
+                st.download_button(
+                    label="⬇️ Download",
+                    data=f.read(),
+                    file_name=filename,
+                    use_container_width=True
+                )
+    with col_btn2:
+        if st.button("🗑️ Delete", key=f"delete_{filename}", use_container_width=True):
+            # Only removes the stored content if no other name uses it
+            try:
+                store.delete(filename)
+                st.session_state.browser_open = None
+                st.success(f"Deleted {filename}")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Failed to delete: {str(e)}")
+    with col_btn3:
+        # Pinned files are never evicted to make room under the storage quota
+        pinned = bool(file_info["pinned"])
+        if st.button("📍 Unpin" if pinned else "📌 Pin", key=f"pin_{filename}", use_container_width=True):
+            store.index.set_pinned(filename, not pinned)
+            st.rerun()
+
+    # Renaming only updates the index; the content is not rewritten
+    col_name, col_rename = st.columns([3, 1])
+    with col_name:
+        new_name = st.text_input(
+            "New name",
+            value=filename,
+            key=f"rename_input_{filename}",
+            label_visibility="collapsed"
+        )
+    with col_rename:
+        if st.button("✏️ Rename", key=f"rename_{filename}", use_container_width=True):
+            if new_name and new_name != filename:
+                try:
+                    store.rename(filename, new_name)
+                    st.session_state.browser_open = new_name
+                    st.rerun()
+                except FileExistsError:
+                    st.error(f"A file named '{new_name}' already exists")
+                except Exception as e:
+                    st.error(f"Failed to rename: {str(e)}")
+
+
 # Function to render file browser
 def render_file_browser():
-    """Render the admin file browser UI."""
+    """Render the admin file browser UI.
+
+    Filtering, sorting and paging happen in the upload index, so each rerun
+    only fetches one page of entries. Previews are rendered for the opened
+    entry only. The view refreshes itself when uploads change in another
+    session or on disk.
+    """
     st.subheader("📂 Uploaded Files")
     
-    cloud_files = st.session_state.get("cloud_files", {})
+    store = get_upload_store()
+    catalog = get_upload_catalog()
+    snapshot = catalog.snapshot
+    st.session_state.catalog_version = snapshot.version
+    _watch_catalog(catalog)
+    total = snapshot.files
     
-    if not cloud_files:
+    if not total:
         st.info("No files uploaded yet.")
         return
     
-    st.success(f"📁 {len(cloud_files)} file(s) available")
+    # Search, filter and sort controls
+    col_search, col_type, col_sort, col_page_size = st.columns([3, 1, 1, 1])
+    with col_search:
+        search = st.text_input("Search", placeholder="Filter by file name", key="browser_search")
+    with col_type:
+        media_type = st.selectbox("Type", BROWSER_MEDIA_TYPES, key="browser_type")
+    with col_sort:
+        sort_label = st.selectbox("Sort", list(BROWSER_SORT_OPTIONS), key="browser_sort")
+    with col_page_size:
+        page_size = st.selectbox("Per page", BROWSER_PAGE_SIZES, key="browser_page_size")
+
+    with st.expander("More filters"):
+        col_min, col_max, col_dates = st.columns(3)
+        with col_min:
+            min_mb = st.number_input("Min size (MB)", min_value=0.0, value=0.0, key="browser_min_mb")
+        with col_max:
+            max_mb = st.number_input(
+                "Max size (MB)", min_value=0.0, value=0.0, key="browser_max_mb",
+                help="0 means no limit"
+            )
+        with col_dates:
+            date_range = st.date_input("Uploaded between", value=(), key="browser_dates")
+        pattern = st.text_input(
+            "Name pattern", placeholder="e.g. *.tmp or clip-2023-*", key="browser_pattern",
+            help="Shell-style wildcards matched against the whole file name (case-sensitive)"
+        )
+        # These use probed media info, so files not probed yet never match
+        col_min_len, col_max_len, col_height, col_codec = st.columns(4)
+        with col_min_len:
+            min_seconds = st.number_input("Min duration (s)", min_value=0, value=0, key="browser_min_seconds")
+        with col_max_len:
+            max_seconds = st.number_input(
+                "Max duration (s)", min_value=0, value=0, key="browser_max_seconds",
+                help="0 means no limit"
+            )
+        with col_height:
+            min_height = st.selectbox("Resolution", list(BROWSER_MIN_HEIGHTS), key="browser_min_height")
+        with col_codec:
+            codec = st.text_input("Codec", placeholder="e.g. h264 or aac", key="browser_codec")
+        mismatched = st.checkbox(
+            "Only files whose content does not match their extension", key="browser_mismatched"
+        )
+
+    filters = {
+        "search": search.strip() or None,
+        "pattern": pattern.strip() or None,
+        "media_type": None if media_type == "All" else media_type,
+        "min_size": int(min_mb * 1024 * 1024) if min_mb else None,
+        "max_size": int(max_mb * 1024 * 1024) if max_mb else None,
+        "min_duration": min_seconds or None,
+        "max_duration": max_seconds or None,
+        "min_height": BROWSER_MIN_HEIGHTS[min_height],
+        "codec": codec.strip().lower() or None,
+        "mismatched": True if mismatched else None,
+    }
+    if len(date_range) == 2:
+        filters["uploaded_after"] = date_range[0].isoformat()
+        filters["uploaded_before"] = (date_range[1] + timedelta(days=1)).isoformat()
+
+    # Go back to the first page whenever the listing changes
+    signature = (tuple(sorted(filters.items())), sort_label, page_size)
+    if st.session_state.get("browser_filters") != signature:
+        st.session_state.browser_filters = signature
+        st.session_state.browser_page = 1
+
+    matching = store.index.count(**filters)
+    pages = max(1, math.ceil(matching / page_size))
+    page = min(st.session_state.get("browser_page", 1), pages)
+    st.session_state.browser_page = page
+
+    st.success(f"📁 {total} file(s) available, {matching} matching")
+    render_delete_report()
+    render_quota_panel(store.quota)
+    render_jobs_panel(get_job_scheduler())
+    render_probe_panel(store, get_media_prober(), total)
     
-    # Sort files by timestamp in reverse order (newest first)
-    sorted_files = sorted(
-        cloud_files.items(),
-        key=lambda x: x[1].get("uploaded_at", ""),
-        reverse=True
+    sort, descending = BROWSER_SORT_OPTIONS[sort_label]
+    entries = store.index.query(
+        offset=(page - 1) * page_size,
+        limit=page_size,
+        sort=sort,
+        descending=descending,
+        **filters
     )
-    
-    for filename, file_info in sorted_files:
-        with st.expander(f"📄 {filename}", expanded=False):
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                size_mb = file_info["size"] / (1024 * 1024)
-                st.metric("Size", f"{size_mb:.2f} MB")
-            with col2:
-                st.metric("Type", file_info["type"])
-            with col3:
-                uploaded_at = file_info.get("uploaded_at", "Unknown")
-                if uploaded_at != "Unknown":
-                    # Format datetime nicely
-                    uploaded_at = uploaded_at.split("T")[0]
-                st.metric("Uploaded", uploaded_at)
-            
-            # Preview based on file type
-            file_path = Path(file_info["path"])
-            if file_path.exists():
-                file_ext = file_path.suffix.lower()
-                
-                if file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
-                    st.image(str(file_path), use_container_width=True)
-                elif file_ext in ['.mp4', '.webm', '.ogg']:
-                    st.video(str(file_path))
-                elif file_ext in ['.mp3', '.wav', '.m4a', '.flac']:
-                    st.audio(str(file_path))
-                
-                # Download and Delete buttons
-                col_btn1, col_btn2 = st.columns(2)
-                with col_btn1:
-                    with open(file_path, "rb") as f:
-                        st.download_button(
-                            label="⬇️ Download",
-                            data=f.read(),
-                            file_name=filename,
-                            use_container_width=True
-                        )
-                with col_btn2:
-                    if st.button("🗑️ Delete", key=f"delete_{filename}", use_container_width=True):
-                        # Delete the file
-                        try:
-                            file_path.unlink()
-                            # Remove from session state
-                            if filename in st.session_state.cloud_files:
-                                del st.session_state.cloud_files[filename]
-                            st.success(f"Deleted {filename}")
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Failed to delete: {str(e)}")
+
+    # Batch actions on the multi-selection or on everything matching the filters
+    selected = st.session_state.setdefault("browser_selected", set())
+    page_names = [file_info["name"] for file_info in entries]
+    col_select, col_clear, col_delete = st.columns(3)
+    with col_select:
+        st.button("☑️ Select page", key="browser_select_page", on_click=_set_browser_selection,
+                  args=(page_names, True), use_container_width=True)
+    with col_clear:
+        st.button("✖️ Clear selection", key="browser_clear_selection", disabled=not selected,
+                  on_click=_set_browser_selection, args=(list(selected), False),
+                  use_container_width=True)
+    with col_delete:
+        st.button(f"🗑️ Delete selected ({len(selected)})", key="browser_delete_selected",
+                  disabled=not selected, on_click=_delete_browser_files, args=(list(selected),),
+                  use_container_width=True)
+    if any(value is not None for value in filters.values()):
+        col_confirm, col_delete_matching = st.columns([2, 1])
+        with col_confirm:
+            confirmed = st.checkbox(
+                f"Confirm deleting all {matching} matching file(s)", key="browser_confirm_matching"
+            )
+        with col_delete_matching:
+            st.button(f"🗑️ Delete {matching} matching", key="browser_delete_matching",
+                      disabled=not (confirmed and matching), on_click=_delete_browser_matching,
+                      args=(filters,), use_container_width=True)
+
+    media_info = store.index.media_info(page_names)
+    opened = st.session_state.get("browser_open")
+    for file_info in entries:
+        filename = file_info["name"]
+        col_check, col_name, col_size, col_type, col_date, col_open = st.columns([0.4, 5, 1, 1, 1, 1])
+        with col_check:
+            st.checkbox(
+                "Select",
+                value=filename in selected,
+                key=f"select_{filename}",
+                on_change=_toggle_browser_selection,
+                args=(filename,),
+                label_visibility="collapsed"
+            )
+        with col_name:
+            st.text(f"{'📌' if file_info['pinned'] else '📄'} {filename}")
+        with col_size:
+            st.caption(f"{file_info['size'] / (1024 * 1024):.2f} MB")
+        with col_type:
+            info = media_info.get(filename)
+            label = file_info["type"]
+            if info and info["duration"]:
+                label += f" · {_format_duration(info['duration'])}"
+            st.caption(f"⚠️ {label}" if info and info["mismatched"] else label)
+        with col_date:
+            st.caption(file_info["uploaded_at"].split("T")[0])
+        with col_open:
+            st.button(
+                "Close" if filename == opened else "Open",
+                key=f"open_{filename}",
+                on_click=_toggle_browser_item,
+                args=(filename,),
+                use_container_width=True
+            )
+        if filename == opened:
+            render_file_details(store, file_info)
+            st.markdown("---")
+
+    # Pagination controls
+    col_prev, col_status, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        st.button("← Previous", key="browser_prev", disabled=page <= 1,
+                  on_click=_change_browser_page, args=(-1,), use_container_width=True)
+    with col_status:
+        st.caption(f"Page {page} of {pages}")
+    with col_next:
+        st.button("Next →", key="browser_next", disabled=page >= pages,
+                  on_click=_change_browser_page, args=(1,), use_container_width=True)
 
 
 # Main content area
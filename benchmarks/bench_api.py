@@ -0,0 +1,91 @@
+"""Benchmark requests per second of the media server's JSON admin API.
+
+Starts a MediaServer on a temporary store and drives GET /api/files (one
+page), GET /api/files/<name> and DELETE /api/files/<name> from several
+keep-alive client threads.
+
+Usage:
+    python benchmarks/bench_api.py [--files 10000] [--clients 8] [--requests 2000]
+"""
+import argparse
+import http.client
+import io
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import API_PREFIX, MediaServer, UploadStore, api_route  # noqa: E402
+
+TOKEN = "bench-token"
+
+
+def populate(store, count):
+    """Store `count` small distinct files."""
+    for i in range(count):
+        store.save(io.BytesIO(f"content {i}".encode()), f"file-{i:06d}.mp4", "Video")
+
+
+def run(port, paths, method, clients):
+    """Issue one request per path, split across client threads.
+
+    Returns:
+        tuple: (requests per second, list of unexpected status codes)
+    """
+    errors = []
+
+    def worker(chunk):
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        headers = {"Authorization": f"Bearer {TOKEN}"}
+        for path in chunk:
+            conn.request(method, path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(paths[i::clients],)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(paths) / (time.perf_counter() - start), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = UploadStore(tmp)
+        populate(store, args.files)
+        server = MediaServer(
+            store, host="127.0.0.1", port=0, routes={API_PREFIX: api_route(lambda: TOKEN)}
+        ).start()
+        try:
+            names = [f"file-{i % args.files:06d}.mp4" for i in range(args.requests)]
+            cases = [
+                ("GET /api/files?limit=50", "GET", ["/api/files?limit=50"] * args.requests),
+                ("GET /api/files/<name>", "GET", [f"/api/files/{n}" for n in names]),
+                ("DELETE /api/files/<name>", "DELETE",
+                 [f"/api/files/{n}" for n in dict.fromkeys(names)]),
+            ]
+            print(f"{args.files} files, {args.clients} clients")
+            print(f"{'endpoint':<28} {'req/s':>9} {'errors':>7}")
+            for label, method, paths in cases:
+                rate, errors = run(server.port, paths, method, args.clients)
+                print(f"{label:<28} {rate:>9.0f} {len(errors):>7}")
+        finally:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark deleting many uploads one at a time versus in one batch.
+
+Each round fills a fresh store with distinct small files, then removes them
+either with one UploadStore.delete() per file (one index transaction and one
+unlink each) or with a single UploadStore.delete_many() call.
+
+Usage:
+    python benchmarks/bench_bulk_delete.py [--counts 1000,10000] [--workers 8]
+"""
+import argparse
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import UploadStore  # noqa: E402
+
+
+def populate(root, count):
+    """Return a store holding `count` distinct small files."""
+    store = UploadStore(root)
+    for i in range(count):
+        store.save(io.BytesIO(f"content {i}".encode()), f"file-{i:06d}.mp4", "Video")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", default="1000,10000")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'files':>7} {'one by one s':>13} {'batch s':>9} {'speedup':>8}")
+    for count in [int(c) for c in args.counts.split(",")]:
+        names = [f"file-{i:06d}.mp4" for i in range(count)]
+        with tempfile.TemporaryDirectory() as tmp:
+            store = populate(tmp, count)
+            start = time.perf_counter()
+            for name in names:
+                store.delete(name)
+            single = time.perf_counter() - start
+        with tempfile.TemporaryDirectory() as tmp:
+            store = populate(tmp, count)
+            outcome = store.delete_many(names, workers=args.workers)
+            assert len(outcome["deleted"]) == count and not outcome["errors"]
+            batch = outcome["elapsed"]
+        print(f"{count:>7} {single:>13.2f} {batch:>9.2f} {single / batch:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Measure the bytes Streamlit sends per rerun in Local Directory mode.
+
+Runs app.py headless with Streamlit's AppTest, once per revision, and
+captures the ForwardMsgs of a rerun. It reports the bytes of the whole
+rerun and of the Local Directory player's element, as serialized by the
+server and as sent once the browser holds the message in Streamlit's
+message cache (messages of global.minCachedMessageSize or more are then
+replaced by a reference to their hash). For revisions where the player is
+a static component, it also reports the assets a browser downloads once per
+version of the player.
+
+Revisions are taken from git ("worktree" is the working tree), e.g. the
+commit before the player became a static component and the current one:
+
+Usage:
+    python benchmarks/bench_component_payload.py [HEAD~1 worktree] [--json]
+"""
+import argparse
+import gzip
+import json
+import subprocess
+import sys
+import tarfile
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+COMPONENT = "inputs/local_directory_player"
+
+# Element types the player has been rendered as: inline HTML, then a declared component
+PLAYER_ELEMENTS = ("iframe", "component_instance")
+
+
+def measure(app_dir):
+    """Run the app twice in this process and measure the second run's messages."""
+    sys.path.insert(0, str(app_dir))
+    from streamlit.runtime.forward_msg_cache import create_reference_msg, populate_hash_if_needed
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    captured = []
+    forward_msgs = LocalScriptRunner.forward_msgs
+
+    def capture(self):
+        msgs = forward_msgs(self)
+        captured[:] = msgs
+        return msgs
+
+    LocalScriptRunner.forward_msgs = capture
+    at = AppTest.from_file(str(app_dir / "app.py"), default_timeout=120).run()
+    at.run()
+
+    result = {"rerun_bytes": 0, "rerun_cached_bytes": 0, "player_bytes": 0, "player_cached_bytes": 0}
+    for msg in captured:
+        size = msg.ByteSize()
+        populate_hash_if_needed(msg)
+        cached = create_reference_msg(msg).ByteSize() if msg.metadata.cacheable else size
+        result["rerun_bytes"] += size
+        result["rerun_cached_bytes"] += cached
+        if msg.WhichOneof("type") == "delta" and msg.delta.WhichOneof("type") == "new_element":
+            if msg.delta.new_element.WhichOneof("type") in PLAYER_ELEMENTS:
+                result["player_bytes"] += size
+                result["player_cached_bytes"] += cached
+    return result
+
+
+def asset_sizes(app_dir):
+    """Return the player's static files with their raw and gzipped sizes."""
+    root = app_dir / COMPONENT
+    if not root.is_dir():
+        return {}
+    return {
+        path.name: {"bytes": len(data), "gzip_bytes": len(gzip.compress(data))}
+        for path in sorted(root.iterdir()) if path.is_file()
+        for data in [path.read_bytes()]
+    }
+
+
+def checkout(rev, directory):
+    """Extract a git revision's tracked files into a directory."""
+    archive = subprocess.run(["git", "archive", rev], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(directory, filter="data")
+
+
+def run_revision(rev):
+    """Measure one revision in a fresh interpreter, so modules of different revisions never mix."""
+    with tempfile.TemporaryDirectory() as directory:
+        app_dir = ROOT
+        if rev != "worktree":
+            app_dir = Path(directory)
+            checkout(rev, app_dir)
+        output = subprocess.run(
+            [sys.executable, __file__, "--measure", str(app_dir)],
+            cwd=app_dir, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        result["assets"] = asset_sizes(app_dir)
+    result["revision"] = rev
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("revisions", nargs="*", default=["HEAD~1", "worktree"],
+                        help='git revisions to compare, "worktree" for the working tree')
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--measure", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure.resolve())))
+        return
+
+    results = [run_revision(rev) for rev in args.revisions]
+    if args.json:
+        print(json.dumps(results, indent=1))
+        return
+
+    print(f"{'revision':<12} {'rerun':>10} {'cached':>10} {'player':>10} {'cached':>10} {'assets once':>12} {'gzip':>10}")
+    for result in results:
+        assets = result["assets"].values()
+        print(
+            f"{result['revision']:<12} {result['rerun_bytes']:>10,} {result['rerun_cached_bytes']:>10,}"
+            f" {result['player_bytes']:>10,} {result['player_cached_bytes']:>10,}"
+            f" {sum(asset['bytes'] for asset in assets):>12,} {sum(asset['gzip_bytes'] for asset in assets):>10,}"
+        )
+    print("Bytes per rerun; 'cached' once the browser holds messages of 10 kB or more in Streamlit's message cache.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark the index work done by one admin file browser rerun.
+
+Compares the paginated browser (count + one page from the index) with the old
+approach of loading and sorting every entry, for growing numbers of files.
+
+Usage:
+    python benchmarks/bench_file_browser.py [--counts 100,1000,10000,100000] [--page-size 50]
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import UploadIndex  # noqa: E402
+
+MEDIA_TYPES = ["Video", "Audio", "Image", "Document"]
+EXTENSIONS = {"Video": ".mp4", "Audio": ".mp3", "Image": ".jpg", "Document": ".pdf"}
+
+
+def populate(index, count):
+    """Insert `count` synthetic records in a single transaction."""
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        media_type = random.choice(MEDIA_TYPES)
+        uploaded = start + timedelta(seconds=random.randint(0, 365 * 24 * 3600))
+        rows.append((
+            f"file-{i:06d}{EXTENSIONS[media_type]}", f"/blobs/{i:064x}",
+            random.randint(1024, 4 * 1024 ** 3), uploaded.timestamp(), media_type,
+            uploaded.isoformat(), f"{i:064x}",
+        ))
+    conn = sqlite3.connect(index.db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO files (name, path, size, mtime, media_type, uploaded_at, digest) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    conn.close()
+
+
+def time_call(func, repeat):
+    """Return the best wall time of `repeat` calls in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", default="100,1000,10000,100000")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    def paginated(index, **filters):
+        index.count()
+        index.count(**filters)
+        index.query(offset=0, limit=args.page_size, sort="uploaded_at", descending=True, **filters)
+
+    def load_all(index):
+        entries = index.query(sort="name", descending=False)
+        sorted(entries, key=lambda x: x.get("uploaded_at", ""), reverse=True)
+
+    print(f"{'files':>8} {'page ms':>9} {'type+size ms':>13} {'search ms':>10} {'load all ms':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in [int(c) for c in args.counts.split(",")]:
+            index = UploadIndex(Path(tmp) / f"index-{count}.sqlite3")
+            populate(index, count)
+            page = time_call(lambda: paginated(index), args.repeat)
+            filtered = time_call(
+                lambda: paginated(index, media_type="Video", min_size=1024 ** 3), args.repeat
+            )
+            search = time_call(lambda: paginated(index, search="file-0001"), args.repeat)
+            full = time_call(lambda: load_all(index), args.repeat)
+            print(f"{count:>8} {page:>9.2f} {filtered:>13.2f} {search:>10.2f} {full:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
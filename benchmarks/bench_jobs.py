@@ -0,0 +1,97 @@
+"""Benchmark throughput and queue latency of the background job scheduler.
+
+Queues one CPU-bound job per stored file and times how long the worker pool
+takes to drain the queue, for one worker and for one per core. Also measures
+how soon a high-priority job queued behind the backlog starts, the way a
+file someone opens jumps the queue.
+
+Usage:
+    python benchmarks/bench_jobs.py [--jobs 200] [--work 0.02] [--workers 1 4]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from processing import JobScheduler  # noqa: E402
+from storage import UploadStore  # noqa: E402
+
+
+def busy_job(record, params, progress):
+    """Keep a core busy for params["seconds"]."""
+    deadline = time.process_time() + params["seconds"]
+    while time.process_time() < deadline:
+        pass
+    return {"name": record["name"]}
+
+
+def wait_for(scheduler, predicate, poll=0.01):
+    """Poll the scheduler's metrics until predicate(metrics) holds."""
+    while True:
+        metrics = scheduler.metrics()
+        if predicate(metrics):
+            return metrics
+        time.sleep(poll)
+
+
+def run(workers, jobs, work):
+    """Drain `jobs` queued jobs with a pool of `workers` processes.
+
+    Returns:
+        dict: Jobs per second, metrics, and the start delay of an urgent job
+    """
+    # Workers import job functions by module name, which "__main__" is not
+    from bench_jobs import busy_job as job
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = UploadStore(tmp)
+        scheduler = JobScheduler(store, workers=workers)
+        scheduler.register("busy", job, params={"seconds": work})
+        records = []
+        for i in range(jobs + 1):
+            store.save(io.BytesIO(f"content {i}".encode()), f"file-{i:06d}.bin", "Other")
+            records.append(store.index.get(f"file-{i:06d}.bin"))
+
+        scheduler.start()
+        # Let every worker come up before timing
+        scheduler.submit("busy", records[-1], params={"seconds": 0})
+        wait_for(scheduler, lambda m: m["done"] == 1)
+
+        start = time.perf_counter()
+        for record in records[:-1]:
+            scheduler.submit("busy", record)
+        urgent = scheduler.submit("busy", records[-1], priority=1000)
+        queued_at = time.time()
+        metrics = wait_for(scheduler, lambda m: m["done"] == jobs + 2)
+        elapsed = time.perf_counter() - start
+        urgent_delay = scheduler.get(urgent)["started_at"] - queued_at
+        scheduler.stop()
+    return {"rate": (jobs + 1) / elapsed, "metrics": metrics, "urgent": urgent_delay}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--work", type=float, default=0.02, help="CPU seconds per job")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    print(f"{args.jobs} jobs of {args.work * 1000:.0f} ms CPU each")
+    print(f"{'workers':>8} {'jobs/s':>8} {'wait p50':>9} {'wait p95':>9} {'run p95':>8} {'urgent':>8}")
+    for workers in args.workers:
+        result = run(workers, args.jobs, args.work)
+        m = result["metrics"]
+        print(
+            f"{workers:>8} {result['rate']:>8.1f} {m['wait_p50_seconds'] * 1000:>7.0f}ms "
+            f"{m['wait_p95_seconds'] * 1000:>7.0f}ms {m['run_p95_seconds'] * 1000:>6.0f}ms "
+            f"{result['urgent'] * 1000:>6.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
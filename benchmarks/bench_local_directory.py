@@ -0,0 +1,202 @@
+"""Benchmark the Local Directory player's file list in a real browser.
+
+Builds a standalone page from the player's files with a harness that feeds it
+synthetic folder trees of 1k, 10k and 100k files. The page reports, per
+folder: the time to read and sort the selection, the time until the list
+first paints, the row elements in the DOM, scroll frame times from top to
+bottom, object URLs left alive after clicking through 50 files, and, where
+the player has a search box, the time from typing a query to its results.
+
+Pass --rev to benchmark the player as of another git revision, e.g. the
+commit before the list was virtualized, and compare the two pages. Revisions
+from before the player became a static component are read from the HTML
+string inlined in inputs/local_directory.py.
+
+Usage:
+    python benchmarks/bench_local_directory.py [--counts 1000 10000 100000] [--rev HEAD~1] [--open]
+"""
+import argparse
+import ast
+import json
+import re
+import subprocess
+import sys
+import tempfile
+import webbrowser
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SOURCE = "inputs/local_directory.py"
+COMPONENT = "inputs/local_directory_player"
+WORKERS = ["search-worker.js", "thumbnail-worker.js"]
+
+# Stands in for the component bootstrap: no Streamlit to talk to, and the
+# workers load from blobs since pages opened from disk cannot fetch files
+STANDALONE = """<script>
+const Streamlit = {setComponentValue() {}};
+const WORKER_SOURCES = __WORKERS__;
+const assetUrl = (name) => URL.createObjectURL(new Blob([WORKER_SOURCES[name]], {type: 'text/javascript'}));
+</script>
+<script>
+__PLAYER__
+</script>
+"""
+
+HARNESS = """
+<pre id="bench-results" style="position: fixed; top: 0; right: 0; margin: 0; padding: 8px;
+     background: rgba(0, 0, 0, 0.85); color: #0f0; font-size: 12px; z-index: 1000;">running…</pre>
+<script>
+(async () => {
+    const COUNTS = __COUNTS__;
+    const EXTENSIONS = ['jpg', 'png', 'mp4', 'mp3', 'txt'];
+    const QUERIES = ['i', 'img', 'img_123', 'trip 3 day 4', 'imgg_77', 'zzz'];
+    const output = document.getElementById('bench-results');
+    const list = document.getElementById('file-list');
+    const frame = () => new Promise((resolve) => requestAnimationFrame(() => resolve()));
+
+    // Count object URLs the player creates and revokes
+    let created = 0, revoked = 0;
+    const create = URL.createObjectURL.bind(URL), revoke = URL.revokeObjectURL.bind(URL);
+    URL.createObjectURL = (blob) => { created++; return create(blob); };
+    URL.revokeObjectURL = (url) => { revoked++; revoke(url); };
+
+    const results = [];
+    for (const count of COUNTS) {
+        const files = [];
+        for (let i = 0; i < count; i++) {
+            const file = new File([''], `IMG_${(i * 7919) % count}.${EXTENSIONS[i % EXTENSIONS.length]}`);
+            Object.defineProperty(file, 'webkitRelativePath', {value: `Photos/Trip ${i % 40}/Day ${i % 7}/${file.name}`});
+            files.push(file);
+        }
+        await frame();
+        const heapBefore = performance.memory ? performance.memory.usedJSHeapSize : 0;
+        const start = performance.now();
+        handleFileSelect({target: {files}});
+        const selectMs = performance.now() - start;
+        await frame();
+        await frame();
+        const paintMs = performance.now() - start;
+        const nodes = list.querySelectorAll('.file-item').length;
+
+        // Scroll from top to bottom in 120 frames
+        const frames = [];
+        let last = performance.now();
+        for (let i = 0; i < 120; i++) {
+            list.scrollTop = (list.scrollHeight - list.clientHeight) * i / 119;
+            await frame();
+            const now = performance.now();
+            frames.push(now - last);
+            last = now;
+        }
+        frames.sort((a, b) => a - b);
+
+        // Switch between files and see how many object URLs stay alive
+        list.scrollTop = 0;
+        await frame();
+        await frame();
+        created = revoked = 0;
+        for (let i = 0; i < 50; i++) {
+            const items = list.querySelectorAll('.file-item:not(.folder)');
+            items[i % Math.min(items.length, 10)].click();
+        }
+
+        // Type queries and wait for their results
+        const search = document.getElementById('search');
+        const fileCount = document.getElementById('file-count');
+        const searches = {};
+        for (const query of search ? QUERIES : []) {
+            search.value = '';
+            search.dispatchEvent(new Event('input'));
+            await frame();
+            const typed = performance.now();
+            search.value = query;
+            search.dispatchEvent(new Event('input'));
+            while (!fileCount.textContent.includes('match') && performance.now() - typed < 5000) {
+                await new Promise((resolve) => setTimeout(resolve));
+            }
+            searches[query] = {matches: parseInt(fileCount.textContent.replace(/,/g, ''), 10),
+                               ms: +(performance.now() - typed).toFixed(1), worker: fileCount.title};
+        }
+        if (search) {
+            search.value = '';
+            search.dispatchEvent(new Event('input'));
+        }
+        results.push({
+            files: count,
+            select_ms: +selectMs.toFixed(1),
+            first_paint_ms: +paintMs.toFixed(1),
+            dom_rows: nodes,
+            scroll_frame_p50_ms: +frames[60].toFixed(1),
+            scroll_frame_max_ms: +frames[119].toFixed(1),
+            live_object_urls: created - revoked,
+            searches,
+            heap_mb: performance.memory
+                ? +((performance.memory.usedJSHeapSize - heapBefore) / 1048576).toFixed(1) : null,
+        });
+        output.textContent = JSON.stringify(results, null, 1);
+    }
+    output.textContent = 'done\\n' + JSON.stringify(results, null, 1);
+    console.log(JSON.stringify(results));
+    window.benchmarkResults = results;
+})();
+</script>
+"""
+
+
+def read_source(path, rev=None):
+    """Return a file's text from the working tree or a git revision, or None if it does not exist."""
+    if not rev:
+        path = ROOT / path
+        return path.read_text(encoding="utf-8") if path.exists() else None
+    result = subprocess.run(["git", "show", f"{rev}:{path}"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout if result.returncode == 0 else None
+
+
+def player_html(rev=None):
+    """Return the Local Directory player as one page, from the working tree or a git revision."""
+    index = read_source(f"{COMPONENT}/index.html", rev)
+    if index is not None:
+        workers = {name: read_source(f"{COMPONENT}/{name}", rev) for name in WORKERS}
+        style = "<style>\n" + read_source(f"{COMPONENT}/player.css", rev) + "</style>\n"
+        script = (
+            STANDALONE
+            .replace("__WORKERS__", json.dumps(workers))
+            .replace("__PLAYER__", read_source(f"{COMPONENT}/player.js", rev))
+        )
+        index = index.replace("</head>", style + "</head>", 1)
+        return re.sub(r"<script>.*?</script>", lambda match: script, index, count=1, flags=re.S)
+
+    source = read_source(SOURCE, rev)
+    if source is None:
+        sys.exit(f"No {SOURCE} at {rev}")
+    pages = [
+        node.value for node in ast.walk(ast.parse(source))
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and "<!DOCTYPE html>" in node.value
+    ]
+    if not pages:
+        sys.exit(f"No player HTML found in {SOURCE}")
+    return max(pages, key=len)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--rev", help="git revision to take the player from (default: working tree)")
+    parser.add_argument("--output", type=Path, help="where to write the page (default: a temp file)")
+    parser.add_argument("--open", action="store_true", help="open the page in the default browser")
+    args = parser.parse_args()
+
+    html = player_html(args.rev)
+    harness = HARNESS.replace("__COUNTS__", json.dumps(args.counts))
+    at = html.rindex("</body>")
+    page = html[:at] + harness + html[at:]
+    output = args.output or Path(tempfile.mkdtemp()) / f"bench_local_directory_{args.rev or 'worktree'}.html"
+    output.write_text(page, encoding="utf-8")
+    print(f"Wrote {output}")
+    print("Open it in a browser; results appear top right and in the console (window.benchmarkResults).")
+    if args.open:
+        webbrowser.open(output.resolve().as_uri())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark media probing and the cached media info lookups it feeds.
+
+Writes a directory of small synthetic MP4, WAV, PNG, GIF and text files
+(some deliberately under the wrong extension), indexes them, and times a
+cold probe of every file, a second pass that finds everything cached, and
+the page lookups and metadata filters the file browser runs.
+
+Usage:
+    python benchmarks/bench_probe.py [--files 10000] [--workers 1 4]
+"""
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import time
+import wave
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from processing import MediaProber, probe_file  # noqa: E402
+from storage import UploadStore  # noqa: E402
+
+MEDIA_TYPES = {".mp4": "Video", ".wav": "Audio", ".png": "Image", ".gif": "Image", ".txt": "Document"}
+
+
+def box(kind, *payload):
+    """Build an MP4 box."""
+    body = b"".join(payload)
+    return struct.pack(">I4s", 8 + len(body), kind) + body
+
+
+def make_mp4(seconds, width, height):
+    """Return a header-only MP4 with one H.264 and one AAC track."""
+    mvhd = box(b"mvhd", bytes(12), struct.pack(">II", 1000, int(seconds * 1000)), bytes(80))
+
+    def track(handler, entry):
+        stsd = box(b"stsd", bytes(4), struct.pack(">I", 1), entry)
+        hdlr = box(b"hdlr", bytes(8), handler, bytes(13))
+        return box(b"trak", box(b"mdia", hdlr, box(b"minf", box(b"stbl", stsd))))
+
+    video = box(b"avc1", bytes(24), struct.pack(">HH", width, height), bytes(50))
+    audio = box(b"mp4a", bytes(16), struct.pack(">HHHH", 2, 16, 0, 0), struct.pack(">I", 44100 << 16))
+    moov = box(b"moov", mvhd, track(b"vide", video), track(b"soun", audio))
+    return box(b"ftyp", b"isom", bytes(4), b"isomavc1") + moov + box(b"mdat", bytes(2048))
+
+
+def make_png(width, height):
+    """Return a tiny valid PNG header (the pixel data is not needed to probe)."""
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    chunk = struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    return b"\x89PNG\r\n\x1a\n" + chunk
+
+
+def write_files(directory, count):
+    """Write `count` synthetic media files; every 50th has the wrong extension."""
+    for i in range(count):
+        variant = i % 5
+        name = directory / f"file-{i:06d}"
+        if variant == 0:
+            name, data = name.with_suffix(".mp4"), make_mp4(5 + i % 600, 1280, 720 if i % 2 else 1080)
+        elif variant == 1:
+            name = name.with_suffix(".wav")
+            with wave.open(str(name), "wb") as w:
+                w.setnchannels(2)
+                w.setsampwidth(2)
+                w.setframerate(8000)
+                w.writeframes(bytes(4 * 8000 * (1 + i % 3)))
+            continue
+        elif variant == 2:
+            name, data = name.with_suffix(".png"), make_png(640 + i % 100, 480)
+        elif variant == 3:
+            name, data = name.with_suffix(".gif"), b"GIF89a" + struct.pack("<HH", 320, 240) + bytes(16)
+        else:
+            name, data = name.with_suffix(".txt"), f"Notes for file {i}\n".encode() * 20
+        if i % 50 == 0:
+            # Mislabelled: the content says otherwise
+            name = name.with_suffix(".avi")
+        name.write_bytes(data)
+
+
+def timed(func, repeat=1):
+    """Return (result, average seconds) of calling func."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def run(files, workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        write_files(directory, files)
+        store = UploadStore(directory)
+        store.index.sync_directory(directory, lambda suffix: MEDIA_TYPES.get(suffix.lower(), "Unknown"))
+        records = store.index.query()
+
+        _, single = timed(lambda: [probe_file(r["path"], r["name"]) for r in records[:1000]])
+        print(f"probe_file, one thread: {single * 1000 / min(len(records), 1000):.3f} ms/file")
+
+        for count in workers:
+            # A fresh cache for every pool size
+            conn = store.index._connection()
+            with conn:
+                conn.execute("DELETE FROM media_info")
+            prober = MediaProber(store, workers=count)
+            with ThreadPoolExecutor(count) as pool:
+                probed, cold = timed(lambda: prober.probe_pending(pool))
+                again, warm = timed(lambda: prober.probe_pending(pool))
+            print(f"{count:>2} worker(s): {probed} files in {cold:.2f} s ({probed / cold:,.0f} files/s, "
+                  f"index writes included); cached pass {again} files in {warm * 1000:.1f} ms")
+
+        summary = store.index.media_info_summary()
+        print(f"probed {summary['probed']}, mismatched {summary['mismatched']}, failed {summary['failed']}")
+        names = [r["name"] for r in records[:100]]
+        _, lookup = timed(lambda: store.index.media_info(names), repeat=50)
+        print(f"media info for a 100-file page: {lookup * 1000:.2f} ms")
+        for label, filters in [
+            ("min_duration=300", {"min_duration": 300}),
+            ("min_height=1080", {"min_height": 1080}),
+            ("codec=h264", {"codec": "h264"}),
+            ("mismatched", {"mismatched": True}),
+        ]:
+            matched, elapsed = timed(lambda: store.index.count(**filters), repeat=10)
+            print(f"count({label}): {matched} files in {elapsed * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1, 4}))
+    args = parser.parse_args()
+    run(args.files, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark upload saving: throughput and peak RSS versus file size.
+
+Each measurement runs in a fresh process so peak RSS reflects only that save.
+The "buffered" strategy mirrors the old behaviour of reading the whole upload
+into memory before writing; "streaming" uses storage.save_stream.
+
+Usage:
+    python benchmarks/bench_upload_save.py [--sizes 16,64,256,1024] [--chunk-size BYTES]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import save_stream  # noqa: E402
+from storage.writer import DEFAULT_CHUNK_SIZE  # noqa: E402
+
+
+def _make_source(path, size):
+    """Write a file of `size` bytes with non-zero content."""
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:min(len(block), remaining)])
+            remaining -= len(block)
+
+
+def _run_save(strategy, src, dest, chunk_size, result_queue):
+    start = time.perf_counter()
+    with open(src, "rb") as f:
+        if strategy == "buffered":
+            data = f.read()
+            with open(dest, "wb") as out:
+                out.write(data)
+        else:
+            save_stream(f, dest, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is reported in KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    result_queue.put((elapsed, peak_rss))
+
+
+def measure(strategy, src, dest, chunk_size):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_save, args=(strategy, src, dest, chunk_size, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="16,64,256,1024", help="Comma-separated sizes in MB")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--strategies", default="buffered,streaming")
+    args = parser.parse_args()
+
+    sizes = [int(s) * 1024 * 1024 for s in args.sizes.split(",")]
+    strategies = args.strategies.split(",")
+
+    print(f"{'strategy':<10} {'size MB':>8} {'MB/s':>8} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            src = Path(tmp) / "source.bin"
+            _make_source(src, size)
+            for strategy in strategies:
+                dest = Path(tmp) / f"dest-{strategy}.bin"
+                elapsed, peak_rss = measure(strategy, str(src), str(dest), args.chunk_size)
+                throughput = size / (1024 * 1024) / elapsed if elapsed else float("inf")
+                print(f"{strategy:<10} {size // (1024 * 1024):>8} {throughput:>8.1f} "
+                      f"{peak_rss / (1024 * 1024):>12.1f}")
+                dest.unlink()
+            src.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Simulate filling a quota-limited upload store with concurrent uploads.
+
+Several threads upload random-sized files into a store whose budget is a
+fraction of the total uploaded. A sampler thread watches the bytes actually on
+disk (blobs plus in-progress staging files). The run checks that:
+
+- the disk never exceeds the budget
+- pinned files are never evicted
+- a dry run evicts nothing
+- uploads over the per-file limit are rejected before anything is written
+
+Usage:
+    python benchmarks/sim_quota.py [--uploads 400] [--threads 8] [--budget-mb 64] [--policy lru]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import QuotaExceeded, StorageQuota, UploadStore  # noqa: E402
+
+MB = 1024 * 1024
+
+
+class RandomSource:
+    """Seekable stream of pseudo-random bytes that never holds the whole file."""
+
+    def __init__(self, size, seed):
+        self.size = size
+        self.seed = seed
+        self.position = 0
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, position, whence=0):
+        self.position = position if whence == 0 else self.size + position
+        return self.position
+
+    def read(self, count=-1):
+        count = self.size - self.position if count < 0 else min(count, self.size - self.position)
+        if count <= 0:
+            return b""
+        block = random.Random(self.seed * 7919 + self.position).randbytes(min(count, 64 * 1024))
+        data = (block * (count // len(block) + 1))[:count]
+        self.position += count
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def disk_bytes(root):
+    """Bytes in blobs and staging files under the store root.
+
+    Files are counted once by inode: a staging file renamed into its blob
+    directory while the walk is under way would otherwise be seen twice.
+    """
+    sizes = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if not filename.startswith(".index"):
+                try:
+                    stat = os.stat(os.path.join(dirpath, filename))
+                except FileNotFoundError:
+                    continue
+                sizes[stat.st_dev, stat.st_ino] = stat.st_size
+    return sum(sizes.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--budget-mb", type=int, default=64)
+    parser.add_argument("--max-file-mb", type=int, default=8)
+    parser.add_argument("--policy", default="lru", choices=["lru", "age"])
+    args = parser.parse_args()
+
+    budget = args.budget_mb * MB
+    with tempfile.TemporaryDirectory() as tmp:
+        store = UploadStore(tmp)
+        store.quota = StorageQuota(store, max_bytes=budget, max_file_bytes=args.max_file_mb * MB,
+                                   policy=args.policy).start()
+
+        # A pinned file that must survive every eviction
+        store.save(RandomSource(2 * MB, seed=-1), "pinned.mp4", "Video")
+        store.index.set_pinned("pinned.mp4", True)
+
+        # Oversized uploads are refused before any bytes are written
+        try:
+            store.save(RandomSource(args.max_file_mb * MB + 1, seed=-2), "huge.mp4", "Video")
+            raise AssertionError("oversized upload was accepted")
+        except QuotaExceeded:
+            pass
+
+        peak = 0
+        sampling = threading.Event()
+
+        def sample():
+            nonlocal peak
+            while not sampling.is_set():
+                peak = max(peak, disk_bytes(tmp))
+                time.sleep(0.005)
+
+        counter = iter(range(args.uploads))
+        lock = threading.Lock()
+        results = {"stored": 0, "rejected": 0}
+
+        def uploader():
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                size = random.randint(MB // 4, args.max_file_mb * MB)
+                try:
+                    store.save(RandomSource(size, seed=i), f"upload-{i:05d}.mp4", "Video")
+                    outcome = "stored"
+                except QuotaExceeded:
+                    outcome = "rejected"
+                with lock:
+                    results[outcome] += 1
+                # Replay a few older uploads so LRU has accesses to go by
+                if i % 5 == 0:
+                    store.touch(f"upload-{random.randint(0, i):05d}.mp4")
+
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        started = time.perf_counter()
+        threads = [threading.Thread(target=uploader) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        sampling.set()
+        sampler.join()
+
+        before = store.index.count()
+        plan = store.quota.evict(target_bytes=budget // 2, dry_run=True)
+        assert store.index.count() == before, "dry run evicted files"
+        stats = store.quota.stats()
+        store.quota.stop()
+
+        print(f"policy={args.policy} budget={args.budget_mb} MB threads={args.threads}")
+        print(f"uploads stored {results['stored']}, rejected {results['rejected']} in {elapsed:.1f}s")
+        print(f"evicted {stats['evicted_files']} file(s), {stats['evicted_bytes'] / MB:.1f} MB "
+              f"in {stats['eviction_runs']} run(s)")
+        print(f"peak on disk {peak / MB:.1f} MB of {args.budget_mb} MB, now {stats['used_bytes'] / MB:.1f} MB")
+        print(f"dry run to half the budget would evict {len(plan['files'])} file(s), "
+              f"{plan['freed_bytes'] / MB:.1f} MB")
+        assert peak <= budget, "disk usage exceeded the budget"
+        assert store.index.get("pinned.mp4") is not None, "pinned file was evicted"
+        assert "pinned.mp4" not in plan["files"]
+        print("OK")
+
+
+if __name__ == "__main__":
+    main()
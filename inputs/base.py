@@ -7,7 +7,7 @@ class MediaInputHandler(ABC):
     """Abstract base class for different media input methods."""
 
     # Supported file types
-    SUPPORTED_VIDEO = ['.mp4', '.webm', '.ogg', '.mov', '.avi']
+    SUPPORTED_VIDEO = ['.mp4', '.webm', '.ogg', '.mov', '.avi', '.mkv']
     SUPPORTED_AUDIO = ['.mp3', '.wav', '.ogg', '.m4a', '.flac']
     SUPPORTED_IMAGE = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
     SUPPORTED_DOCUMENT = ['.pdf', '.md', '.txt']
@@ -1,53 +1,457 @@
 """File upload input handler."""
 import streamlit as st
+import ipaddress
+import logging
+import mimetypes
 import os
+import secrets
+import urllib.parse
 from pathlib import Path
-from datetime import datetime
 from .base import MediaInputHandler
+from .hls_player import render_hls_player
+from .waveform_player import render_waveform_player
+from .pdf_viewer import render_pdf_viewer
+from .resumable_upload import render_resumable_uploader
+from .text_viewer import open_text_document, render_text_viewer
+from storage import (
+    API_PREFIX, RESUMABLE_PREFIX, MediaServer, QuotaExceeded, ResumableUploads, StaticAssets, StorageQuota,
+    UploadCatalog, UploadStore, api_route, media_path
+)
+from processing import (
+    JobScheduler, ThumbnailCache, THUMBNAIL_PREFIX, VIEW_PRIORITY, thumbnail_job, thumbnail_path,
+    thumbnail_route, thumbnails_available, RENDITION_PREFIX, TRANSCODE_CONCURRENCY, TRANSCODE_THREADS,
+    discard_rendition, needs_rendition, rendition_for, rendition_path, rendition_route, transcode_job,
+    transcoding_available, HLS_PREFIX, discard_package, hls_job, hls_path, hls_route, needs_hls,
+    package_status, MediaProber, WAVEFORM_PREFIX, discard_waveform, needs_waveform, waveform_for,
+    waveform_job, waveform_path, waveform_route, waveforms_available,
+)
+
+logger = logging.getLogger(__name__)
 
 # Directory for cloud uploads
 CLOUD_UPLOADS_DIR = Path(__file__).parent.parent / "cloud_uploads"
 
+# Browser-playable copies of videos uploaded in other formats
+RENDITIONS_DIR = CLOUD_UPLOADS_DIR / ".cache" / "renditions"
+# Adaptive-bitrate (HLS) packages of large videos
+HLS_DIR = CLOUD_UPLOADS_DIR / ".cache" / "hls"
+# Waveform peaks of audio files
+WAVEFORMS_DIR = CLOUD_UPLOADS_DIR / ".cache" / "waveforms"
+
+# Scripts and styles of the Local Directory player, a static Streamlit component
+LOCAL_PLAYER_ASSETS = StaticAssets(Path(__file__).parent / "local_directory_player")
+
+# Public base URL of the media server, e.g. when it sits behind a reverse proxy.
+# When unset, the host the browser used for Streamlit is reused with the media port.
+MEDIA_SERVER_URL = os.environ.get("MEDIA_SERVER_URL", "")
+
+# Largest PDF embedded inline when the media server is unavailable
+INLINE_PDF_LIMIT = 10 * 1024 * 1024
+
+# Seconds between checks for finished resumable uploads
+RESUMABLE_CHECK_SECONDS = 2
+
+# Seconds between checks for a video's rendition while it is being made
+RENDITION_CHECK_SECONDS = 2
+
+# Seconds between checks for an audio file's waveform while it is being computed
+WAVEFORM_CHECK_SECONDS = 1
+
+
+@st.cache_resource
+def get_upload_store():
+    """Open the upload store shared by all sessions in this process.
+
+    The upload directory is reconciled with the index once per process, so
+    new sessions never have to scan it.
+    """
+    store = UploadStore(CLOUD_UPLOADS_DIR)
+    # Clean up temp files left by uploads that crashed mid-write
+    store.cleanup()
+    store.index.sync_directory(CLOUD_UPLOADS_DIR, MediaInputHandler.get_media_type)
+    # Budget from UPLOAD_QUOTA_BYTES / UPLOAD_MAX_FILE_BYTES; unlimited by default
+    store.quota = StorageQuota(store).start()
+    return store
+
+
+@st.cache_resource
+def get_upload_catalog():
+    """Start the catalog shared by all sessions, following the upload directory.
+
+    Sessions read its snapshot instead of scanning or counting on their own,
+    and compare versions to notice uploads made elsewhere.
+    """
+    return UploadCatalog(get_upload_store(), MediaInputHandler.get_media_type).start()
+
+
+@st.cache_resource
+def get_thumbnail_cache():
+    """Open the preview cache shared by all sessions in this process."""
+    cache = ThumbnailCache(CLOUD_UPLOADS_DIR / ".cache" / "thumbnails")
+
+    def discard_previews(event, record):
+        # Previews are keyed by content; drop them once the content is gone
+        if event == "deleted" and (record["digest"] is None or record["orphaned"]):
+            cache.discard(record)
+
+    get_upload_store().subscribe(discard_previews)
+    return cache
+
+
+@st.cache_resource
+def get_job_scheduler():
+    """Start the background job scheduler shared by all sessions in this process.
+
+    Jobs are queued by store events, so every upload saved by any session
+    (or by the resumable uploader) gets its derived assets in the background.
+    """
+    scheduler = JobScheduler(get_upload_store())
+    cache = get_thumbnail_cache()
+    if thumbnails_available():
+        # Previews are ready before the image is first opened
+        scheduler.register(
+            "thumbnails", thumbnail_job, priority=10,
+            applies=lambda record: record["type"] == "Image",
+            params={"cache_dir": str(cache.root)},
+            on_done=lambda record, result: cache.account(result["bytes"]),
+        )
+    if transcoding_available():
+        # Few at a time: each transcode already uses several cores
+        scheduler.register(
+            "renditions", transcode_job, priority=5, concurrency=TRANSCODE_CONCURRENCY,
+            applies=needs_rendition,
+            params={"cache_dir": str(RENDITIONS_DIR), "threads": TRANSCODE_THREADS},
+        )
+        scheduler.register(
+            "hls", hls_job, priority=3, concurrency=TRANSCODE_CONCURRENCY,
+            applies=needs_hls,
+            params={"cache_dir": str(HLS_DIR), "threads": TRANSCODE_THREADS},
+        )
+    if waveforms_available():
+        # Decoding is quick next to transcoding, so waveforms go ahead of it
+        scheduler.register(
+            "waveforms", waveform_job, priority=8,
+            applies=needs_waveform,
+            params={"cache_dir": str(WAVEFORMS_DIR)},
+        )
+
+    def discard_derived(event, record):
+        if event == "deleted" and (record["digest"] is None or record["orphaned"]):
+            discard_rendition(RENDITIONS_DIR, record)
+            discard_package(HLS_DIR, record)
+            discard_waveform(WAVEFORMS_DIR, record)
+
+    get_upload_store().subscribe(discard_derived)
+    return scheduler.start()
+
+
+@st.cache_resource
+def get_media_prober():
+    """Start the background media prober shared by all sessions in this process.
+
+    Duration, resolution and codecs are read in the background and cached in
+    the upload index, so listing and filtering never wait on a probe.
+    """
+    return MediaProber(get_upload_store()).start()
+
+
+@st.cache_resource
+def get_resumable_uploads():
+    """Open the resumable upload service shared by all sessions in this process."""
+    return ResumableUploads(
+        get_upload_store(), MediaInputHandler.get_media_type, suffixes=MediaInputHandler.ALL_SUPPORTED
+    )
+
+
+def get_admin_token():
+    """Return ADMIN_TOKEN from Streamlit secrets, or "" if it is not configured."""
+    try:
+        return st.secrets.get("ADMIN_TOKEN", "")
+    except Exception:
+        return ""
+
+
+@st.cache_resource
+def get_media_server():
+    """Start the range-capable media server once per process.
+
+    Returns:
+        MediaServer or None: None if the server could not bind its port, in
+        which case players fall back to Streamlit's own media handling
+    """
+    routes = {
+        THUMBNAIL_PREFIX: thumbnail_route(get_thumbnail_cache()),
+        RENDITION_PREFIX: rendition_route(RENDITIONS_DIR),
+        HLS_PREFIX: hls_route(HLS_DIR),
+        WAVEFORM_PREFIX: waveform_route(WAVEFORMS_DIR),
+        API_PREFIX: api_route(get_admin_token, jobs=get_job_scheduler()),
+        RESUMABLE_PREFIX: get_resumable_uploads().route(),
+        LOCAL_PLAYER_ASSETS.prefix: LOCAL_PLAYER_ASSETS.route(),
+    }
+    try:
+        return MediaServer(get_upload_store(), routes=routes).start()
+    except OSError as e:
+        logger.warning("Media server unavailable, serving media through Streamlit: %s", e)
+        return None
+
+
+def media_server_base_url():
+    """Return the base URL browsers use to reach the media server, or None.
+
+    Without MEDIA_SERVER_URL the server is addressed directly, on the host
+    the browser used for Streamlit. That only works from a plain HTTP page
+    (HTTPS pages block it as mixed content) and, while the server listens on
+    loopback only, from the same machine; in the other cases None is
+    returned and players fall back to Streamlit's own media handling.
+    """
+    if MEDIA_SERVER_URL:
+        return MEDIA_SERVER_URL.rstrip("/")
+    server = get_media_server()
+    if server is None:
+        return None
+
+    scheme, hostname = "http", "localhost"
+    context = getattr(st, "context", None)
+    headers = getattr(context, "headers", None)
+    page = urllib.parse.urlsplit(getattr(context, "url", None) or "")
+    if page.hostname:
+        scheme, hostname = page.scheme, page.hostname
+    elif headers and headers.get("Host"):
+        scheme = headers.get("X-Forwarded-Proto", scheme).split(",")[0].strip().lower()
+        hostname = urllib.parse.urlsplit("//" + headers["Host"]).hostname or hostname
+    if scheme != "http":
+        return None
+    if server.loopback:
+        if not _is_loopback(hostname):
+            return None
+        hostname = "localhost"  # Also reaches an IPv4-only server from an IPv6 page address
+    if ":" in hostname:
+        hostname = f"[{hostname}]"  # IPv6 literal
+    return f"http://{hostname}:{server.port}"
+
+
+def _is_loopback(hostname):
+    """Whether a host name or address refers to this machine's loopback interface."""
+    if hostname == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(hostname).is_loopback
+    except ValueError:
+        return False
+
+
+def media_url(name, download=False):
+    """Return the media server URL for a stored file, or None if unavailable.
+
+    Args:
+        name: Stored file name
+        download: Link to an attachment response instead of inline playback
+    """
+    base_url = media_server_base_url()
+    return base_url + media_path(name, download=download) if base_url else None
+
+
+def media_source(record):
+    """Return what to hand to st.video/st.audio/st.image for a stored file.
+
+    Prefers a media server URL so the browser streams the file with range
+    requests; falls back to the file path if the server is not running.
+    """
+    return media_url(record["name"]) or record["path"]
+
+
+def thumbnail_source(record, size="medium"):
+    """Return a downscaled preview of a stored image for st.image.
+
+    Uses the media server's cached preview URL when available, otherwise a
+    locally generated preview, and the original file as a last resort.
+    """
+    base_url = media_server_base_url()
+    if base_url:
+        return base_url + thumbnail_path(record, size)
+    preview = get_thumbnail_cache().get(record, size)
+    return str(preview) if preview else record["path"]
+
+
+def render_video(record):
+    """Play a stored video in the best form available.
+
+    Large videos stream adaptively from their HLS package once its first
+    segments exist. Videos in formats browsers cannot play (MOV, AVI, MKV)
+    are otherwise played from their MP4/WebM rendition, and until it has
+    been made the original is offered (some browsers can play it) with the
+    conversion's progress. Missing packages and renditions are queued, ahead
+    of other jobs, when a video is viewed.
+    """
+    base_url = media_server_base_url()
+    rendition = rendition_for(RENDITIONS_DIR, record) if needs_rendition(record) else None
+    if rendition:
+        source = base_url + rendition_path(record) if base_url else str(rendition[0])
+        mime = rendition[1]
+    else:
+        source = media_source(record)
+        mime = mimetypes.guess_type(record["name"])[0] or "video/mp4"
+
+    if not transcoding_available():
+        if needs_rendition(record):
+            st.caption("ffmpeg is not installed, so this video is played as uploaded and may not play "
+                       "in every browser.")
+        st.video(source, format=mime)
+        return
+
+    scheduler = get_job_scheduler()
+    jobs = scheduler.jobs_for(record)
+    scheduler.boost(record)
+    if base_url and needs_hls(record):
+        job = _ensure_job(scheduler, "hls", record, jobs)
+        status = package_status(HLS_DIR, record)
+        # A partial package is only played while it is still growing
+        if status == "complete" or (status == "partial" and job["status"] in ("queued", "running")):
+            render_hls_player(base_url + hls_path(record), source)
+            return
+
+    if needs_rendition(record) and rendition is None:
+        job = _ensure_job(scheduler, "renditions", record, jobs)
+        if job["status"] == "failed":
+            st.warning(f"Could not convert this video for browser playback: {job['message']}")
+        else:
+            _watch_rendition(record)
+    st.video(source, format=mime)
+
+
+def render_audio(record):
+    """Play a stored audio file over its waveform.
+
+    The waveform is drawn from precomputed peaks. Until they have been
+    computed (they are queued, ahead of other jobs, when the file is viewed)
+    or without the media server, a plain player is shown.
+    """
+    base_url = media_server_base_url()
+    if base_url and waveform_for(WAVEFORMS_DIR, record):
+        render_waveform_player(base_url + media_path(record["name"]), base_url + waveform_path(record))
+        return
+
+    st.audio(media_source(record), format=mimetypes.guess_type(record["name"])[0] or "audio/wav")
+    if base_url and waveforms_available() and needs_waveform(record):
+        scheduler = get_job_scheduler()
+        job = _ensure_job(scheduler, "waveforms", record, scheduler.jobs_for(record))
+        scheduler.boost(record)
+        if job["status"] != "failed":
+            _watch_waveform(record)
+
+
+def _ensure_job(scheduler, kind, record, jobs):
+    """Return a file's latest job of a kind, queueing one if there is none in effect.
+
+    Covers files stored before ffmpeg was available and assets removed since
+    their job ran. Failed jobs are left for the admin to retry.
+    """
+    job = jobs.get(kind)
+    if job is None or (job["status"] in ("done", "cancelled") and not _asset_exists(kind, record)):
+        job_id = scheduler.submit(kind, record, force=True, priority=VIEW_PRIORITY)
+        job = scheduler.get(job_id)
+    return job
+
+
+def _asset_exists(kind, record):
+    """Check whether the derived asset a finished job produced is still cached."""
+    if kind == "hls":
+        return package_status(HLS_DIR, record) is not None
+    if kind == "waveforms":
+        return waveform_for(WAVEFORMS_DIR, record) is not None
+    return rendition_for(RENDITIONS_DIR, record) is not None
+
+
+def _watch_rendition(record):
+    """Show a video's conversion progress and rerun the app once its rendition is ready."""
+    if rendition_for(RENDITIONS_DIR, record):
+        st.rerun()
+    job = get_job_scheduler().jobs_for(record).get("renditions")
+    progress = job["progress"] if job else 0.0
+    st.progress(progress, text=f"Converting for browser playback… {progress:.0%}")
+
+
+def _watch_waveform(record):
+    """Rerun the app once an audio file's waveform peaks are ready."""
+    if waveform_for(WAVEFORMS_DIR, record):
+        st.rerun()
+
+
+def _watch_resumable_uploads(uploads, owner):
+    """Rerun the app once another of this session's resumable uploads has finished."""
+    if len(uploads.completed(owner)) != st.session_state.get("resumable_seen", 0):
+        st.rerun()
+
+
+# Fragments (Streamlit 1.37+) poll without rerunning the page; older versions
+# pick up finished uploads on the next interaction
+if hasattr(st, "fragment"):
+    _watch_resumable_uploads = st.fragment(run_every=RESUMABLE_CHECK_SECONDS)(_watch_resumable_uploads)
+    _watch_rendition = st.fragment(run_every=RENDITION_CHECK_SECONDS)(_watch_rendition)
+    _watch_waveform = st.fragment(run_every=WAVEFORM_CHECK_SECONDS)(_watch_waveform)
+
+
+class StoredUpload:
+    """A file already in the upload store, standing in for an UploadedFile.
+
+    Lets files sent with the resumable uploader be listed and rendered like
+    those from st.file_uploader; the content is only opened if read.
+    """
+
+    def __init__(self, record):
+        self.name = record["name"]
+        self.size = record["size"]
+        self.type = mimetypes.guess_type(record["name"])[0] or "application/octet-stream"
+        self.file_id = f"stored:{record['name']}"
+        self.path = record["path"]
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        return self._file
+
+    def read(self, size=-1):
+        return self._open().read(size)
+
+    def seek(self, offset, whence=0):
+        return self._open().seek(offset, whence)
+
+    def getvalue(self):
+        return Path(self.path).read_bytes()
+
 
 class FileUploadInput(MediaInputHandler):
     """Handler for uploaded media files."""
 
     def __init__(self):
-        """Initialize the handler and ensure upload directory exists."""
+        """Initialize the handler and open the shared upload store."""
         super().__init__()
-        CLOUD_UPLOADS_DIR.mkdir(exist_ok=True)
-        # Initialize session state for tracking uploads
-        if "cloud_files" not in st.session_state:
-            st.session_state.cloud_files = {}
-            # Load existing files from directory
-            self._load_existing_files()
-
-    def _load_existing_files(self):
-        """Load existing files from cloud_uploads directory."""
-        if CLOUD_UPLOADS_DIR.exists():
-            for file_path in CLOUD_UPLOADS_DIR.iterdir():
-                if file_path.is_file():
-                    stat = file_path.stat()
-                    st.session_state.cloud_files[file_path.name] = {
-                        "path": str(file_path),
-                        "size": stat.st_size,
-                        "uploaded_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                        "type": self.get_media_type(file_path.suffix)
-                    }
+        self.store = get_upload_store()
+        # Maps each uploaded file's id to the name it was stored under
+        if "stored_uploads" not in st.session_state:
+            st.session_state.stored_uploads = {}
 
     def _save_to_cloud(self, uploaded_file):
-        """Save uploaded file to cloud storage directory."""
-        file_path = CLOUD_UPLOADS_DIR / uploaded_file.name
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        # Track in session state
-        st.session_state.cloud_files[uploaded_file.name] = {
-            "path": str(file_path),
-            "size": uploaded_file.size,
-            "uploaded_at": datetime.now().isoformat(),
-            "type": self.get_media_type(Path(uploaded_file.name).suffix)
-        }
+        """Save uploaded file to the deduplicating cloud store."""
+        uploaded_file.seek(0)
+        try:
+            stored_name = self.store.save(
+                uploaded_file,
+                uploaded_file.name,
+                media_type=self.get_media_type(Path(uploaded_file.name).suffix),
+            )
+        except QuotaExceeded as e:
+            # Still playable from memory for this session, just not kept
+            st.error(f"'{uploaded_file.name}' was not saved: {e.strerror}")
+            stored_name = None
+        uploaded_file.seek(0)
+        st.session_state.stored_uploads[uploaded_file.file_id] = stored_name
+
+    def _stored_record(self, uploaded_file):
+        """Return the index record an uploaded file was saved as, or None."""
+        stored_name = st.session_state.stored_uploads.get(uploaded_file.file_id)
+        return self.store.index.get(stored_name) if stored_name else None
 
     def render_sidebar(self):
         """Render file upload controls in sidebar.
@@ -65,14 +469,55 @@ class FileUploadInput(MediaInputHandler):
         # Save uploaded files to cloud storage
         if uploaded_files:
             for uploaded_file in uploaded_files:
-                if uploaded_file.name not in st.session_state.cloud_files:
+                if uploaded_file.file_id not in st.session_state.stored_uploads:
                     self._save_to_cloud(uploaded_file)
-        
-        return uploaded_files if uploaded_files else []
+
+        return list(uploaded_files or []) + self._render_resumable_uploader()
+
+    def _render_resumable_uploader(self):
+        """Render the chunked uploader for files too large for st.file_uploader.
+
+        Returns:
+            list: StoredUpload for each file this session has finished sending
+        """
+        uploads = get_resumable_uploads()
+        owner = st.session_state.setdefault("upload_owner", secrets.token_hex(16))
+        if "upload_token" not in st.session_state:
+            # Issued once per session so reruns do not reload the uploader
+            st.session_state.upload_token = uploads.issue_token(owner)
+
+        completed = uploads.completed(owner)
+        st.session_state.resumable_seen = len(completed)
+
+        with st.expander("📦 Large files (resumable)"):
+            base_url = media_server_base_url()
+            if base_url is None:
+                st.caption("Resumable uploads need the media server, which is not running.")
+            else:
+                render_resumable_uploader(
+                    base_url + RESUMABLE_PREFIX,
+                    st.session_state.upload_token,
+                    accept=",".join(self.ALL_SUPPORTED),
+                    chunk_size=uploads.chunk_size,
+                )
+                _watch_resumable_uploads(uploads, owner)
+
+        files = []
+        for name in completed:
+            record = self.store.index.get(name)
+            if record is None:
+                continue  # Deleted since it was uploaded
+            stored = StoredUpload(record)
+            st.session_state.stored_uploads[stored.file_id] = name
+            files.append(stored)
+        return files
 
     def render_main_content(self, uploaded_files):
         """Render the uploaded files in the main content area.
 
+        Only the selected file's player, preview and download link are
+        rendered; the other files are listed from a cheap metadata summary.
+
         Args:
             uploaded_files: List of uploaded files from render_sidebar()
         """
@@ -81,57 +526,118 @@ class FileUploadInput(MediaInputHandler):
 
         st.success(f"✅ {len(uploaded_files)} file(s) loaded")
 
-        # Create tabs for different media types
-        tabs = st.tabs([f"📄 {file.name}" for file in uploaded_files])
-
-        for tab, uploaded_file in zip(tabs, uploaded_files):
-            with tab:
-                file_extension = Path(uploaded_file.name).suffix.lower()
-
-                # Display file info
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("File Name", uploaded_file.name)
-                with col2:
-                    size_mb = uploaded_file.size / (1024 * 1024)
-                    st.metric("Size", f"{size_mb:.2f} MB")
-                with col3:
-                    media_type = self.get_media_type(file_extension)
-                    st.metric("Type", media_type)
-
-                st.markdown("---")
-
-                # Display media based on type
-                if file_extension in self.SUPPORTED_VIDEO:
-                    st.video(uploaded_file)
-
-                elif file_extension in self.SUPPORTED_AUDIO:
-                    st.audio(uploaded_file)
-
-                elif file_extension in self.SUPPORTED_IMAGE:
-                    st.image(uploaded_file, use_container_width=True)
-
-                elif file_extension in self.SUPPORTED_DOCUMENT:
-                    if file_extension == '.pdf':
-                        # Display PDF using base64 embed
-                        import base64
-                        base64_pdf = base64.b64encode(uploaded_file.read()).decode('utf-8')
-                        pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="800" type="application/pdf"></iframe>'
-                        st.markdown(pdf_display, unsafe_allow_html=True)
-                        uploaded_file.seek(0)  # Reset file pointer for download
+        selected = 0
+        if len(uploaded_files) > 1:
+            summaries = [self._summary(file) for file in uploaded_files]
+            st.dataframe(summaries, hide_index=True, use_container_width=True)
+            selected = st.selectbox(
+                "Select a file to view",
+                range(len(uploaded_files)),
+                format_func=lambda i: f"📄 {uploaded_files[i].name}",
+                key="upload_selected_file"
+            )
+
+        self._render_file(uploaded_files[selected])
+
+    def _summary(self, uploaded_file):
+        """Return name, size and type of an upload.
+
+        Built from the upload's attributes only, so listing many files never
+        touches their content.
+        """
+        return {
+            "Name": uploaded_file.name,
+            "Size (MB)": round(uploaded_file.size / (1024 * 1024), 2),
+            "Type": self.get_media_type(Path(uploaded_file.name).suffix),
+        }
+
+    def _render_file(self, uploaded_file):
+        """Render the player, preview and download link for one upload."""
+        file_extension = Path(uploaded_file.name).suffix.lower()
+        record = self._stored_record(uploaded_file)
+        if record:
+            # Viewed files are the last to be evicted under a storage quota
+            self.store.touch(record["name"])
+
+        # Display file info
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("File Name", uploaded_file.name)
+        with col2:
+            size_mb = uploaded_file.size / (1024 * 1024)
+            st.metric("Size", f"{size_mb:.2f} MB")
+        with col3:
+            media_type = self.get_media_type(file_extension)
+            st.metric("Type", media_type)
+
+        st.markdown("---")
+
+        # Display media based on type, streamed from the media server
+        # when available instead of embedding the upload's bytes
+        if file_extension in self.SUPPORTED_VIDEO:
+            if record:
+                render_video(record)
+            else:
+                st.video(uploaded_file)
+
+        elif file_extension in self.SUPPORTED_AUDIO:
+            if record:
+                render_audio(record)
+            else:
+                st.audio(uploaded_file)
+
+        elif file_extension in self.SUPPORTED_IMAGE:
+            # Show a cached downscaled preview and link to the original
+            if record:
+                st.image(thumbnail_source(record), use_container_width=True)
+                original_url = media_url(record["name"])
+                if original_url:
+                    st.markdown(f"[🔍 View original]({original_url})")
+            else:
+                st.image(uploaded_file, use_container_width=True)
+
+        elif file_extension in self.SUPPORTED_DOCUMENT:
+            if file_extension == '.pdf':
+                # Render pages on demand from the range-capable media URL
+                pdf_url = media_url(record["name"]) if record else None
+                if pdf_url:
+                    render_pdf_viewer(pdf_url)
+                elif uploaded_file.size <= INLINE_PDF_LIMIT:
+                    # Display PDF using base64 embed
+                    import base64
+                    base64_pdf = base64.b64encode(uploaded_file.read()).decode('utf-8')
+                    pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="800" type="application/pdf"></iframe>'
+                    st.markdown(pdf_display, unsafe_allow_html=True)
+                    uploaded_file.seek(0)  # Reset file pointer for download
+                else:
+                    st.info("📄 This PDF is too large to preview inline. Use the download button below.")
+            else:
+                # Page through .md and .txt from the stored copy without
+                # decoding the whole file
+                if record:
+                    document = open_text_document(record["path"], record["size"], record["mtime"])
+                    render_text_viewer(
+                        document,
+                        key=f"text_{uploaded_file.file_id}",
+                        markdown=file_extension == '.md'
+                    )
+                else:
+                    content = uploaded_file.read().decode('utf-8', errors='replace')
+                    if file_extension == '.md':
+                        st.markdown(content)
                     else:
-                        # Display text content for .md and .txt
-                        content = uploaded_file.read().decode('utf-8')
-                        if file_extension == '.md':
-                            st.markdown(content)
-                        else:
-                            st.text(content)
-                        uploaded_file.seek(0)  # Reset file pointer for download
-
-                # Download button
-                st.download_button(
-                    label="⬇️ Download",
-                    data=uploaded_file,
-                    file_name=uploaded_file.name,
-                    mime=uploaded_file.type
-                )
+                        st.text(content)
+                    uploaded_file.seek(0)  # Reset file pointer for download
+
+        # Download link streamed by the media server; nothing is read
+        # until it is clicked
+        download_url = media_url(record["name"], download=True) if record else None
+        if download_url:
+            st.link_button("⬇️ Download", download_url)
+        else:
+            st.download_button(
+                label="⬇️ Download",
+                data=uploaded_file,
+                file_name=uploaded_file.name,
+                mime=uploaded_file.type
+            )
@@ -0,0 +1,106 @@
+"""Adaptive-bitrate video player for HLS packages, backed by hls.js."""
+import json
+import os
+
+import streamlit.components.v1 as components
+
+# Where hls.js is loaded from (override with HLSJS_URL, e.g. for a self-hosted copy)
+HLSJS_URL = os.environ.get("HLSJS_URL", "https://cdn.jsdelivr.net/npm/hls.js@1.5.17/dist/hls.min.js")
+
+# Fatal network errors tolerated before falling back to progressive playback
+MAX_NETWORK_RETRIES = 3
+
+_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body {
+            margin: 0;
+            font-family: "Source Sans Pro", sans-serif;
+            font-size: 12px;
+            color: #888;
+        }
+        video {
+            display: block;
+            width: 100%;
+            height: calc(100vh - 20px);
+            background: #000;
+        }
+        #status {
+            height: 20px;
+            line-height: 20px;
+        }
+    </style>
+</head>
+<body>
+    <video id="video" controls playsinline preload="metadata"></video>
+    <div id="status"></div>
+    <script src="__HLSJS_URL__"></script>
+    <script>
+        const SOURCE = __SOURCE_JSON__;
+        const FALLBACK = __FALLBACK_JSON__;
+        const MAX_NETWORK_RETRIES = __RETRIES__;
+
+        const video = document.getElementById('video');
+        const status = document.getElementById('status');
+
+        function progressive(reason) {
+            status.textContent = reason + '; playing the original file';
+            video.src = FALLBACK;
+        }
+
+        if (window.Hls && Hls.isSupported()) {
+            // Quality follows measured bandwidth, capped to the player's size
+            const hls = new Hls({capLevelToPlayerSize: true, maxBufferLength: 30});
+            let networkErrors = 0;
+            hls.on(Hls.Events.LEVEL_SWITCHED, (event, data) => {
+                const level = hls.levels[data.level];
+                status.textContent = 'Adaptive streaming · ' + level.height + 'p' +
+                    (hls.autoLevelEnabled ? ' (auto)' : '');
+            });
+            hls.on(Hls.Events.ERROR, (event, data) => {
+                if (!data.fatal) return;
+                if (data.type === Hls.ErrorTypes.NETWORK_ERROR && ++networkErrors <= MAX_NETWORK_RETRIES) {
+                    hls.startLoad();
+                } else if (data.type === Hls.ErrorTypes.MEDIA_ERROR) {
+                    hls.recoverMediaError();
+                } else {
+                    hls.destroy();
+                    progressive('Adaptive stream unavailable');
+                }
+            });
+            hls.loadSource(SOURCE);
+            hls.attachMedia(video);
+        } else if (video.canPlayType('application/vnd.apple.mpegurl')) {
+            // Safari plays HLS natively
+            video.src = SOURCE;
+            status.textContent = 'Adaptive streaming';
+        } else {
+            progressive('Adaptive streaming is not supported by this browser');
+        }
+    </script>
+</body>
+</html>
+"""
+
+
+def render_hls_player(url, fallback_url, height=480):
+    """Render a video player that streams an HLS package at adaptive quality.
+
+    Uses hls.js, or native HLS in Safari, and falls back to progressive
+    playback of the original file if neither works or the stream fails.
+
+    Args:
+        url: URL of the package's master playlist on the media server
+        fallback_url: URL of a progressively playable version of the video
+        height: Height of the component in pixels
+    """
+    html = (
+        _TEMPLATE
+        .replace("__HLSJS_URL__", HLSJS_URL)
+        .replace("__SOURCE_JSON__", json.dumps(url))
+        .replace("__FALLBACK_JSON__", json.dumps(fallback_url))
+        .replace("__RETRIES__", str(MAX_NETWORK_RETRIES))
+    )
+    components.html(html, height=height)
@@ -0,0 +1,755 @@
+const dirInput = document.getElementById('dir-input');
+const fileInput = document.getElementById('file-input');
+const fileList = document.getElementById('file-list');
+const fileListSpacer = document.getElementById('file-list-spacer');
+const fileCount = document.getElementById('file-count');
+const searchInput = document.getElementById('search');
+const playerContainer = document.getElementById('player-container');
+const mediaWrapper = document.getElementById('media-wrapper');
+const emptyState = document.getElementById('empty-state');
+const fileInfo = document.getElementById('current-file-info');
+const mainContent = document.getElementById('main-content');
+const grid = document.getElementById('grid');
+const gridSpacer = document.getElementById('grid-spacer');
+const viewButtons = document.querySelectorAll('.view-toggle button');
+const autoButton = document.getElementById('auto-button');
+const shuffleButton = document.getElementById('shuffle-button');
+const repeatButton = document.getElementById('repeat-button');
+
+// Row pitch in pixels: .file-item height plus the gap below it
+const ROW_HEIGHT = 40;
+// Rows rendered above and below the visible ones, for smooth scrolling
+const OVERSCAN = 8;
+
+// Grid pitch in pixels: .tile size plus the gap around it
+const TILE_PITCH = 160;
+const TILE_GAP = 10;
+// Grid rows rendered above and below the visible ones
+const GRID_OVERSCAN = 2;
+// Longest side of a thumbnail, twice the tile for sharp high-DPI screens
+const THUMB_SIZE = 300;
+// Thumbnails requested from the worker at once
+const MAX_IN_FLIGHT = 4;
+// Thumbnail object URLs kept in memory; older ones are revoked
+const MAX_THUMB_URLS = 1000;
+// Video thumbnails show the frame at this time, or a tenth in for short clips
+const FRAME_SECONDS = 1;
+const FRAME_TIMEOUT_MS = 8000;
+
+// Upcoming playlist entries kept loaded in hidden elements, for near-instant transitions
+const PRELOAD_AHEAD = 2;
+// Larger images are not decoded ahead; a decoded photo can take hundreds of megabytes
+const PRELOAD_IMAGE_MAX_BYTES = 20 * 1024 * 1024;
+// Seconds each image is shown when auto-advancing
+const IMAGE_SECONDS = 5;
+
+// Extension -> kind, so each file is classified once when a folder is read
+const KINDS = new Map([
+    ...['mp4', 'webm', 'ogg', 'mov', 'avi', 'mkv'].map(ext => [ext, 'video']),
+    ...['mp3', 'wav', 'm4a', 'flac'].map(ext => [ext, 'audio']),
+    ...['jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp', 'svg'].map(ext => [ext, 'image']),
+]);
+const ICONS = {video: '🎥', audio: '🎵', image: '🖼️'};
+const VIDEO_MIME = {mov: 'video/quicktime', mkv: 'video/x-matroska'};
+// Sort key codes: after a folder, its own files come first, then its subfolders
+const FILES_FIRST = 1;
+const SUBFOLDER = 2;
+// Pixels of indent per folder level
+const INDENT = 14;
+// Folded letters lose their accents, so search and sorting ignore them
+const ACCENTS = /\p{M}/gu;
+const NON_ASCII = /[^ -~]/;
+
+let entries = [];       // {file, name, path, dir, depth, ext, kind, folded, order}, sorted by order
+let tree = [];          // Folder headers and entry indices, in list order
+const collapsed = new Set(); // Folder paths whose contents are hidden
+let results = null;     // Entry indices matching the search, best first, or null
+let items = [];         // What the list shows: tree without collapsed folders, or results
+let activeIndex = -1;
+let currentUrl = null;  // Object URL of the file being shown
+const rows = [];        // Reused row elements, one per visible position
+let renderQueued = false;
+let view = 'player';    // 'player' or 'grid'
+const tiles = [];       // Reused grid tiles, like rows
+let gridQueued = false;
+
+// Playlist
+let autoAdvance = true;
+let shuffle = false;
+let repeat = 'off';      // 'off', 'all' or 'one'
+let shuffleOrder = null; // Entry indices in shuffled play order
+let shuffleRank = null;  // Position of each entry index in shuffleOrder
+const preloaded = new Map(); // entry -> {element, url}, at most PRELOAD_AHEAD
+let imageTimer = null;
+
+// Thumbnail state, keyed by thumbnailKey() so it carries over when a folder is reopened
+const thumbUrls = new Map(); // key -> object URL, oldest first
+const failedThumbs = new Set();
+const pendingThumbs = new Map(); // key -> entry, requested from the worker
+let thumbQueue = [];     // Visible entries still lacking a thumbnail
+
+let thumbWorker = null;
+startWorker('thumbnail-worker.js', `const THUMB_SIZE = ${THUMB_SIZE};\n`).then((worker) => {
+    thumbWorker = worker;
+    thumbWorker.onmessage = onThumbnail;
+    pumpThumbnails();
+}, () => {
+    // No workers here: the grid shows icons instead of thumbnails
+});
+
+function fold(text) {
+    text = text.toLowerCase();
+    return NON_ASCII.test(text) ? text.normalize('NFKD').replace(ACCENTS, '') : text;
+}
+
+let keyBuffer = new Uint16Array(256);
+
+function sortKey(folded) {
+    // A string whose plain order is the list order, so sorting needs no collator.
+    // Digit runs sort by value: each gets its length first, leading zeros dropped.
+    const slash = folded.lastIndexOf('/');
+    if (keyBuffer.length < folded.length * 2 + 2) keyBuffer = new Uint16Array(folded.length * 2 + 2);
+    let length = 0;
+    if (slash < 0) keyBuffer[length++] = FILES_FIRST;
+    for (let i = 0; i < folded.length; i++) {
+        const code = folded.charCodeAt(i);
+        if (code === 47) {
+            keyBuffer[length++] = SUBFOLDER;
+            if (i === slash) keyBuffer[length++] = FILES_FIRST;
+        } else if (code >= 48 && code <= 57) {
+            let end = i + 1;
+            while (end < folded.length && folded.charCodeAt(end) >= 48 && folded.charCodeAt(end) <= 57) end++;
+            while (i < end - 1 && folded.charCodeAt(i) === 48) i++;
+            keyBuffer[length++] = 48 + Math.min(end - i, 40);
+            while (i < end) keyBuffer[length++] = folded.charCodeAt(i++);
+            i--;
+        } else {
+            keyBuffer[length++] = code;
+        }
+    }
+    return String.fromCharCode.apply(null, keyBuffer.subarray(0, length));
+}
+
+async function startWorker(name, prefix) {
+    // Workers are built from the fetched script, which may come from the media server's
+    // origin; the fetch is answered from the browser cache after the first visit
+    const response = await fetch(assetUrl(name));
+    if (!response.ok) throw new Error(response.status);
+    const source = prefix + await response.text();
+    const workerUrl = URL.createObjectURL(new Blob([source], {type: 'text/javascript'}));
+    try {
+        return new Worker(workerUrl);
+    } finally {
+        URL.revokeObjectURL(workerUrl);
+    }
+}
+
+// Search
+let searchWorker = null;
+let searchGeneration = 0; // Bumped per selection, so late results of an old folder are dropped
+let searchBusy = false;
+let searchWanted = null;  // Latest query not sent yet; typing faster than searches coalesces
+
+startWorker('search-worker.js', '').then((worker) => {
+    searchWorker = worker;
+    searchWorker.onmessage = ({data}) => {
+        searchBusy = false;
+        if (data.generation === searchGeneration && searchWanted === null) {
+            showResults(data.ids, data.ms);
+        }
+        sendSearch();
+    };
+    // A folder picked before the worker was ready is indexed now; until then search scanned it
+    if (entries.length) searchWorker.postMessage({paths: entries.map((entry) => entry.folded)});
+}, () => {
+    // No workers here: search scans the names on the page instead
+});
+
+function indexEntries() {
+    searchGeneration++;
+    searchWanted = null;
+    if (searchWorker) searchWorker.postMessage({paths: entries.map((entry) => entry.folded)});
+}
+
+function sendSearch() {
+    if (searchBusy || searchWanted === null) return;
+    const query = searchWanted;
+    searchWanted = null;
+    if (!query.trim()) {
+        showResults(null);
+    } else if (searchWorker) {
+        searchBusy = true;
+        searchWorker.postMessage({query, generation: searchGeneration});
+    } else {
+        const folded = fold(query.trim());
+        const found = [];
+        entries.forEach((entry, index) => { if (entry.folded.includes(folded)) found.push(index); });
+        showResults(found);
+    }
+}
+
+function showResults(ids, ms) {
+    results = ids;
+    fileList.scrollTop = 0;
+    fileCount.title = ms === undefined ? '' : `Searched in ${ms.toFixed(1)} ms`;
+    updateItems();
+}
+
+searchInput.addEventListener('input', () => {
+    searchWanted = searchInput.value;
+    sendSearch();
+});
+
+function classify(files) {
+    // Each file's sort key is computed once, so sorting compares plain strings
+    const found = [];
+    for (const file of files) {
+        const dot = file.name.lastIndexOf('.');
+        const ext = file.name.slice(dot + 1).toLowerCase();
+        const kind = KINDS.get(ext);
+        if (!kind) continue;
+        const path = file.webkitRelativePath || file.name;
+        const slash = path.lastIndexOf('/');
+        const dir = slash < 0 ? '' : path.slice(0, slash);
+        const folded = fold(path);
+        const order = sortKey(folded);
+        const depth = dir ? dir.split('/').length : 0;
+        found.push({file, name: file.name, path, dir, depth, ext, kind, folded, order});
+    }
+    return found.sort((a, b) => (a.order < b.order ? -1 : a.order > b.order ? 1 : 0));
+}
+
+function buildTree() {
+    // A header for every folder, each followed by its files, then its subfolders
+    tree = [];
+    const open = []; // Headers of the folders the current entry is in
+    let previous = [];
+    entries.forEach((entry, index) => {
+        const parts = entry.dir ? entry.dir.split('/') : [];
+        let same = 0;
+        while (same < parts.length && same < previous.length && parts[same] === previous[same]) same++;
+        open.length = same;
+        for (let depth = same; depth < parts.length; depth++) {
+            const header = {folder: parts.slice(0, depth + 1).join('/'), name: parts[depth], depth, count: 0};
+            tree.push(header);
+            open.push(header);
+        }
+        open.forEach((header) => header.count++);
+        tree.push(index);
+        previous = parts;
+    });
+}
+
+function updateItems() {
+    if (results) {
+        items = results;
+    } else if (!collapsed.size) {
+        items = tree;
+    } else {
+        items = [];
+        let hiddenBelow = -1; // Depth of the collapsed folder being skipped
+        for (const item of tree) {
+            const depth = typeof item === 'number' ? entries[item].depth : item.depth;
+            if (hiddenBelow >= 0 && depth > hiddenBelow) continue;
+            hiddenBelow = typeof item !== 'number' && collapsed.has(item.folder) ? item.depth : -1;
+            items.push(item);
+        }
+    }
+    fileListSpacer.style.height = `${items.length * ROW_HEIGHT}px`;
+    if (!entries.length) {
+        fileCount.textContent = '';
+    } else if (results) {
+        fileCount.textContent = `${results.length.toLocaleString()} of ${entries.length.toLocaleString()} files match`;
+    } else {
+        fileCount.textContent = `${entries.length.toLocaleString()} files`;
+    }
+    renderRows();
+}
+
+function handleFileSelect(e) {
+    entries = classify(e.target.files);
+    activeIndex = entries.length > 0 ? 0 : -1;
+    buildTree();
+    collapsed.clear();
+    results = null;
+    searchInput.value = '';
+    indexEntries();
+    fileList.scrollTop = 0;
+    updateItems();
+    grid.scrollTop = 0;
+    thumbQueue = [];
+    renderGrid();
+    clearPreloads();
+    if (shuffle) reshuffle();
+
+    if (entries.length > 0) {
+        emptyState.style.display = 'none';
+        playerContainer.style.display = 'block';
+        if (view === 'player') {
+            loadFile(0); // Auto-load first file
+        } else {
+            releaseMedia();
+        }
+    } else {
+        releaseMedia();
+        emptyState.style.display = 'block';
+        playerContainer.style.display = 'none';
+        emptyState.innerHTML = "<h2>No supported media files found</h2><p>Try selecting a different source.</p>";
+    }
+    reportStatus(currentUrl ? entries[activeIndex].path : null);
+}
+
+let reportedStatus = '';
+
+function reportStatus(playing) {
+    // Python hears only what it shows; the value is sent when it changes, as each one reruns the app
+    const status = {files: entries.length, playing};
+    const serialized = JSON.stringify(status);
+    if (serialized === reportedStatus) return;
+    reportedStatus = serialized;
+    Streamlit.setComponentValue(status);
+}
+
+dirInput.addEventListener('change', handleFileSelect);
+fileInput.addEventListener('change', handleFileSelect);
+
+function renderRows() {
+    // Lay out only the rows in view, reusing the same few elements
+    renderQueued = false;
+    const first = Math.max(0, Math.floor(fileList.scrollTop / ROW_HEIGHT) - OVERSCAN);
+    const last = Math.min(
+        items.length,
+        Math.ceil((fileList.scrollTop + fileList.clientHeight) / ROW_HEIGHT) + OVERSCAN
+    );
+    while (rows.length < last - first) {
+        const row = document.createElement('div');
+        row.className = 'file-item';
+        row.innerHTML = '<span class="icon"></span><span class="file-name"></span><span class="file-detail"></span>';
+        fileListSpacer.appendChild(row);
+        rows.push(row);
+    }
+    rows.forEach((row, i) => {
+        const position = first + i;
+        if (position >= last) {
+            row.style.display = 'none';
+            return;
+        }
+        const item = items[position];
+        row.style.display = '';
+        row.style.transform = `translateY(${position * ROW_HEIGHT}px)`;
+        row.dataset.position = position;
+        const [icon, name, detail] = row.children;
+        if (typeof item === 'number') {
+            const entry = entries[item];
+            if (row.item !== entry) {
+                row.item = entry;
+                row.title = entry.path;
+                row.classList.remove('folder');
+                row.style.paddingLeft = `${10 + (results ? 0 : entry.depth * INDENT)}px`;
+                icon.textContent = ICONS[entry.kind];
+                name.textContent = entry.name;
+                // Search results come from all over the tree, so show where each lives
+                detail.textContent = results ? entry.dir : '';
+            }
+            row.classList.toggle('active', item === activeIndex);
+        } else {
+            row.item = item;
+            row.title = item.folder;
+            row.classList.add('folder');
+            row.classList.remove('active');
+            row.style.paddingLeft = `${10 + item.depth * INDENT}px`;
+            icon.textContent = collapsed.has(item.folder) ? '▸' : '▾';
+            name.textContent = `📁 ${item.name}`;
+            detail.textContent = item.count.toLocaleString();
+        }
+    });
+}
+
+function revealActive() {
+    // Scroll the list so the active file is in view
+    const position = items.indexOf(activeIndex);
+    if (position < 0) return;
+    const top = position * ROW_HEIGHT;
+    if (top < fileList.scrollTop || top + ROW_HEIGHT > fileList.scrollTop + fileList.clientHeight) {
+        fileList.scrollTop = top - fileList.clientHeight / 2;
+    }
+}
+
+function queueRender() {
+    if (!renderQueued) {
+        renderQueued = true;
+        requestAnimationFrame(renderRows);
+    }
+}
+
+fileList.addEventListener('scroll', queueRender, {passive: true});
+new ResizeObserver(queueRender).observe(fileList);
+
+// One listener for every row, however many files there are
+fileList.addEventListener('click', (e) => {
+    const row = e.target.closest('.file-item');
+    if (!row) return;
+    const item = items[Number(row.dataset.position)];
+    if (typeof item === 'number') {
+        openEntry(item);
+    } else if (item) {
+        if (collapsed.has(item.folder)) collapsed.delete(item.folder); else collapsed.add(item.folder);
+        updateItems();
+    }
+});
+
+grid.addEventListener('click', (e) => {
+    const tile = e.target.closest('.tile');
+    if (tile) openEntry(Number(tile.dataset.index));
+});
+
+function openEntry(index) {
+    activeIndex = index;
+    renderRows();
+    loadFile(activeIndex);
+    setView('player');
+}
+
+viewButtons.forEach((button) => {
+    button.addEventListener('click', () => setView(button.dataset.view));
+});
+
+function setView(next) {
+    if (next === view) return;
+    view = next;
+    mainContent.classList.toggle('grid-mode', view === 'grid');
+    viewButtons.forEach((button) => button.classList.toggle('selected', button.dataset.view === view));
+    const element = mediaWrapper.firstChild;
+    if (view === 'grid') {
+        if (element && element.pause) element.pause();
+        clearTimeout(imageTimer);
+        renderGrid();
+    } else if (!currentUrl && activeIndex >= 0) {
+        loadFile(activeIndex);
+    }
+}
+
+function thumbnailKey(entry) {
+    // Same name, size and modification time: same picture, so the cached thumbnail still holds
+    if (!entry.key) {
+        const file = entry.file;
+        entry.key = `${file.webkitRelativePath || file.name}|${file.size}|${file.lastModified}`;
+    }
+    return entry.key;
+}
+
+function renderGrid() {
+    gridQueued = false;
+    if (view !== 'grid') return;
+    const columns = Math.max(1, Math.floor((grid.clientWidth - TILE_GAP) / TILE_PITCH));
+    gridSpacer.style.height = `${Math.ceil(entries.length / columns) * TILE_PITCH + TILE_GAP}px`;
+    const firstRow = Math.max(0, Math.floor(grid.scrollTop / TILE_PITCH) - GRID_OVERSCAN);
+    const lastRow = Math.ceil((grid.scrollTop + grid.clientHeight) / TILE_PITCH) + GRID_OVERSCAN;
+    const first = firstRow * columns;
+    const last = Math.min(entries.length, lastRow * columns);
+    while (tiles.length < last - first) {
+        const tile = document.createElement('div');
+        tile.className = 'tile';
+        tile.innerHTML = '<span class="tile-icon"></span><img alt=""><span class="tile-name"></span>';
+        gridSpacer.appendChild(tile);
+        tiles.push(tile);
+    }
+    const wanted = [];
+    tiles.forEach((tile, i) => {
+        const index = first + i;
+        if (index >= last) {
+            tile.style.display = 'none';
+            return;
+        }
+        const entry = entries[index];
+        const [icon, image, name] = tile.children;
+        tile.style.display = '';
+        tile.style.transform = `translate(${TILE_GAP + (index % columns) * TILE_PITCH}px, `
+            + `${TILE_GAP + Math.floor(index / columns) * TILE_PITCH}px)`;
+        if (tile.entry !== entry) {
+            tile.entry = entry;
+            tile.dataset.index = index;
+            tile.title = entry.name;
+            icon.textContent = ICONS[entry.kind];
+            name.textContent = entry.name;
+        }
+        const key = thumbnailKey(entry);
+        const url = thumbUrls.get(key);
+        if (url) {
+            // Mark as recently used
+            thumbUrls.delete(key);
+            thumbUrls.set(key, url);
+            if (image.getAttribute('src') !== url) image.src = url;
+            image.style.display = '';
+        } else {
+            image.removeAttribute('src');
+            image.style.display = 'none';
+            if (entry.kind !== 'audio' && !failedThumbs.has(key) && !pendingThumbs.has(key)) {
+                wanted.push(entry);
+            }
+        }
+        tile.classList.toggle('active', index === activeIndex);
+    });
+    // Only what is in view now; tiles scrolled past are not worth decoding
+    thumbQueue = wanted;
+    pumpThumbnails();
+}
+
+function queueGridRender() {
+    if (!gridQueued) {
+        gridQueued = true;
+        requestAnimationFrame(renderGrid);
+    }
+}
+
+grid.addEventListener('scroll', queueGridRender, {passive: true});
+new ResizeObserver(queueGridRender).observe(grid);
+
+function pumpThumbnails() {
+    if (!thumbWorker) return;
+    while (pendingThumbs.size < MAX_IN_FLIGHT && thumbQueue.length) {
+        const entry = thumbQueue.shift();
+        const key = thumbnailKey(entry);
+        if (thumbUrls.has(key) || failedThumbs.has(key) || pendingThumbs.has(key)) continue;
+        pendingThumbs.set(key, entry);
+        thumbWorker.postMessage({key, file: entry.file, kind: entry.kind});
+    }
+}
+
+function onThumbnail({data}) {
+    const entry = pendingThumbs.get(data.key);
+    if (!entry) return;
+    if (data.needFrame) {
+        captureFrame(entry.file).then(
+            (bitmap) => thumbWorker.postMessage({key: data.key, bitmap}, [bitmap]),
+            () => finishThumbnail(data.key, null)
+        );
+        return;
+    }
+    finishThumbnail(data.key, data.blob || null);
+}
+
+function finishThumbnail(key, blob) {
+    pendingThumbs.delete(key);
+    if (blob) {
+        thumbUrls.set(key, URL.createObjectURL(blob));
+        if (thumbUrls.size > MAX_THUMB_URLS) {
+            const [oldest, url] = thumbUrls.entries().next().value;
+            thumbUrls.delete(oldest);
+            URL.revokeObjectURL(url);
+        }
+    } else {
+        failedThumbs.add(key);
+    }
+    queueGridRender();
+    pumpThumbnails();
+}
+
+// Video frames are decoded by a hidden element, one video at a time
+const frameVideo = document.createElement('video');
+frameVideo.muted = true;
+frameVideo.playsInline = true;
+frameVideo.preload = 'auto';
+let frameChain = Promise.resolve();
+
+function captureFrame(file) {
+    const capture = frameChain.then(() => new Promise((resolve, reject) => {
+        const url = URL.createObjectURL(file);
+        const done = (bitmap, error) => {
+            clearTimeout(timer);
+            frameVideo.onloadedmetadata = frameVideo.onseeked = frameVideo.onerror = null;
+            frameVideo.removeAttribute('src');
+            frameVideo.load();
+            URL.revokeObjectURL(url);
+            if (bitmap) resolve(bitmap); else reject(error);
+        };
+        const timer = setTimeout(() => done(null, new Error('timed out')), FRAME_TIMEOUT_MS);
+        frameVideo.onerror = () => done(null, new Error('cannot decode'));
+        frameVideo.onloadedmetadata = () => {
+            frameVideo.currentTime = Math.min(FRAME_SECONDS, (frameVideo.duration || 0) / 10);
+        };
+        frameVideo.onseeked = () => {
+            createImageBitmap(frameVideo, {resizeWidth: THUMB_SIZE, resizeQuality: 'medium'})
+                .then((bitmap) => done(bitmap), (error) => done(null, error));
+        };
+        frameVideo.src = url;
+    }));
+    frameChain = capture.catch(() => {});
+    return capture;
+}
+
+function createMedia(entry, url) {
+    let element;
+
+    if (entry.kind === 'video') {
+        element = document.createElement('video');
+        element.controls = true;
+        // Basic type inference
+        element.type = VIDEO_MIME[entry.ext] || `video/${entry.ext}`;
+    } else if (entry.kind === 'audio') {
+        element = document.createElement('audio');
+        element.controls = true;
+    } else {
+        element = document.createElement('img');
+    }
+
+    element.src = url;
+    return element;
+}
+
+function discardMedia(slot) {
+    // Stop the element loading before its object URL goes away
+    if (slot.element.pause) {
+        slot.element.pause();
+        slot.element.removeAttribute('src');
+        slot.element.load();
+    }
+    URL.revokeObjectURL(slot.url);
+}
+
+function releaseMedia() {
+    clearTimeout(imageTimer);
+    const element = mediaWrapper.firstChild;
+    if (element && currentUrl) discardMedia({element, url: currentUrl});
+    mediaWrapper.innerHTML = '';
+    currentUrl = null;
+}
+
+function clearPreloads() {
+    preloaded.forEach(discardMedia);
+    preloaded.clear();
+}
+
+window.addEventListener('pagehide', () => {
+    releaseMedia();
+    clearPreloads();
+    thumbUrls.forEach((url) => URL.revokeObjectURL(url));
+    thumbUrls.clear();
+});
+
+function loadFile(index) {
+    releaseMedia();
+    const entry = entries[index];
+    // A preloaded element has already buffered its start, so it plays at once
+    let slot = preloaded.get(entry);
+    if (slot) {
+        preloaded.delete(entry);
+    } else {
+        const url = URL.createObjectURL(entry.file);
+        slot = {element: createMedia(entry, url), url};
+    }
+    currentUrl = slot.url;
+    fileInfo.innerText = entry.name;
+    reportStatus(entry.path);
+
+    const element = slot.element;
+    mediaWrapper.appendChild(element);
+    if (element.pause) {
+        element.onended = onEnded;
+        element.play().catch(() => {});
+    } else if (autoAdvance && repeat !== 'one') {
+        imageTimer = setTimeout(() => step(1), IMAGE_SECONDS * 1000);
+    }
+    preloadUpcoming();
+}
+
+function upcoming(offset) {
+    // Index of the entry `offset` places from the current one in play order, or -1
+    const count = entries.length;
+    if (!count || activeIndex < 0) return -1;
+    let position = (shuffle ? shuffleRank[activeIndex] : activeIndex) + offset;
+    if (position < 0 || position >= count) {
+        if (repeat !== 'all') return -1;
+        position = ((position % count) + count) % count;
+    }
+    return shuffle ? shuffleOrder[position] : position;
+}
+
+function preloadUpcoming() {
+    // Keep exactly the next PRELOAD_AHEAD entries loaded; release everything else
+    const wanted = new Set();
+    for (let offset = 1; offset <= PRELOAD_AHEAD; offset++) {
+        const index = upcoming(offset);
+        if (index >= 0 && index !== activeIndex) wanted.add(entries[index]);
+    }
+    preloaded.forEach((slot, entry) => {
+        if (!wanted.has(entry)) {
+            discardMedia(slot);
+            preloaded.delete(entry);
+        }
+    });
+    wanted.forEach((entry) => {
+        if (preloaded.has(entry)) return;
+        if (entry.kind === 'image' && entry.file.size > PRELOAD_IMAGE_MAX_BYTES) return;
+        const url = URL.createObjectURL(entry.file);
+        const element = createMedia(entry, url);
+        if (element.pause) {
+            element.preload = 'auto';
+            element.load();
+        } else if (element.decode) {
+            element.decode().catch(() => {});
+        }
+        preloaded.set(entry, {element, url});
+    });
+}
+
+function step(offset) {
+    const index = upcoming(offset);
+    if (index < 0) return;
+    activeIndex = index;
+    revealActive();
+    renderRows();
+    queueGridRender();
+    loadFile(index);
+}
+
+function onEnded(e) {
+    if (!autoAdvance) return;
+    if (repeat === 'one') {
+        e.target.currentTime = 0;
+        e.target.play().catch(() => {});
+    } else {
+        step(1);
+    }
+}
+
+function reshuffle() {
+    // Fisher-Yates over every entry, starting from the current one
+    const count = entries.length;
+    shuffleOrder = new Int32Array(count);
+    shuffleRank = new Int32Array(count);
+    for (let i = 0; i < count; i++) shuffleOrder[i] = i;
+    for (let i = count - 1; i > 0; i--) {
+        const j = Math.floor(Math.random() * (i + 1));
+        [shuffleOrder[i], shuffleOrder[j]] = [shuffleOrder[j], shuffleOrder[i]];
+    }
+    const at = Math.max(0, shuffleOrder.indexOf(Math.max(activeIndex, 0)));
+    [shuffleOrder[0], shuffleOrder[at]] = [shuffleOrder[at], shuffleOrder[0]];
+    shuffleOrder.forEach((index, position) => { shuffleRank[index] = position; });
+}
+
+function updatePlaylistControls() {
+    autoButton.classList.toggle('selected', autoAdvance);
+    shuffleButton.classList.toggle('selected', shuffle);
+    repeatButton.classList.toggle('selected', repeat !== 'off');
+    repeatButton.textContent = repeat === 'one' ? '🔂 One' : repeat === 'all' ? '🔁 All' : '🔁 Off';
+}
+
+document.getElementById('previous-button').addEventListener('click', () => step(-1));
+document.getElementById('next-button').addEventListener('click', () => step(1));
+autoButton.addEventListener('click', () => {
+    autoAdvance = !autoAdvance;
+    updatePlaylistControls();
+});
+shuffleButton.addEventListener('click', () => {
+    shuffle = !shuffle;
+    if (shuffle) reshuffle();
+    updatePlaylistControls();
+    preloadUpcoming();
+});
+repeatButton.addEventListener('click', () => {
+    repeat = {off: 'all', all: 'one', one: 'off'}[repeat];
+    updatePlaylistControls();
+    preloadUpcoming();
+});
+updatePlaylistControls();
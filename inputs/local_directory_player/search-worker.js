@@ -0,0 +1,190 @@
+const ACCENTS = /\p{M}/gu;
+
+let paths = [];                      // Folded paths; ids are positions in the page's entries
+let nameStarts = new Int32Array(0);  // Where the file name starts in each path
+let postings = new Map();            // Trigram -> Int32Array of ids containing it
+let prefixes = new Map();            // First one or two letters of a word -> Int32Array of ids
+let counts = new Uint16Array(0);     // Scratch: trigrams matched per id
+let marks = new Uint8Array(0);       // Scratch: ids still in the running
+let overlaps = new Uint16Array(0);   // Trigrams matched per id, summed over the tokens
+let scores = new Uint16Array(0);
+const NONE = new Int32Array(0);
+
+function fold(text) {
+    return text.toLowerCase().normalize('NFKD').replace(ACCENTS, '');
+}
+
+// Characters numbered in order of first appearance; 1023 and up share the last number
+const charIds = new Uint16Array(65536);
+let nextCharId = 1;
+
+function charId(code) {
+    if (!charIds[code]) charIds[code] = Math.min(nextCharId++, 1023);
+    return charIds[code];
+}
+
+function trigrams(text, add) {
+    // Each trigram as a small integer, ten bits per character, which keys Maps fastest
+    let gram = 0;
+    for (let i = 0; i < text.length; i++) {
+        gram = ((gram & 0xFFFFF) << 10) | charId(text.charCodeAt(i));
+        if (i >= 2) add(gram);
+    }
+}
+
+function isWordChar(code) {
+    // Paths are folded to lower case; anything past ASCII counts as a letter
+    return (code >= 48 && code <= 57) || (code >= 97 && code <= 122) || code > 127;
+}
+
+function wordPrefixes(text, add) {
+    for (let i = 0; i < text.length; i++) {
+        if (isWordChar(text.charCodeAt(i)) && (i === 0 || !isWordChar(text.charCodeAt(i - 1)))) {
+            add(text[i]);
+            if (i + 1 < text.length && isWordChar(text.charCodeAt(i + 1))) add(text.slice(i, i + 2));
+        }
+    }
+}
+
+function invert(keysOf) {
+    // key -> Int32Array of the ids whose path has it, in id order
+    const lists = new Map();
+    paths.forEach((path, id) => {
+        keysOf(path, (key) => {
+            const ids = lists.get(key);
+            if (!ids) lists.set(key, [id]);
+            else if (ids[ids.length - 1] !== id) ids.push(id);
+        });
+    });
+    const index = new Map();
+    lists.forEach((ids, key) => index.set(key, Int32Array.from(ids)));
+    return index;
+}
+
+function build(list) {
+    paths = list;
+    nameStarts = Int32Array.from(list, (path) => path.lastIndexOf('/') + 1);
+    postings = invert(trigrams);
+    prefixes = invert(wordPrefixes);
+    counts = new Uint16Array(paths.length);
+    marks = new Uint8Array(paths.length);
+    overlaps = new Uint16Array(paths.length);
+    scores = new Uint16Array(paths.length);
+}
+
+function contains(ids, id) {
+    // Posting lists are in id order
+    let low = 0, high = ids.length - 1;
+    while (low <= high) {
+        const middle = (low + high) >> 1;
+        if (ids[middle] === id) return true;
+        if (ids[middle] < id) low = middle + 1; else high = middle - 1;
+    }
+    return false;
+}
+
+function postingLists(token) {
+    // Short tokens match the start of a word; longer ones by their trigrams, rarest first
+    if (token.length < 3) return [prefixes.get(token) || NONE];
+    const grams = new Set();
+    trigrams(token, (gram) => grams.add(gram));
+    return [...grams].map((gram) => postings.get(gram) || NONE).sort((a, b) => a.length - b.length);
+}
+
+function matchToken(token, candidates) {
+    // Files with half of the token's trigrams match, so typos are forgiven; ranking sorts them out
+    if (candidates) candidates.forEach((id) => { marks[id] = 1; });
+    const found = [];
+    const lists = postingLists(token);
+    const required = lists.length <= 3 ? 1 : Math.ceil(lists.length / 2);
+    // A file with `required` of the trigrams is in one of the rarest lists.length - required + 1
+    const seeds = lists.length - required + 1;
+    const touched = [];
+    lists.forEach((ids, list) => {
+        const seed = list < seeds;
+        const pool = seed ? candidates : touched;
+        if (pool && pool.length * 8 < ids.length) {
+            // Fewer ids in the running than in the list: look each one up instead
+            for (const id of pool) {
+                if (!contains(ids, id)) continue;
+                if (seed) {
+                    if (counts[id]++ === 0) touched.push(id);
+                } else {
+                    counts[id]++;
+                }
+            }
+        } else {
+            for (let i = 0; i < ids.length; i++) {
+                const id = ids[i];
+                if (seed) {
+                    if ((!candidates || marks[id]) && counts[id]++ === 0) touched.push(id);
+                } else if (counts[id]) {
+                    counts[id]++;
+                }
+            }
+        }
+    });
+    for (const id of touched) {
+        if (counts[id] >= required) {
+            found.push(id);
+            overlaps[id] += counts[id];
+        }
+        counts[id] = 0;
+    }
+    // Several seed lists interleave ids; keep them in list order
+    if (seeds > 1) found.sort((a, b) => a - b);
+    if (candidates) candidates.forEach((id) => { marks[id] = 0; });
+    return found;
+}
+
+function score(id, tokens) {
+    // Exact matches in the file name rank above matches in the folder, then by shared trigrams
+    const path = paths[id], start = nameStarts[id];
+    let exact = 0;
+    for (const token of tokens) {
+        const at = path.indexOf(token);
+        if (at === start) exact += 4;
+        else if (at > start || path.indexOf(token, start) >= 0) exact += 3;
+        else if (at >= 0) exact += 2;
+    }
+    return Math.min(exact, 255) * 256 + Math.min(overlaps[id], 255);
+}
+
+function search(query) {
+    // Rarest tokens first: they narrow the candidates most
+    const tokens = fold(query).split(/\s+/).filter(Boolean);
+    const rarity = new Map(tokens.map((token) => [token, postingLists(token)[0].length]));
+    tokens.sort((a, b) => rarity.get(a) - rarity.get(b));
+    let candidates = null, first = [];
+    for (const token of tokens) {
+        candidates = matchToken(token, candidates);
+        if (first.length === 0) first = candidates;
+        if (!candidates.length) break;
+    }
+    // Best score first, list order within a score: a stable bucket sort over small scores
+    const ids = Int32Array.from(candidates || []);
+    let best = 0;
+    ids.forEach((id) => { best = Math.max(best, scores[id] = score(id, tokens)); });
+    first.forEach((id) => { overlaps[id] = 0; });
+    const buckets = new Int32Array(best + 2);
+    ids.forEach((id) => { buckets[scores[id]]++; });
+    for (let total = best, start = 0; total >= 0; total--) {
+        const size = buckets[total];
+        buckets[total] = start;
+        start += size;
+    }
+    const ranked = new Int32Array(ids.length);
+    ids.forEach((id) => { ranked[buckets[scores[id]]++] = id; });
+    return ranked;
+}
+
+// {paths}: index a new selection; {query, generation}: reply with matching ids, best first
+self.onmessage = ({data}) => {
+    if (data.paths) {
+        build(data.paths);
+        return;
+    }
+    const start = performance.now();
+    const ids = search(data.query);
+    self.postMessage({generation: data.generation, ids, ms: performance.now() - start}, [ids.buffer]);
+};
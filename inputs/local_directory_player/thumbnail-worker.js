@@ -0,0 +1,94 @@
+const DB_NAME = 'local-media-player-thumbnails';
+const STORE = 'thumbnails';
+// Oldest thumbnails are dropped past this many, checked every PRUNE_EVERY writes
+const MAX_CACHED = 5000;
+const PRUNE_EVERY = 100;
+
+let database = null;
+let writes = 0;
+
+function openDatabase() {
+    if (!database) {
+        database = new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(STORE).createIndex('stored', 'stored');
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+    return database;
+}
+
+async function transaction(mode, work) {
+    const db = await openDatabase();
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(STORE, mode);
+        const result = work(tx.objectStore(STORE));
+        tx.oncomplete = () => resolve(result.result);
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+async function prune() {
+    const db = await openDatabase();
+    const tx = db.transaction(STORE, 'readwrite');
+    const store = tx.objectStore(STORE);
+    const counted = store.count();
+    counted.onsuccess = () => {
+        let excess = counted.result - MAX_CACHED;
+        if (excess <= 0) return;
+        store.index('stored').openKeyCursor().onsuccess = (event) => {
+            const cursor = event.target.result;
+            if (cursor && excess-- > 0) {
+                store.delete(cursor.primaryKey);
+                cursor.continue();
+            }
+        };
+    };
+}
+
+async function encode(bitmap) {
+    // Fit within THUMB_SIZE and compress; the cache holds small JPEGs only
+    const scale = Math.min(1, THUMB_SIZE / Math.max(bitmap.width, bitmap.height));
+    const canvas = new OffscreenCanvas(
+        Math.max(1, Math.round(bitmap.width * scale)),
+        Math.max(1, Math.round(bitmap.height * scale))
+    );
+    canvas.getContext('2d').drawImage(bitmap, 0, 0, canvas.width, canvas.height);
+    bitmap.close();
+    return canvas.convertToBlob({type: 'image/jpeg', quality: 0.8});
+}
+
+async function store(key, blob) {
+    await transaction('readwrite', (s) => s.put({blob, stored: Date.now()}, key)).catch(() => {});
+    if (++writes % PRUNE_EVERY === 0) prune().catch(() => {});
+}
+
+// {key, file, kind}: reply with a cached or new thumbnail, or ask for a video frame
+// {key, bitmap}: a captured video frame to encode and cache
+self.onmessage = async ({data}) => {
+    const {key} = data;
+    try {
+        if (data.bitmap) {
+            const blob = await encode(data.bitmap);
+            await store(key, blob);
+            self.postMessage({key, blob});
+            return;
+        }
+        const cached = await transaction('readonly', (s) => s.get(key)).catch(() => null);
+        if (cached) {
+            self.postMessage({key, blob: cached.blob});
+        } else if (data.kind === 'image') {
+            const bitmap = await createImageBitmap(data.file, {resizeWidth: THUMB_SIZE, resizeQuality: 'medium'});
+            const blob = await encode(bitmap);
+            await store(key, blob);
+            self.postMessage({key, blob});
+        } else {
+            self.postMessage({key, needFrame: true});
+        }
+    } catch (error) {
+        self.postMessage({key, error: String(error)});
+    }
+};
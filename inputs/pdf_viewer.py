@@ -0,0 +1,219 @@
+"""Lazily paged PDF viewer backed by pdf.js and HTTP range requests."""
+import json
+import os
+
+import streamlit.components.v1 as components
+
+# Where pdf.js is loaded from (override with PDFJS_URL, e.g. for a self-hosted copy)
+PDFJS_URL = os.environ.get("PDFJS_URL", "https://cdn.jsdelivr.net/npm/pdfjs-dist@3.11.174/build")
+
+# Pages rendered ahead of the last visible page
+PREFETCH_PAGES = 2
+# Rendered pages kept on either side of the visible ones; others are released
+KEEP_PAGES = 4
+
+_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body {
+            margin: 0;
+            font-family: "Source Sans Pro", sans-serif;
+            background: #525659;
+            color: #fafafa;
+        }
+        #toolbar {
+            position: sticky;
+            top: 0;
+            z-index: 1;
+            display: flex;
+            gap: 8px;
+            align-items: center;
+            padding: 6px 12px;
+            background: #323639;
+            font-size: 14px;
+        }
+        #toolbar input {
+            width: 4em;
+        }
+        #viewer {
+            height: calc(100vh - 36px);
+            overflow-y: auto;
+        }
+        .page {
+            margin: 12px auto;
+            background: white;
+            box-shadow: 0 2px 6px rgba(0,0,0,0.4);
+        }
+        .page canvas {
+            display: block;
+        }
+        #status {
+            margin-left: auto;
+            color: #bbb;
+        }
+    </style>
+</head>
+<body>
+    <div id="toolbar">
+        Page <input id="page-input" type="number" min="1" value="1"> / <span id="page-count">…</span>
+        <button id="zoom-out">−</button>
+        <button id="zoom-in">+</button>
+        <span id="status">Loading…</span>
+    </div>
+    <div id="viewer"></div>
+
+    <script src="__PDFJS_URL__/pdf.min.js"></script>
+    <script>
+        const PDF_URL = __PDF_URL_JSON__;
+        const PREFETCH = __PREFETCH__;
+        const KEEP = __KEEP__;
+
+        pdfjsLib.GlobalWorkerOptions.workerSrc = "__PDFJS_URL__/pdf.worker.min.js";
+
+        const viewer = document.getElementById('viewer');
+        const pageInput = document.getElementById('page-input');
+        const pageCount = document.getElementById('page-count');
+        const status = document.getElementById('status');
+
+        let pdf = null;
+        let scale = 1;
+        let baseViewport = null;
+        const pages = [];          // {el, canvas, rendering, width, height}
+        const visible = new Set();
+
+        // Only fetch the byte ranges needed for the pages being rendered
+        const loadingTask = pdfjsLib.getDocument({
+            url: PDF_URL,
+            disableAutoFetch: true,
+            disableStream: true,
+            rangeChunkSize: 262144,
+        });
+
+        loadingTask.promise.then(async (doc) => {
+            pdf = doc;
+            pageCount.textContent = pdf.numPages;
+            pageInput.max = pdf.numPages;
+            const first = await pdf.getPage(1);
+            baseViewport = first.getViewport({scale: 1});
+            scale = Math.min(2, (viewer.clientWidth - 32) / baseViewport.width);
+
+            // Placeholders sized like the first page; corrected once rendered
+            for (let i = 1; i <= pdf.numPages; i++) {
+                const el = document.createElement('div');
+                el.className = 'page';
+                el.dataset.page = i;
+                viewer.appendChild(el);
+                pages.push({el: el, canvas: null, rendering: false,
+                            width: baseViewport.width, height: baseViewport.height});
+                sizePlaceholder(pages[i - 1]);
+                observer.observe(el);
+            }
+            status.textContent = '';
+        }).catch((err) => {
+            status.textContent = 'Failed to load PDF: ' + err.message;
+        });
+
+        const observer = new IntersectionObserver((entries) => {
+            for (const entry of entries) {
+                const n = Number(entry.target.dataset.page);
+                if (entry.isIntersecting) visible.add(n); else visible.delete(n);
+            }
+            schedule();
+        }, {root: viewer, rootMargin: '200px 0px'});
+
+        function sizePlaceholder(state) {
+            state.el.style.width = Math.floor(state.width * scale) + 'px';
+            state.el.style.height = Math.floor(state.height * scale) + 'px';
+        }
+
+        function schedule() {
+            if (!visible.size) return;
+            const lo = Math.min(...visible);
+            const hi = Math.min(pdf.numPages, Math.max(...visible) + PREFETCH);
+            pageInput.value = lo;
+
+            for (let n = lo; n <= hi; n++) renderPage(n);
+            // Bound memory: drop canvases far away from the viewport
+            pages.forEach((state, i) => {
+                const n = i + 1;
+                if (state.canvas && (n < lo - KEEP || n > hi + KEEP)) releasePage(state);
+            });
+        }
+
+        async function renderPage(n) {
+            const state = pages[n - 1];
+            if (state.canvas || state.rendering) return;
+            state.rendering = true;
+            try {
+                const page = await pdf.getPage(n);
+                const base = page.getViewport({scale: 1});
+                state.width = base.width;
+                state.height = base.height;
+                sizePlaceholder(state);
+
+                const ratio = window.devicePixelRatio || 1;
+                const viewport = page.getViewport({scale: scale * ratio});
+                const canvas = document.createElement('canvas');
+                canvas.width = Math.floor(viewport.width);
+                canvas.height = Math.floor(viewport.height);
+                canvas.style.width = state.el.style.width;
+                canvas.style.height = state.el.style.height;
+                await page.render({canvasContext: canvas.getContext('2d'), viewport: viewport}).promise;
+                page.cleanup();
+                state.el.replaceChildren(canvas);
+                state.canvas = canvas;
+            } finally {
+                state.rendering = false;
+            }
+        }
+
+        function releasePage(state) {
+            // Shrinking the canvas frees its backing store immediately
+            state.canvas.width = 0;
+            state.canvas.height = 0;
+            state.el.replaceChildren();
+            state.canvas = null;
+        }
+
+        function setScale(newScale) {
+            scale = Math.max(0.25, Math.min(4, newScale));
+            pages.forEach((state) => {
+                if (state.canvas) releasePage(state);
+                sizePlaceholder(state);
+            });
+            schedule();
+        }
+
+        document.getElementById('zoom-in').onclick = () => setScale(scale * 1.25);
+        document.getElementById('zoom-out').onclick = () => setScale(scale / 1.25);
+        pageInput.addEventListener('change', () => {
+            const n = Math.max(1, Math.min(pdf.numPages, Number(pageInput.value) || 1));
+            pages[n - 1].el.scrollIntoView();
+        });
+    </script>
+</body>
+</html>
+"""
+
+
+def render_pdf_viewer(url, height=800):
+    """Render a PDF that loads and renders only the pages being viewed.
+
+    The document is fetched with HTTP range requests, pages are rendered as
+    they scroll into view (plus a few ahead), and canvases far from the
+    viewport are released so memory stays bounded for any page count.
+
+    Args:
+        url: Range-capable URL of the PDF, e.g. from the media server
+        height: Height of the viewer in pixels
+    """
+    html = (
+        _TEMPLATE
+        .replace("__PDFJS_URL__", PDFJS_URL.rstrip("/"))
+        .replace("__PDF_URL_JSON__", json.dumps(url))
+        .replace("__PREFETCH__", str(PREFETCH_PAGES))
+        .replace("__KEEP__", str(KEEP_PAGES))
+    )
+    components.html(html, height=height, scrolling=False)
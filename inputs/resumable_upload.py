@@ -0,0 +1,242 @@
+"""Browser client for the media server's resumable, chunked upload endpoint."""
+import json
+
+import streamlit.components.v1 as components
+
+# Chunks sent at the same time for each file
+PARALLEL_CHUNKS = 4
+# Attempts per request before an upload is paused with an error
+MAX_RETRIES = 8
+
+_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body {
+            margin: 0;
+            font-family: "Source Sans Pro", sans-serif;
+            font-size: 14px;
+            color: inherit;
+        }
+        .upload {
+            margin-top: 8px;
+        }
+        .upload .name {
+            overflow: hidden;
+            white-space: nowrap;
+            text-overflow: ellipsis;
+        }
+        .upload progress {
+            width: 100%;
+        }
+        .upload .detail {
+            color: #888;
+            font-size: 12px;
+        }
+        .upload.error .detail {
+            color: #d33;
+        }
+    </style>
+</head>
+<body>
+    <input id="picker" type="file" multiple accept="__ACCEPT__">
+    <div id="uploads"></div>
+
+    <script>
+        const ENDPOINT = __ENDPOINT_JSON__;
+        const AUTH = {'Authorization': 'Bearer ' + __TOKEN_JSON__};
+        const CHUNK = __CHUNK__;
+        const PARALLEL = __PARALLEL__;
+        const MAX_RETRIES = __RETRIES__;
+
+        const picker = document.getElementById('picker');
+        const uploads = document.getElementById('uploads');
+
+        class FatalError extends Error {}
+
+        const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+        // Upload ids are remembered per file so a reload or a new session
+        // resumes instead of starting over
+        function storageKey(file) {
+            return ['resumable-upload', file.name, file.size, file.lastModified].join(':');
+        }
+        function recall(key) {
+            try { return localStorage.getItem(key); } catch (e) { return null; }
+        }
+        function remember(key, id) {
+            try {
+                if (id) localStorage.setItem(key, id); else localStorage.removeItem(key);
+            } catch (e) {}
+        }
+
+        function formatBytes(bytes) {
+            const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+            let i = 0;
+            while (bytes >= 1024 && i < units.length - 1) { bytes /= 1024; i++; }
+            return bytes.toFixed(i ? 1 : 0) + ' ' + units[i];
+        }
+
+        // Retries network failures and server errors with jittered backoff;
+        // a full store (507) is final
+        async function send(url, options) {
+            for (let attempt = 0; ; attempt++) {
+                let response = null;
+                try { response = await fetch(url, options); } catch (e) {}
+                if (response && (response.status < 500 || response.status === 507)) return response;
+                if (attempt + 1 >= MAX_RETRIES) {
+                    throw new Error(response ? 'Server error ' + response.status : 'Connection lost');
+                }
+                await sleep(Math.min(500 * 2 ** attempt, 30000) * (0.5 + Math.random()));
+            }
+        }
+
+        async function openUpload(file) {
+            const key = storageKey(file);
+            const known = recall(key);
+            if (known) {
+                const response = await send(ENDPOINT + known, {headers: AUTH});
+                if (response.ok) return response.json();
+                remember(key, null);
+            }
+            const response = await send(ENDPOINT, {
+                method: 'POST',
+                headers: {...AUTH, 'Content-Type': 'application/json'},
+                body: JSON.stringify({name: file.name, size: file.size}),
+            });
+            const status = await response.json().catch(() => ({}));
+            if (!response.ok) throw new FatalError(status.message || 'Upload refused (' + response.status + ')');
+            if (!status.complete) remember(key, status.id);
+            return status;
+        }
+
+        // Chunks of [0, size) not covered by the ranges the server already has
+        function missingChunks(ranges, size) {
+            const chunks = [];
+            let position = 0;
+            for (const [low, high] of ranges.concat([[size, size]])) {
+                for (let start = position; start < low; start += CHUNK) {
+                    chunks.push([start, Math.min(start + CHUNK, low)]);
+                }
+                position = Math.max(position, high);
+            }
+            return chunks;
+        }
+
+        async function upload(file, view) {
+            const status = await openUpload(file);
+            if (status.complete) return status;
+
+            const queue = missingChunks(status.ranges, file.size);
+            const resumedAt = status.received;
+            let received = status.received;
+            let result = null;
+            let failed = false;
+            const started = performance.now();
+            view.update(received, 0);
+
+            async function worker() {
+                while (queue.length && !failed) {
+                    const [start, end] = queue.shift();
+                    const response = await send(ENDPOINT + status.id, {
+                        method: 'PATCH',
+                        headers: {
+                            ...AUTH,
+                            'Upload-Offset': String(start),
+                            'Content-Type': 'application/offset+octet-stream',
+                        },
+                        body: file.slice(start, end),
+                    });
+                    const body = await response.json().catch(() => ({}));
+                    if (!response.ok) {
+                        failed = true;
+                        throw new FatalError(body.message || 'Upload failed (' + response.status + ')');
+                    }
+                    received += end - start;
+                    view.update(received, (received - resumedAt) / ((performance.now() - started) / 1000));
+                    if (body.complete) result = body;
+                }
+            }
+
+            try {
+                await Promise.all(Array.from({length: PARALLEL}, worker));
+            } catch (e) {
+                failed = true;
+                throw e;
+            }
+            remember(storageKey(file), null);
+            return result;
+        }
+
+        function createView(file) {
+            const element = document.createElement('div');
+            element.className = 'upload';
+            element.innerHTML = '<div class="name"></div><progress max="1" value="0"></progress><div class="detail"></div>';
+            element.querySelector('.name').textContent = file.name;
+            uploads.prepend(element);
+            const bar = element.querySelector('progress');
+            const detail = element.querySelector('.detail');
+            return {
+                update(received, rate) {
+                    bar.value = file.size ? received / file.size : 1;
+                    detail.textContent = formatBytes(received) + ' of ' + formatBytes(file.size) +
+                        (rate ? ' · ' + formatBytes(rate) + '/s' : '');
+                },
+                done(name) {
+                    bar.value = 1;
+                    detail.textContent = 'Stored as ' + name;
+                },
+                fail(message) {
+                    element.classList.add('error');
+                    detail.textContent = message + ' — choose the file again to resume';
+                },
+            };
+        }
+
+        picker.addEventListener('change', async () => {
+            const files = Array.from(picker.files);
+            picker.value = '';
+            // Files go one after another; each uses PARALLEL connections
+            for (const file of files) {
+                const view = createView(file);
+                try {
+                    const status = await upload(file, view);
+                    view.done(status.name);
+                } catch (e) {
+                    view.fail(e.message);
+                }
+            }
+        });
+    </script>
+</body>
+</html>
+"""
+
+
+def render_resumable_uploader(endpoint, token, accept, chunk_size, height=220):
+    """Render a file picker that uploads in parallel chunks and can resume.
+
+    Each file is split into chunks sent PARALLEL_CHUNKS at a time straight to
+    the media server, so it is never held in memory or sent through
+    Streamlit. Failed chunks are retried with backoff, and choosing the same
+    file again after a dropped connection or a page reload only sends the
+    chunks the server is missing.
+
+    Args:
+        endpoint: URL of the media server's resumable upload route
+        token: Upload token from ResumableUploads.issue_token()
+        accept: Comma-separated file suffixes offered by the picker
+        chunk_size: Bytes per chunk
+        height: Height of the component in pixels
+    """
+    html = (
+        _TEMPLATE
+        .replace("__ENDPOINT_JSON__", json.dumps(endpoint))
+        .replace("__TOKEN_JSON__", json.dumps(token))
+        .replace("__ACCEPT__", accept)
+        .replace("__CHUNK__", str(int(chunk_size)))
+        .replace("__PARALLEL__", str(PARALLEL_CHUNKS))
+        .replace("__RETRIES__", str(MAX_RETRIES))
+    )
+    components.html(html, height=height, scrolling=True)
@@ -0,0 +1,247 @@
+"""Memory-mapped, paginated viewer for large text and Markdown files."""
+import bisect
+import math
+import mmap
+import re
+
+import numpy as np
+import streamlit as st
+
+# Lines between stored offsets in the line index; lookups scan at most this many lines
+CHECKPOINT_LINES = 1024
+# Bytes scanned per step while building the index
+INDEX_CHUNK_BYTES = 4 * 1024 * 1024
+# Largest Markdown section rendered at once
+MAX_SECTION_BYTES = 512 * 1024
+# Maximum number of search matches listed
+SEARCH_LIMIT = 200
+
+LINES_PER_PAGE = [100, 500, 1000]
+
+_HEADING_RE = re.compile(rb"^(#{1,6})[ \t]+(.+?)[ \t#]*\r?$", re.MULTILINE)
+
+
+class TextDocument:
+    """Read-only, line-addressable view of a text file.
+
+    The file is memory-mapped and never decoded as a whole. A sparse index
+    stores the byte offset of every CHECKPOINT_LINES-th line, so any window
+    of lines can be located with one lookup and a short scan.
+    """
+
+    def __init__(self, path):
+        """Map the file and build its line index.
+
+        Args:
+            path: Text file on disk
+        """
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            self.size = f.seek(0, 2)
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self._build_index()
+        self._sections = None
+        self._last_search = (None, None)
+
+    def _build_index(self):
+        """Record checkpoint offsets and count lines in one vectorised pass."""
+        checkpoints = [0]
+        newlines = 0
+        for start in range(0, self.size, INDEX_CHUNK_BYTES):
+            count = min(INDEX_CHUNK_BYTES, self.size - start)
+            chunk = np.frombuffer(self._data, dtype=np.uint8, count=count, offset=start)
+            # Line k starts right after the k-th newline
+            line_starts = np.flatnonzero(chunk == 10) + start + 1
+            first = (-newlines - 1) % CHECKPOINT_LINES
+            checkpoints.extend(line_starts[first::CHECKPOINT_LINES].tolist())
+            newlines += len(line_starts)
+
+        ends_with_newline = self.size and self._data[self.size - 1:self.size] == b"\n"
+        self.line_count = newlines + (0 if ends_with_newline or not self.size else 1)
+        # Drop a checkpoint pointing at the end of the file
+        if checkpoints and checkpoints[-1] >= self.size and len(checkpoints) > 1:
+            checkpoints.pop()
+        self._checkpoints = checkpoints
+
+    def line_offset(self, line):
+        """Return the byte offset where a (0-based) line starts."""
+        line = max(0, min(line, self.line_count))
+        checkpoint = min(line // CHECKPOINT_LINES, len(self._checkpoints) - 1)
+        offset = self._checkpoints[checkpoint]
+        for _ in range(line - checkpoint * CHECKPOINT_LINES):
+            newline = self._data.find(b"\n", offset)
+            if newline == -1:
+                return self.size
+            offset = newline + 1
+        return offset
+
+    def line_at(self, offset):
+        """Return the (0-based) line containing a byte offset."""
+        checkpoint = bisect.bisect_right(self._checkpoints, offset) - 1
+        start = self._checkpoints[checkpoint]
+        return checkpoint * CHECKPOINT_LINES + self._data[start:offset].count(b"\n")
+
+    def lines(self, start, count):
+        """Decode a window of lines.
+
+        Args:
+            start: First line (0-based)
+            count: Number of lines
+
+        Returns:
+            list: Decoded lines without their line endings
+        """
+        begin = self.line_offset(start)
+        end = self.line_offset(start + count)
+        text = self._data[begin:end].decode("utf-8", errors="replace")
+        return text.splitlines()
+
+    def search(self, query, limit=SEARCH_LIMIT, case_sensitive=False):
+        """Find lines containing a string, scanning the raw bytes.
+
+        Args:
+            query: Text to look for
+            limit: Maximum number of matches to return
+            case_sensitive: Match case exactly (case folding is ASCII-only)
+
+        Returns:
+            list: (line number, line text) tuples in file order
+        """
+        cache_key = (query, limit, case_sensitive)
+        if self._last_search[0] == cache_key:
+            return self._last_search[1]
+
+        flags = 0 if case_sensitive else re.IGNORECASE
+        pattern = re.compile(re.escape(query.encode("utf-8")), flags)
+        matches = []
+        position = 0
+        while len(matches) < limit:
+            match = pattern.search(self._data, position)
+            if match is None:
+                break
+            line = self.line_at(match.start())
+            matches.append((line, self.lines(line, 1)[0] if self.line_count else ""))
+            # Continue after the end of this line so each line is listed once
+            newline = self._data.find(b"\n", match.end())
+            if newline == -1:
+                break
+            position = newline + 1
+
+        self._last_search = (cache_key, matches)
+        return matches
+
+    def sections(self):
+        """Return Markdown headings as (level, title, byte offset) tuples."""
+        if self._sections is None:
+            self._sections = [
+                (len(m.group(1)), m.group(2).decode("utf-8", errors="replace"), m.start())
+                for m in _HEADING_RE.finditer(self._data)
+            ]
+        return self._sections
+
+    def section_text(self, index):
+        """Decode one Markdown section, from its heading to the next one.
+
+        Returns:
+            tuple: (text, whether the section was truncated)
+        """
+        sections = self.sections()
+        start = sections[index][2]
+        end = sections[index + 1][2] if index + 1 < len(sections) else self.size
+        truncated = end - start > MAX_SECTION_BYTES
+        end = min(end, start + MAX_SECTION_BYTES)
+        return self._data[start:end].decode("utf-8", errors="replace"), truncated
+
+    def preamble_text(self):
+        """Decode any Markdown before the first heading (capped like sections)."""
+        sections = self.sections()
+        end = sections[0][2] if sections else self.size
+        return self._data[:min(end, MAX_SECTION_BYTES)].decode("utf-8", errors="replace")
+
+
+@st.cache_resource(max_entries=8)
+def open_text_document(path, size, mtime):
+    """Open a TextDocument shared across reruns and sessions.
+
+    Size and mtime are part of the cache key so a changed file is re-indexed.
+    """
+    return TextDocument(path)
+
+
+def render_text_viewer(document, key, markdown=False):
+    """Render a paginated viewer for a TextDocument.
+
+    Args:
+        document: TextDocument to display
+        key: Unique prefix for widget keys
+        markdown: Render Markdown section by section instead of raw lines
+    """
+    if markdown and document.sections():
+        _render_markdown_sections(document, key)
+        return
+
+    total = document.line_count
+    if not total:
+        st.info("This file is empty.")
+        return
+
+    col_size, col_page, col_jump = st.columns(3)
+    with col_size:
+        page_size = st.selectbox("Lines per page", LINES_PER_PAGE, key=f"{key}_page_size")
+    pages = max(1, math.ceil(total / page_size))
+    with col_page:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    with col_jump:
+        jump = st.number_input(
+            "Go to line", min_value=0, max_value=total, value=0, key=f"{key}_jump",
+            help="0 to browse by page"
+        )
+
+    start = (page - 1) * page_size
+    if jump:
+        start = jump - 1
+
+    query = st.text_input("Search", placeholder="Search the whole file", key=f"{key}_search")
+    if query:
+        matches = document.search(query)
+        more = "+" if len(matches) == SEARCH_LIMIT else ""
+        st.caption(f"{len(matches)}{more} matching line(s)")
+        if matches:
+            choice = st.selectbox(
+                "Matches",
+                range(len(matches)),
+                format_func=lambda i: f"Line {matches[i][0] + 1}: {matches[i][1][:100]}",
+                key=f"{key}_match"
+            )
+            # Show the selected match near the top of the window
+            start = max(0, matches[choice][0] - 5)
+
+    lines = document.lines(start, page_size)
+    width = len(str(start + len(lines)))
+    numbered = "\n".join(f"{start + i + 1:>{width}}  {line}" for i, line in enumerate(lines))
+    st.caption(f"Lines {start + 1}–{start + len(lines)} of {total:,}")
+    st.code(numbered, language=None)
+
+
+def _render_markdown_sections(document, key):
+    """Render one Markdown section at a time with a section picker."""
+    sections = document.sections()
+    preamble = document.preamble_text().strip()
+    offset = 1 if preamble else 0
+    titles = (["(Introduction)"] if preamble else []) + [
+        f"{'  ' * (level - 1)}{title}" for level, title, _ in sections
+    ]
+
+    choice = st.selectbox(
+        f"Section (of {len(titles)})",
+        range(len(titles)),
+        format_func=lambda i: titles[i],
+        key=f"{key}_section"
+    )
+    if preamble and choice == 0:
+        st.markdown(preamble)
+        return
+    text, truncated = document.section_text(choice - offset)
+    st.markdown(text)
+    if truncated:
+        st.caption("Section truncated; download the file to read it in full.")
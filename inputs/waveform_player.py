@@ -0,0 +1,153 @@
+"""Audio player drawn over the file's precomputed waveform peaks."""
+import json
+
+import streamlit.components.v1 as components
+
+_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body {
+            margin: 0;
+            font-family: "Source Sans Pro", sans-serif;
+            font-size: 12px;
+            color: #888;
+        }
+        #wave {
+            display: block;
+            width: 100%;
+            height: __WAVE_HEIGHT__px;
+            cursor: pointer;
+            touch-action: none;
+        }
+        audio {
+            display: block;
+            width: 100%;
+            height: 40px;
+        }
+    </style>
+</head>
+<body>
+    <canvas id="wave"></canvas>
+    <audio id="audio" controls preload="metadata"></audio>
+    <script>
+        const AUDIO = __AUDIO_JSON__;
+        const PEAKS = __PEAKS_JSON__;
+        const PLAYED = '#ff4b4b';
+        const UNPLAYED = '#b0b4bc';
+
+        const audio = document.getElementById('audio');
+        const canvas = document.getElementById('wave');
+        const context = canvas.getContext('2d');
+        let peaks = null;   // Int8Array of interleaved (min, max) pairs
+        let seconds = 0;    // Duration the peaks cover
+        let columns = null; // Peaks reduced to one (min, max) per pixel column
+
+        audio.src = AUDIO;
+
+        // audiowaveform .dat: version, flags, sample rate, samples per peak, peak count
+        fetch(PEAKS).then((response) => {
+            if (!response.ok) throw new Error(response.status);
+            return response.arrayBuffer();
+        }).then((buffer) => {
+            const header = new DataView(buffer, 0, 20);
+            const rate = header.getInt32(8, true);
+            const perPeak = header.getInt32(12, true);
+            const count = header.getUint32(16, true);
+            peaks = new Int8Array(buffer, 20, count * 2);
+            seconds = count * perPeak / rate;
+            resize();
+        }).catch(() => { canvas.style.display = 'none'; });
+
+        function resize() {
+            const ratio = window.devicePixelRatio || 1;
+            canvas.width = Math.max(1, Math.round(canvas.clientWidth * ratio));
+            canvas.height = Math.max(1, Math.round(canvas.clientHeight * ratio));
+            columns = null;
+            draw();
+        }
+
+        function reduce() {
+            // Each pixel column shows the extremes of the peaks it covers
+            const count = peaks.length / 2;
+            const width = canvas.width;
+            columns = new Int8Array(width * 2);
+            for (let x = 0; x < width; x++) {
+                const start = Math.floor(x * count / width);
+                const end = Math.max(start + 1, Math.floor((x + 1) * count / width));
+                let low = 127, high = -128;
+                for (let i = start; i < end && i < count; i++) {
+                    if (peaks[2 * i] < low) low = peaks[2 * i];
+                    if (peaks[2 * i + 1] > high) high = peaks[2 * i + 1];
+                }
+                columns[2 * x] = low;
+                columns[2 * x + 1] = high;
+            }
+        }
+
+        function draw() {
+            if (!peaks) return;
+            if (!columns) reduce();
+            const width = canvas.width, height = canvas.height, middle = height / 2;
+            const duration = audio.duration || seconds;
+            const played = duration ? audio.currentTime / duration * width : 0;
+            context.clearRect(0, 0, width, height);
+            for (let x = 0; x < width; x++) {
+                const top = middle - columns[2 * x + 1] / 128 * middle;
+                const bottom = middle - columns[2 * x] / 128 * middle;
+                context.fillStyle = x < played ? PLAYED : UNPLAYED;
+                context.fillRect(x, top, 1, Math.max(1, bottom - top));
+            }
+        }
+
+        function seek(event) {
+            const duration = audio.duration || seconds;
+            if (!duration) return;
+            const box = canvas.getBoundingClientRect();
+            const fraction = Math.min(Math.max((event.clientX - box.left) / box.width, 0), 1);
+            audio.currentTime = fraction * duration;
+            draw();
+        }
+
+        canvas.addEventListener('pointerdown', (event) => {
+            canvas.setPointerCapture(event.pointerId);
+            seek(event);
+        });
+        canvas.addEventListener('pointermove', (event) => {
+            if (canvas.hasPointerCapture(event.pointerId)) seek(event);
+        });
+
+        // Redraw smoothly while playing, and once on every other change
+        function animate() {
+            draw();
+            if (!audio.paused) requestAnimationFrame(animate);
+        }
+        audio.addEventListener('play', () => requestAnimationFrame(animate));
+        ['pause', 'seeked', 'loadedmetadata', 'ended'].forEach((name) => audio.addEventListener(name, draw));
+        new ResizeObserver(resize).observe(canvas);
+    </script>
+</body>
+</html>
+"""
+
+
+def render_waveform_player(audio_url, peaks_url, height=120):
+    """Render an audio player with a clickable waveform.
+
+    The waveform is drawn from precomputed peaks, so it appears as soon as
+    the small peaks file has loaded, however long the recording. Clicking or
+    dragging on it seeks.
+
+    Args:
+        audio_url: URL of the audio file on the media server
+        peaks_url: URL of its peaks file (see processing.waveform)
+        height: Height of the component in pixels, player controls included
+    """
+    html = (
+        _TEMPLATE
+        .replace("__WAVE_HEIGHT__", str(max(height - 48, 24)))
+        .replace("__AUDIO_JSON__", json.dumps(audio_url))
+        .replace("__PEAKS_JSON__", json.dumps(peaks_url))
+    )
+    components.html(html, height=height)
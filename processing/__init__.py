@@ -0,0 +1,59 @@
+"""Derived assets generated from uploaded media files."""
+from .jobs import JobScheduler, JobCancelled, JOBS_FILENAME, VIEW_PRIORITY
+from .thumbnails import (
+    ThumbnailCache, THUMBNAIL_SIZES, THUMBNAIL_MIME, THUMBNAIL_PREFIX,
+    thumbnail_job, thumbnail_path, thumbnail_route, thumbnails_available,
+)
+from .transcode import (
+    RENDITION_PREFIX, TRANSCODE_CONCURRENCY, TRANSCODE_THREADS, discard_rendition, needs_rendition,
+    rendition_for, rendition_path, rendition_route, transcode_job, transcoding_available,
+)
+from .hls import HLS_PREFIX, discard_package, hls_job, hls_path, hls_route, needs_hls, package_status
+from .metadata import MediaProber, probe_file, sniff
+from .waveform import (
+    WAVEFORM_PREFIX, discard_waveform, needs_waveform, waveform_for, waveform_job, waveform_path,
+    waveform_route, waveforms_available,
+)
+
+__all__ = [
+    'JobScheduler',
+    'JobCancelled',
+    'JOBS_FILENAME',
+    'VIEW_PRIORITY',
+    'ThumbnailCache',
+    'THUMBNAIL_SIZES',
+    'THUMBNAIL_MIME',
+    'THUMBNAIL_PREFIX',
+    'thumbnail_job',
+    'thumbnail_path',
+    'thumbnail_route',
+    'thumbnails_available',
+    'RENDITION_PREFIX',
+    'TRANSCODE_CONCURRENCY',
+    'TRANSCODE_THREADS',
+    'discard_rendition',
+    'needs_rendition',
+    'rendition_for',
+    'rendition_path',
+    'rendition_route',
+    'transcode_job',
+    'transcoding_available',
+    'HLS_PREFIX',
+    'discard_package',
+    'hls_job',
+    'hls_path',
+    'hls_route',
+    'needs_hls',
+    'package_status',
+    'MediaProber',
+    'probe_file',
+    'sniff',
+    'WAVEFORM_PREFIX',
+    'discard_waveform',
+    'needs_waveform',
+    'waveform_for',
+    'waveform_job',
+    'waveform_path',
+    'waveform_route',
+    'waveforms_available',
+]
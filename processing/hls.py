@@ -0,0 +1,199 @@
+"""HLS adaptive-bitrate packaging of large videos.
+
+Each large video is encoded by a local ffmpeg into a ladder of H.264/AAC
+variants (up to the source's own height), cut into short segments with
+aligned keyframes so players can switch quality at any segment boundary.
+Playlists are written as EVENT playlists that grow while ffmpeg runs, so
+playback can start as soon as the first segments exist rather than once the
+whole video is packaged. Packages are cached by content and served by the
+media server under /hls/<content key>/.
+"""
+import os
+import re
+import shutil
+from http import HTTPStatus
+from pathlib import Path
+
+from .thumbnails import cache_key
+from .transcode import AAC_ARGS, FFMPEG, probe, run_ffmpeg
+
+# Videos at least this large are packaged for adaptive streaming (override with HLS_MIN_BYTES)
+HLS_MIN_BYTES = int(os.environ.get("HLS_MIN_BYTES", 50 * 1024 * 1024))
+# Target segment length in seconds (override with HLS_SEGMENT_SECONDS)
+HLS_SEGMENT_SECONDS = int(os.environ.get("HLS_SEGMENT_SECONDS", 4))
+
+# Variant ladder as (height, video kbit/s); rungs taller than the source are skipped
+HLS_LADDER = [
+    (240, 400),
+    (360, 800),
+    (480, 1400),
+    (720, 2800),
+    (1080, 5000),
+]
+
+MASTER_PLAYLIST = "master.m3u8"
+
+# Media server route prefix serving packages as /hls/<content key>/<file>
+HLS_PREFIX = "/hls/"
+
+HLS_MIME = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+# Segments never change once written; playlists grow while packaging runs
+SEGMENT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PLAYLIST_CACHE_CONTROL = "no-cache"
+
+# Files a package may contain, relative to its directory
+_PACKAGE_FILE_RE = re.compile(r"^(master\.m3u8|v\d+/index\.m3u8|v\d+/seg\d+\.ts)$")
+_KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def needs_hls(record):
+    """Check whether a stored file is a video large enough to package for adaptive streaming."""
+    return record["type"] == "Video" and record["size"] >= HLS_MIN_BYTES
+
+
+def package_dir(root, record):
+    """Return the directory holding the HLS package of a video."""
+    key = cache_key(record)
+    return Path(root) / key[:2] / key
+
+
+def package_status(root, record):
+    """Report how far a video's HLS package has been written.
+
+    Returns:
+        str or None: "complete" once every variant playlist has ended,
+        "partial" while segments are still being added (or after packaging
+        was interrupted), None if there is no playable package
+    """
+    directory = package_dir(root, record)
+    if not (directory / MASTER_PLAYLIST).exists():
+        return None
+    playlists = list(directory.glob("v*/index.m3u8"))
+    if playlists and all(b"#EXT-X-ENDLIST" in path.read_bytes()[-64:] for path in playlists):
+        return "complete"
+    return "partial"
+
+
+def hls_path(record):
+    """Return the media server URL path of a video's master playlist."""
+    return f"{HLS_PREFIX}{cache_key(record)}/{MASTER_PLAYLIST}"
+
+
+def discard_package(root, record):
+    """Remove the HLS package of a video, if any."""
+    shutil.rmtree(package_dir(root, record), ignore_errors=True)
+
+
+def ladder_for(height):
+    """Return the ladder rungs suited to a source of the given height (at least one)."""
+    rungs = [rung for rung in HLS_LADDER if height is None or rung[0] <= height]
+    return rungs or HLS_LADDER[:1]
+
+
+def hls_job(record, params, progress):
+    """Job packaging a video as HLS with several renditions.
+
+    Runs in a JobScheduler worker process. Any earlier, interrupted package
+    is replaced; a cancelled or failed run leaves nothing behind.
+
+    Args:
+        record: Index record of the video
+        params: {"cache_dir": package cache directory, "threads": encoder
+            threads, "segment_seconds": target segment length}
+        progress: Progress callback
+
+    Returns:
+        dict: "variants" (heights) and "bytes" written
+    """
+    directory = package_dir(params["cache_dir"], record)
+    if package_status(params["cache_dir"], record) == "complete":
+        return {"variants": [], "bytes": 0}
+    shutil.rmtree(directory, ignore_errors=True)
+
+    info = probe(record["path"])
+    if info["video"] is None:
+        raise ValueError("No video stream found")
+    rungs = ladder_for(info["height"])
+    segment = params.get("segment_seconds", HLS_SEGMENT_SECONDS)
+
+    # One decode feeds every variant
+    splits = "".join(f"[s{i}]" for i in range(len(rungs)))
+    graph = [f"[0:v:0]split={len(rungs)}{splits}"]
+    graph += [f"[s{i}]scale=-2:{height}[v{i}]" for i, (height, _) in enumerate(rungs)]
+    command = [
+        FFMPEG, "-hide_banner", "-nostdin", "-loglevel", "error", "-y", "-i", record["path"],
+        "-filter_complex", ";".join(graph),
+    ]
+    stream_map = []
+    for i, (_, kbits) in enumerate(rungs):
+        command += ["-map", f"[v{i}]"]
+        if info["audio"]:
+            command += ["-map", "0:a:0"]
+        command += [f"-b:v:{i}", f"{kbits}k", f"-maxrate:v:{i}", f"{kbits * 107 // 100}k",
+                    f"-bufsize:v:{i}", f"{kbits * 3 // 2}k"]
+        stream_map.append(f"v:{i},a:{i}" if info["audio"] else f"v:{i}")
+    command += [
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        # Keyframes on segment boundaries in every variant, so players can switch anywhere
+        "-sc_threshold", "0", "-force_key_frames", f"expr:gte(t,n_forced*{segment})",
+        *(AAC_ARGS + ["-ac", "2"] if info["audio"] else []),
+        "-threads", str(params.get("threads", 0)),
+        "-f", "hls", "-hls_time", str(segment), "-hls_playlist_type", "event",
+        "-hls_flags", "independent_segments+temp_file",
+        "-hls_segment_filename", str(directory / "v%v" / "seg%05d.ts"),
+        "-master_pl_name", MASTER_PLAYLIST, "-var_stream_map", " ".join(stream_map),
+        "-progress", "pipe:1", "-nostats",
+        str(directory / "v%v" / "index.m3u8"),
+    ]
+    for i in range(len(rungs)):
+        (directory / f"v{i}").mkdir(parents=True, exist_ok=True)
+
+    try:
+        run_ffmpeg(command, info["duration"], progress, f"{len(rungs)} variants")
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    progress(1.0)
+    written = sum(path.stat().st_size for path in directory.rglob("*") if path.is_file())
+    return {"variants": [height for height, _ in rungs], "bytes": written}
+
+
+def hls_route(root):
+    """Build a media server route that serves HLS packages.
+
+    URLs are keyed by content rather than file name, so segments can be
+    cached indefinitely; playlists are revalidated as they grow.
+
+    Args:
+        root: Package cache directory
+
+    Returns:
+        callable: Route for MediaServer(routes={HLS_PREFIX: ...})
+    """
+    def route(request, subpath):
+        if request.command not in ("GET", "HEAD"):
+            request.send_error_text(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed")
+            return
+        key, _, name = subpath.partition("/")
+        if not _KEY_RE.match(key) or not _PACKAGE_FILE_RE.match(name):
+            request.send_error_text(HTTPStatus.NOT_FOUND, "Not found")
+            return
+        path = Path(root) / key[:2] / key / name
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            request.send_error_text(HTTPStatus.NOT_FOUND, "Not found")
+            return
+        suffix = path.suffix
+        request.send_file(
+            path,
+            etag=f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+            mtime=stat.st_mtime,
+            content_type=HLS_MIME[suffix],
+            cache_control=SEGMENT_CACHE_CONTROL if suffix == ".ts" else PLAYLIST_CACHE_CONTROL,
+        )
+    return route
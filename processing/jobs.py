@@ -0,0 +1,672 @@
+"""Persistent background jobs that derive assets from uploads.
+
+Jobs are queued in SQLite inside the upload directory and run by a pool of
+worker processes sized to the machine, so CPU-heavy work (previews, probes,
+transcodes) never blocks a Streamlit script run or the media server.
+Identical jobs are queued once, failed jobs are retried with backoff, and jobs
+whose content is deleted are cancelled. Workers claim jobs from and report
+progress to the same database, so the queue survives restarts and is visible
+to every session.
+
+Workers are plain ``python -m processing.worker`` subprocesses rather than a
+multiprocessing pool: Streamlit installs the app script as ``__main__``, which
+spawned multiprocessing children would run again, and forking a process with
+Streamlit's threads running is unsafe.
+"""
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Job database, hidden inside the upload directory next to the index
+JOBS_FILENAME = ".jobs.sqlite3"
+
+# Worker processes; defaults to one per CPU core (override with JOB_WORKERS)
+DEFAULT_WORKERS = int(os.environ.get("JOB_WORKERS", 0)) or os.cpu_count() or 1
+
+# Attempts per job, and the delay before the first retry (doubled for each further one)
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 5.0
+
+# Longest an idle worker sleeps when nothing wakes it, e.g. to start retries
+POLL_INTERVAL = 1.0
+# Seconds stop() gives workers to finish their current job before killing them
+STOP_TIMEOUT = 5.0
+
+# Finished jobs kept for history and metrics; older ones are pruned
+HISTORY_LIMIT = 10000
+# Most recent finished jobs latency percentiles are computed over
+LATENCY_WINDOW = 500
+
+# Minimum seconds between progress writes from one worker
+PROGRESS_INTERVAL = 0.5
+
+# Priority given to queued jobs of a file someone is looking at
+VIEW_PRIORITY = 100
+
+# Matches the jobs of one file's content, by digest or (for loose files) by name
+_CONTENT_CLAUSE = "(digest = :digest OR (:digest IS NULL AND digest IS NULL AND target = :name))"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    func TEXT NOT NULL,
+    key TEXT NOT NULL,
+    target TEXT NOT NULL,
+    digest TEXT,
+    record TEXT NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    max_running INTEGER,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    worker INTEGER,
+    notified INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    run_after REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_key ON jobs (key) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, run_after);
+CREATE INDEX IF NOT EXISTS jobs_content ON jobs (digest, target);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+CREATE INDEX IF NOT EXISTS jobs_kind ON jobs (kind, status);
+CREATE INDEX IF NOT EXISTS jobs_unnotified ON jobs (id) WHERE status = 'done' AND notified = 0;
+"""
+
+# Columns added since the first version, with their declarations
+_MIGRATIONS = [
+    ("max_running", "INTEGER"),
+]
+
+_COLUMNS = (
+    "id, kind, target, digest, priority, status, attempts, max_attempts, progress, "
+    "message, result, created_at, started_at, finished_at"
+)
+
+JobKind = namedtuple(
+    "JobKind", ["name", "func", "priority", "max_attempts", "applies", "params", "on_done", "concurrency"]
+)
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job has been cancelled."""
+
+
+def content_key(record):
+    """Identify a file's content: its digest, or (path, size, mtime) for loose files."""
+    if record.get("digest"):
+        return record["digest"]
+    return f"{record['path']}:{record['size']}:{record['mtime']}"
+
+
+def _percentile(values, fraction):
+    """Return a percentile of sorted values, or None if there are none."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class _Progress:
+    """Progress callback handed to job functions inside worker processes.
+
+    Call it as ``progress(fraction, message=None)``; it raises JobCancelled
+    once the job has been cancelled, so long jobs stop early.
+    """
+
+    def __init__(self, db_path, job_id):
+        self.db_path = db_path
+        self.job_id = job_id
+        self._conn = None
+        self._last = 0.0
+
+    def __call__(self, fraction, message=None):
+        now = time.monotonic()
+        if now - self._last < PROGRESS_INTERVAL and fraction < 1:
+            return
+        self._last = now
+        if self._conn is None:
+            self._conn = _connect(self.db_path)
+        with self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET progress = ?, message = COALESCE(?, message) WHERE id = ? AND status = 'running'",
+                (max(0.0, min(1.0, fraction)), message, self.job_id),
+            )
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (self.job_id,)).fetchone()
+        if row is None or row[0] == "cancelled":
+            raise JobCancelled(self.job_id)
+
+
+def function_path(func):
+    """Return the "module:qualname" a worker process imports a job function by.
+
+    Raises:
+        ValueError: If the function cannot be imported by name
+    """
+    module, qualname = func.__module__, func.__qualname__
+    if module == "__main__" or "<" in qualname:
+        raise ValueError(f"Job function {qualname} must be defined at module level in an importable module")
+    return f"{module}:{qualname}"
+
+
+def load_function(path):
+    """Import a job function from its function_path()."""
+    module, _, qualname = path.partition(":")
+    obj = importlib.import_module(module)
+    for part in qualname.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def claim_job(conn, worker):
+    """Mark the highest-priority ready job as running by a worker.
+
+    Jobs of a kind that already has its maximum number running are skipped.
+
+    Args:
+        conn: Connection to the job database
+        worker: Process id of the worker
+
+    Returns:
+        sqlite3.Row or None: The job's id, func, record and params
+    """
+    now = time.time()
+    # Take the write lock up front so two workers never claim the same job
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT id, func, record, params FROM jobs AS job WHERE status = 'queued' AND run_after <= ? "
+            "AND (max_running IS NULL OR max_running > "
+            "(SELECT COUNT(*) FROM jobs WHERE kind = job.kind AND status = 'running')) "
+            "ORDER BY priority DESC, id LIMIT 1",
+            (now,),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, progress = 0, "
+                "started_at = ? WHERE id = ?",
+                (worker, now, row["id"]),
+            )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return row
+
+
+def finish_job(conn, job_id, result=None, error=None):
+    """Record a running job's outcome, retrying failures with exponential backoff.
+
+    Args:
+        conn: Connection to the job database
+        job_id: Job to finish
+        result: JSON-serialisable result of a successful run
+        error: Description of the failure, or None on success
+
+    Returns:
+        str or None: The job's new status, or None if it was cancelled while
+        it ran (whatever it produced is ignored)
+    """
+    now = time.time()
+    with conn:
+        row = conn.execute("SELECT status, attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row["status"] != "running":
+            return None
+        if error is None:
+            status = "done"
+            conn.execute(
+                "UPDATE jobs SET status = 'done', progress = 1, result = ?, finished_at = ? WHERE id = ?",
+                (json.dumps(result), now, job_id),
+            )
+        elif row["attempts"] < row["max_attempts"]:
+            status = "queued"
+            delay = RETRY_DELAY * 2 ** (row["attempts"] - 1)
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', message = ?, run_after = ? WHERE id = ?",
+                (error, now + delay, job_id),
+            )
+        else:
+            status = "failed"
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', message = ?, finished_at = ? WHERE id = ?",
+                (error, now, job_id),
+            )
+    if error is not None:
+        logger.warning("Job %d failed (attempt %d of %d): %s", job_id, row["attempts"], row["max_attempts"], error)
+    return status
+
+
+class JobScheduler:
+    """Queue of derived-asset jobs run by a pool of worker processes.
+
+    Job kinds are registered with a function ``func(record, params, progress)``
+    that must be importable from a module (workers import it by name) and
+    returns a JSON-serialisable result. Kinds with an ``applies`` predicate
+    are queued automatically for every matching upload added to the store.
+    Higher priorities run first; a job identical to one already queued or
+    running (same kind, content and parameters) is not queued twice.
+    """
+
+    def __init__(self, store, db_path=None, workers=DEFAULT_WORKERS):
+        """Open the job database and follow the store's changes.
+
+        Jobs left running by a previous process are queued again.
+
+        Args:
+            store: UploadStore whose uploads the jobs derive assets from
+            db_path: Job database; defaults to JOBS_FILENAME in the upload directory
+            workers: Number of worker processes
+        """
+        self.store = store
+        self.db_path = str(db_path or store.root / JOBS_FILENAME)
+        self.workers = max(1, workers)
+        self._kinds = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._processes = []
+        self._stopped = threading.Event()
+        self._thread = None
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, decl in _MIGRATIONS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {decl}")
+        with conn:
+            conn.execute("UPDATE jobs SET status = 'queued', progress = 0 WHERE status = 'running'")
+        store.subscribe(self._on_store_event)
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.db_path)
+        return conn
+
+    def register(self, name, func, priority=0, max_attempts=MAX_ATTEMPTS, applies=None, params=None,
+                 on_done=None, concurrency=None):
+        """Register a kind of job.
+
+        Args:
+            name: Job kind name
+            func: Module-level function ``func(record, params, progress)``
+            priority: Default priority; higher runs first
+            max_attempts: Runs before the job is marked failed
+            applies: Predicate on an index record; matching uploads get this
+                job automatically when they are added
+            params: Default parameters passed to func
+            on_done: Called as ``on_done(record, result)`` in this process
+                after a job succeeds
+            concurrency: Most jobs of this kind running at once, for work
+                that is itself multi-threaded; None for no limit beyond the
+                number of workers
+
+        Raises:
+            ValueError: If func cannot be imported by name
+        """
+        function_path(func)
+        self._kinds[name] = JobKind(
+            name, func, priority, max_attempts, applies, dict(params or {}), on_done, concurrency
+        )
+
+    def start(self):
+        """Start the worker processes and the thread supervising them.
+
+        Returns:
+            JobScheduler: self, for chaining
+        """
+        if self._thread is None:
+            with self._lock:
+                self._processes = [self._spawn() for _ in range(self.workers)]
+            self._thread = threading.Thread(target=self._run, name="job-supervisor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the workers; jobs still running are queued again on the next start."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            processes, self._processes = self._processes, []
+        for process in processes:
+            # Closing stdin tells a worker to exit after its current job
+            process.stdin.close()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for process in processes:
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def _spawn(self):
+        """Start one worker process."""
+        env = dict(os.environ)
+        # Workers import job functions from wherever this process can
+        env["PYTHONPATH"] = os.pathsep.join([str(Path(__file__).resolve().parent.parent)] + sys.path)
+        process = subprocess.Popen(
+            [sys.executable, "-m", "processing.worker", self.db_path],
+            stdin=subprocess.PIPE, env=env, close_fds=True,
+        )
+        os.set_blocking(process.stdin.fileno(), False)
+        return process
+
+    def _wake_workers(self):
+        """Nudge idle workers to look for ready jobs now rather than at their next poll."""
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                os.write(process.stdin.fileno(), b"\n")
+            except (BlockingIOError, BrokenPipeError, ValueError):
+                # Busy (its pipe is full of earlier nudges) or gone; either way
+                # it looks for work again without this one
+                pass
+
+    # -- queueing -------------------------------------------------------------
+
+    def submit(self, kind, record, params=None, priority=None, force=False):
+        """Queue a job for a stored file.
+
+        Args:
+            kind: Registered job kind
+            record: Index record of the file
+            params: Parameters merged over the kind's defaults
+            priority: Priority; defaults to the kind's
+            force: Queue it again even if an identical job already succeeded
+
+        Returns:
+            int or None: Id of the queued (or already active) job, or None if
+            an identical job has already succeeded
+        """
+        spec = self._kinds[kind]
+        params = {**spec.params, **(params or {})}
+        priority = spec.priority if priority is None else priority
+        key = f"{kind}:{content_key(record)}:{json.dumps(params, sort_keys=True)}"
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            if not force:
+                done = conn.execute(
+                    "SELECT id FROM jobs WHERE key = ? AND status = 'done' LIMIT 1", (key,)
+                ).fetchone()
+                if done:
+                    return None
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE key = ? AND status IN ('queued', 'running')", (key,)
+            ).fetchone()
+            if row:
+                # Identical job: keep one, at the higher priority
+                conn.execute("UPDATE jobs SET priority = MAX(priority, ?) WHERE id = ?", (priority, row[0]))
+                return row[0]
+            job_id = conn.execute(
+                "INSERT INTO jobs (kind, func, key, target, digest, record, params, priority, max_attempts, "
+                "max_running, created_at, run_after) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, function_path(spec.func), key, record["name"], record.get("digest"),
+                 json.dumps(record, default=str), json.dumps(params), priority, spec.max_attempts,
+                 spec.concurrency, now, now),
+            ).lastrowid
+        self._wake_workers()
+        return job_id
+
+    def boost(self, record, priority=VIEW_PRIORITY):
+        """Move a file's queued jobs ahead of others, e.g. when someone views it."""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET priority = MAX(priority, :priority) WHERE status = 'queued' AND " + _CONTENT_CLAUSE,
+                {"priority": priority, "digest": record.get("digest"), "name": record["name"]},
+            )
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job.
+
+        A running job stops the next time it reports progress; anything it
+        finishes afterwards is ignored.
+
+        Returns:
+            bool: True if the job was still active
+        """
+        conn = self._connection()
+        with conn:
+            cancelled = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id),
+            ).rowcount
+        return bool(cancelled)
+
+    def cancel_for(self, record):
+        """Cancel every active job of a file's content.
+
+        Returns:
+            int: Number of jobs cancelled
+        """
+        conn = self._connection()
+        with conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = :now "
+                "WHERE status IN ('queued', 'running') AND " + _CONTENT_CLAUSE,
+                {"now": time.time(), "digest": record.get("digest"), "name": record["name"]},
+            ).rowcount
+
+    def forget_for(self, record):
+        """Drop the succeeded jobs of a file's content.
+
+        Called once the content has left the store, whose listeners discard
+        the assets those jobs made; storing the same content again then
+        queues them afresh instead of finding them already done.
+
+        Returns:
+            int: Number of jobs dropped
+        """
+        conn = self._connection()
+        with conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status = 'done' AND " + _CONTENT_CLAUSE,
+                {"digest": record.get("digest"), "name": record["name"]},
+            ).rowcount
+
+    def retry_failed(self):
+        """Queue every failed job again with fresh attempts.
+
+        Returns:
+            int: Number of jobs queued
+        """
+        conn = self._connection()
+        with conn:
+            # The latest failure of each job, unless an identical one is active again
+            count = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, progress = 0, run_after = ?, finished_at = NULL "
+                "WHERE id IN (SELECT MAX(id) FROM jobs WHERE status = 'failed' GROUP BY key) AND key NOT IN "
+                "(SELECT key FROM jobs WHERE status IN ('queued', 'running'))",
+                (time.time(),),
+            ).rowcount
+        self._wake_workers()
+        return count
+
+    # -- queries --------------------------------------------------------------
+
+    def jobs(self, status=None, kind=None, limit=100):
+        """List jobs, active ones by priority and the rest newest first.
+
+        Args:
+            status: Only jobs with this status, or a tuple of statuses
+            kind: Only jobs of this kind
+            limit: Maximum number of jobs
+
+        Returns:
+            list: Job dicts (see get())
+        """
+        clauses, params = [], []
+        if status:
+            statuses = (status,) if isinstance(status, str) else tuple(status)
+            clauses.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT {_COLUMNS} FROM jobs {where} "
+            "ORDER BY status IN ('queued', 'running') DESC, status = 'running' DESC, "
+            "priority DESC, COALESCE(finished_at, created_at) DESC LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def get(self, job_id):
+        """Return one job as a dict, or None.
+
+        Jobs have id, kind, target (file name), digest, priority, status
+        ("queued", "running", "done", "failed" or "cancelled"), attempts,
+        max_attempts, progress (0 to 1), message, result and timestamps.
+        """
+        row = self._connection().execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def jobs_for(self, record):
+        """Return the latest job of each kind for a file's content."""
+        rows = self._connection().execute(
+            f"SELECT {_COLUMNS} FROM jobs WHERE {_CONTENT_CLAUSE} ORDER BY id",
+            {"digest": record.get("digest"), "name": record["name"]},
+        ).fetchall()
+        return {row["kind"]: self._job(row) for row in rows}
+
+    @staticmethod
+    def _job(row):
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def metrics(self):
+        """Return queue depth and latency figures.
+
+        Returns:
+            dict: Job counts per status ("queued", "running", ...), per kind
+            counts of active jobs ("by_kind"), the age of the oldest queued
+            job, and p50/p95 of the queue wait and run time of recently
+            finished jobs, all in seconds
+        """
+        conn = self._connection()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        by_kind = {}
+        for kind, status, count in conn.execute(
+            "SELECT kind, status, COUNT(*) FROM jobs WHERE status IN ('queued', 'running') GROUP BY kind, status"
+        ):
+            by_kind.setdefault(kind, {"queued": 0, "running": 0})[status] = count
+        oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        rows = conn.execute(
+            "SELECT started_at - created_at, finished_at - started_at FROM jobs "
+            "WHERE status = 'done' ORDER BY finished_at DESC LIMIT ?",
+            (LATENCY_WINDOW,),
+        ).fetchall()
+        waits = sorted(row[0] for row in rows)
+        runs = sorted(row[1] for row in rows)
+        metrics = {status: counts.get(status, 0) for status in ("queued", "running", "done", "failed", "cancelled")}
+        metrics.update({
+            "workers": self.workers,
+            "by_kind": by_kind,
+            "oldest_queued_seconds": time.time() - oldest if oldest else 0.0,
+            "wait_p50_seconds": _percentile(waits, 0.5),
+            "wait_p95_seconds": _percentile(waits, 0.95),
+            "run_p50_seconds": _percentile(runs, 0.5),
+            "run_p95_seconds": _percentile(runs, 0.95),
+        })
+        return metrics
+
+    # -- supervision ----------------------------------------------------------
+
+    def _on_store_event(self, event, record):
+        """Queue jobs for new uploads and cancel or forget those of deleted content."""
+        if event == "added":
+            for spec in self._kinds.values():
+                if spec.applies is not None and spec.applies(record):
+                    self.submit(spec.name, record)
+        elif event == "deleted" and (record["digest"] is None or record["orphaned"]):
+            self.cancel_for(record)
+            self.forget_for(record)
+
+    def _run(self):
+        """Every POLL_INTERVAL, replace dead workers and report finished jobs."""
+        pruned = 0.0
+        while not self._stopped.wait(POLL_INTERVAL):
+            try:
+                self._supervise()
+                self._notify()
+                if time.monotonic() - pruned > 60:
+                    self._prune()
+                    pruned = time.monotonic()
+            except Exception:
+                logger.exception("Job supervision failed")
+
+    def _supervise(self):
+        """Restart workers that died and fail (or retry) the jobs they were running."""
+        with self._lock:
+            dead = [process for process in self._processes if process.poll() is not None]
+            for process in dead:
+                self._processes.remove(process)
+                process.stdin.close()
+                if not self._stopped.is_set():
+                    self._processes.append(self._spawn())
+        conn = self._connection()
+        for process in dead:
+            # Killed hard, e.g. out of memory or by a crash in native code
+            logger.warning("Job worker %d exited with code %d", process.pid, process.returncode)
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND worker = ?", (process.pid,)
+            ).fetchall()
+            for row in rows:
+                finish_job(conn, row["id"], error=f"Worker process exited with code {process.returncode}")
+
+    def _notify(self):
+        """Call on_done for jobs that succeeded since the last check."""
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT id, kind, record, result FROM jobs WHERE notified = 0 AND status = 'done' ORDER BY id"
+        ).fetchall()
+        for row in rows:
+            with conn:
+                conn.execute("UPDATE jobs SET notified = 1 WHERE id = ?", (row["id"],))
+            spec = self._kinds.get(row["kind"])
+            if spec is None or spec.on_done is None:
+                continue
+            try:
+                spec.on_done(json.loads(row["record"]), json.loads(row["result"]))
+            except Exception:
+                logger.exception("%s job %d completion handler failed", row["kind"], row["id"])
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond HISTORY_LIMIT."""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND id NOT IN "
+                "(SELECT id FROM jobs WHERE status NOT IN ('queued', 'running') "
+                "ORDER BY finished_at DESC LIMIT ?)",
+                (HISTORY_LIMIT,),
+            )
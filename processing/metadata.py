@@ -0,0 +1,637 @@
+"""Media probing: real formats from magic bytes, plus container metadata.
+
+Media types are otherwise guessed from file extensions alone. Probing reads
+each file's first bytes to find out what it really is, then parses just the
+container headers for duration, picture size, codecs and bitrate. Common
+formats (MP4/MOV, Matroska/WebM, AVI, Ogg, MP3, WAV, FLAC and still images)
+are parsed in pure Python from a few kilobytes; others fall back to ffprobe
+(or ffmpeg) when available. A background MediaProber fills the upload
+index's cache of results, so no page load ever waits on a probe.
+"""
+import logging
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import transcode
+
+logger = logging.getLogger(__name__)
+
+# Threads probing files at once (override with PROBE_WORKERS)
+PROBE_WORKERS = int(os.environ.get("PROBE_WORKERS", 4))
+# Files probed and recorded per index transaction
+PROBE_BATCH = 200
+# Seconds between sweeps for files added behind the store's back (e.g. copied in)
+PROBE_INTERVAL = float(os.environ.get("PROBE_INTERVAL", 30))
+
+# Bytes read to sniff a format
+SNIFF_BYTES = 4096
+# Bytes searched for Matroska track headers and AVI stream headers
+HEADER_SCAN_BYTES = 256 * 1024
+# Boxes visited in an MP4/MOV file before giving up
+MAX_BOXES = 10000
+
+# Formats each extension may legitimately contain
+EXTENSION_FORMATS = {
+    ".mp4": {"mp4", "mov", "m4a"},
+    ".m4a": {"m4a", "mp4"},
+    ".mov": {"mov", "mp4"},
+    ".webm": {"webm", "matroska"},
+    ".mkv": {"matroska", "webm"},
+    ".avi": {"avi"},
+    ".ogg": {"ogg"},
+    ".mp3": {"mp3"},
+    ".wav": {"wav"},
+    ".flac": {"flac"},
+    ".jpg": {"jpeg"},
+    ".jpeg": {"jpeg"},
+    ".png": {"png"},
+    ".gif": {"gif"},
+    ".bmp": {"bmp"},
+    ".webp": {"webp"},
+    ".pdf": {"pdf"},
+    ".md": {"text"},
+    ".txt": {"text"},
+}
+
+_MP4_CODECS = {
+    b"avc1": "h264", b"avc3": "h264", b"hvc1": "hevc", b"hev1": "hevc", b"av01": "av1",
+    b"vp09": "vp9", b"mp4v": "mpeg4", b"jpeg": "mjpeg", b"mp4a": "aac", b".mp3": "mp3",
+    b"Opus": "opus", b"fLaC": "flac", b"alac": "alac", b"ac-3": "ac3", b"ec-3": "eac3",
+    b"sowt": "pcm", b"twos": "pcm", b"lpcm": "pcm",
+}
+_MATROSKA_CODECS = {
+    "V_MPEG4/ISO/AVC": "h264", "V_MPEGH/ISO/HEVC": "hevc", "V_MPEG4/ISO/ASP": "mpeg4",
+    "V_VP8": "vp8", "V_VP9": "vp9", "V_AV1": "av1", "V_THEORA": "theora",
+    "A_OPUS": "opus", "A_VORBIS": "vorbis", "A_MPEG/L3": "mp3", "A_AC3": "ac3",
+    "A_EAC3": "eac3", "A_FLAC": "flac", "A_PCM/INT/LIT": "pcm",
+}
+_AVI_VIDEO_CODECS = {
+    "H264": "h264", "X264": "h264", "AVC1": "h264", "HEVC": "hevc", "H265": "hevc",
+    "XVID": "mpeg4", "DIVX": "mpeg4", "DX50": "mpeg4", "FMP4": "mpeg4", "MP4V": "mpeg4",
+    "MJPG": "mjpeg",
+}
+_WAVE_CODECS = {1: "pcm", 3: "pcm", 0x50: "mp2", 0x55: "mp3", 0xFF: "aac", 0x2000: "ac3", 0xFFFE: "pcm"}
+
+# MPEG audio layer III bitrates in kbit/s, by bitrate index
+_MP3_BITRATES = {
+    "v1": (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    "v2": (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Matroska element IDs read by the parser
+_EBML_SEGMENT = 0x18538067
+_EBML_INFO = 0x1549A966
+_EBML_TRACKS = 0x1654AE6B
+_EBML_TRACK_ENTRY = 0xAE
+_EBML_CLUSTER = 0x1F43B675
+_EBML_MASTERS = {_EBML_SEGMENT, _EBML_INFO, _EBML_TRACKS, _EBML_TRACK_ENTRY, 0xE0, 0xE1}
+
+
+def sniff(header):
+    """Identify a file's format from its first bytes.
+
+    Args:
+        header: The first SNIFF_BYTES of the file (or all of it, if shorter)
+
+    Returns:
+        tuple: (format, media type) such as ("mp4", "Video"), or (None, None)
+        if the content is not recognised
+    """
+    if header[4:8] == b"ftyp":
+        brand = header[8:12]
+        if brand == b"qt  ":
+            return "mov", "Video"
+        if brand in (b"M4A ", b"M4B ", b"M4P "):
+            return "m4a", "Audio"
+        return "mp4", "Video"
+    if header[4:8] in (b"moov", b"mdat", b"wide", b"free", b"skip", b"pnot"):
+        # QuickTime files written before ftyp existed
+        return "mov", "Video"
+    if header.startswith(b"\x1a\x45\xdf\xa3"):
+        return ("webm" if b"webm" in header[:64] else "matroska"), "Video"
+    if header.startswith(b"RIFF"):
+        return {b"AVI ": ("avi", "Video"), b"WAVE": ("wav", "Audio"),
+                b"WEBP": ("webp", "Image")}.get(header[8:12], (None, None))
+    if header.startswith(b"OggS"):
+        return "ogg", ("Video" if b"\x80theora" in header else "Audio")
+    if header.startswith(b"fLaC"):
+        return "flac", "Audio"
+    if len(header) > 1 and header[0] == 0xFF and header[1] & 0xF6 == 0xF0:
+        return "aac", "Audio"
+    if header.startswith(b"ID3") or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return "mp3", "Audio"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg", "Image"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png", "Image"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif", "Image"
+    if header.startswith(b"BM") and header[6:10] == b"\0\0\0\0":
+        return "bmp", "Image"
+    if header.startswith(b"%PDF-"):
+        return "pdf", "Document"
+    if header and b"\0" not in header:
+        # A multi-byte character may be cut off at the end of the sample
+        sample = header if len(header) < SNIFF_BYTES else header[:-3]
+        try:
+            sample.decode("utf-8")
+        except UnicodeDecodeError:
+            return None, None
+        return "text", "Document"
+    return None, None
+
+
+def probe_file(path, name=None):
+    """Probe a file's real format and container metadata.
+
+    Never raises: a file that cannot be read or parsed gets an "error".
+
+    Args:
+        path: File on disk
+        name: Name the file is stored under, whose extension is checked
+            against the content; defaults to the path's name
+
+    Returns:
+        dict: "format" and "kind" (media type) from the content, "duration"
+        (seconds), "width", "height", "video_codec", "audio_codec",
+        "bitrate" (bit/s), "sample_rate", "channels" (each None if unknown or
+        not applicable), "mismatched" (the extension does not fit the
+        content), "parser" that produced the result and "error"
+    """
+    info = {
+        "format": None, "kind": None, "duration": None, "width": None, "height": None,
+        "video_codec": None, "audio_codec": None, "bitrate": None, "sample_rate": None,
+        "channels": None, "mismatched": False, "parser": None, "error": None,
+    }
+    suffix = Path(name or path).suffix.lower()
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            header = f.read(SNIFF_BYTES)
+            info["format"], info["kind"] = sniff(header)
+            parser = _PARSERS.get(info["format"])
+            if parser is not None:
+                f.seek(0)
+                parser(f, size, info)
+                info["parser"] = "header"
+    except Exception as e:
+        info["error"] = f"{type(e).__name__}: {e}"
+
+    if info["kind"] in ("Video", "Audio") and info["duration"] is None and transcode.FFMPEG:
+        # No built-in parser, or it could not make sense of the file
+        try:
+            details = transcode.probe(path)
+        except Exception as e:
+            info["error"] = info["error"] or f"{type(e).__name__}: {e}"
+        else:
+            info.update(
+                video_codec=details["video"] or info["video_codec"],
+                audio_codec=details["audio"] or info["audio_codec"],
+                width=details["width"] or info["width"], height=details["height"] or info["height"],
+                duration=details["duration"], error=None,
+                parser="ffprobe" if transcode.FFPROBE else "ffmpeg",
+            )
+    if info["kind"] in ("Video", "Audio"):
+        if info["format"] in ("mp4", "mov", "matroska", "webm", "ogg") and info["audio_codec"] \
+                and not info["video_codec"]:
+            # Audio-only content in a container that usually carries video
+            info["kind"] = "Audio"
+        if info["duration"] and info["bitrate"] is None:
+            info["bitrate"] = int(size * 8 / info["duration"])
+
+    # Unrecognised content under a media extension will not play either
+    allowed = EXTENSION_FORMATS.get(suffix)
+    info["mismatched"] = (
+        bool(allowed) and info["error"] is None and info["format"] not in allowed
+        and not (info["format"] is None and "text" in allowed)
+    )
+    return info
+
+
+def _parse_mp4(f, size, info):
+    """Read duration, codecs and picture size from MP4/MOV boxes, skipping the media data."""
+    visited = 0
+
+    def boxes(start, end):
+        nonlocal visited
+        position = start
+        while position + 8 <= end and visited < MAX_BOXES:
+            visited += 1
+            f.seek(position)
+            head = f.read(16)
+            if len(head) < 8:
+                return
+            box_size, box_type = struct.unpack(">I4s", head[:8])
+            header = 8
+            if box_size == 1 and len(head) == 16:
+                box_size, header = struct.unpack(">Q", head[8:16])[0], 16
+            elif box_size == 0:
+                box_size = end - position
+            if box_size < header:
+                return
+            yield box_type, position + header, position + box_size
+            position += box_size
+
+    def walk(start, end, handler):
+        for box_type, body, box_end in boxes(start, end):
+            if box_type in (b"moov", b"trak", b"mdia", b"minf", b"stbl"):
+                # Each track starts without a known handler
+                handler = walk(body, box_end, None if box_type == b"trak" else handler)
+            elif box_type == b"mvhd":
+                f.seek(body)
+                data = f.read(32)
+                if data[0] == 1:
+                    timescale, duration = struct.unpack(">IQ", data[20:32])
+                else:
+                    timescale, duration = struct.unpack(">II", data[12:20])
+                if timescale and duration:
+                    info["duration"] = duration / timescale
+            elif box_type == b"hdlr" and handler is None:
+                # QuickTime repeats hdlr in minf for the data reference; the first names the media
+                f.seek(body + 8)
+                handler = f.read(4)
+            elif box_type == b"stsd":
+                f.seek(body + 8)
+                entry = f.read(40)
+                if len(entry) < 36:
+                    continue
+                codec = _MP4_CODECS.get(entry[4:8], entry[4:8].decode("latin-1").strip().lower())
+                if handler == b"vide" and info["video_codec"] is None:
+                    info["video_codec"] = codec
+                    info["width"], info["height"] = struct.unpack(">HH", entry[32:36])
+                elif handler == b"soun" and info["audio_codec"] is None:
+                    info["audio_codec"] = codec
+                    info["channels"] = struct.unpack(">H", entry[24:26])[0]
+                    info["sample_rate"] = struct.unpack(">I", entry[32:36])[0] >> 16
+        return handler
+
+    walk(0, size, None)
+
+
+def _read_vint(data, position, marker=False):
+    """Read an EBML variable-length integer; element IDs keep their length marker."""
+    first = data[position]
+    if not first:
+        raise ValueError("Invalid EBML length")
+    length = 9 - first.bit_length()
+    value = first if marker else first & (0xFF >> length)
+    for byte in data[position + 1:position + length]:
+        value = value << 8 | byte
+    unknown = not marker and value == (1 << (7 * length)) - 1
+    return (None if unknown else value), position + length
+
+
+def _parse_matroska(f, size, info):
+    """Read duration, codecs and picture size from Matroska/WebM headers."""
+    data = f.read(HEADER_SCAN_BYTES)
+    scale = 1000000
+    duration = None
+    track = {}
+
+    def finish_track():
+        codec = _MATROSKA_CODECS.get(track.get(0x86), (track.get(0x86) or "")[2:].lower() or None)
+        if track.get(0x83) == 1 and info["video_codec"] is None:
+            info["video_codec"], info["width"], info["height"] = codec, track.get(0xB0), track.get(0xBA)
+        elif track.get(0x83) == 2 and info["audio_codec"] is None:
+            info["audio_codec"], info["channels"] = codec, track.get(0x9F)
+            info["sample_rate"] = int(track[0xB5]) if 0xB5 in track else None
+
+    position, end = 0, len(data)
+    while position < end:
+        try:
+            element, position = _read_vint(data, position, marker=True)
+            length, position = _read_vint(data, position)
+        except IndexError:
+            # Headers continue past the scanned bytes
+            break
+        if element == _EBML_CLUSTER:
+            break
+        if element in _EBML_MASTERS:
+            if element == _EBML_TRACK_ENTRY:
+                if track:
+                    finish_track()
+                track = {}
+            continue
+        if length is None:
+            break
+        value = data[position:position + length]
+        position += length
+        if element == 0x2AD7B1:
+            scale = int.from_bytes(value, "big")
+        elif element == 0x4489:
+            duration = struct.unpack(">f" if length == 4 else ">d", value)[0]
+        elif element in (0x83, 0xB0, 0xBA, 0x9F):
+            track[element] = int.from_bytes(value, "big")
+        elif element == 0xB5:
+            track[element] = struct.unpack(">f" if length == 4 else ">d", value)[0]
+        elif element == 0x86:
+            track[element] = value.decode("ascii", "replace").rstrip("\0")
+    if track:
+        finish_track()
+    if duration:
+        info["duration"] = duration * scale / 1e9
+
+
+def _parse_avi(f, size, info):
+    """Read duration, codecs and picture size from AVI stream headers."""
+    data = f.read(HEADER_SCAN_BYTES)
+    avih = data.find(b"avih")
+    if avih < 0:
+        raise ValueError("No AVI main header")
+    usec_per_frame, = struct.unpack("<I", data[avih + 8:avih + 12])
+    frames, = struct.unpack("<I", data[avih + 24:avih + 28])
+    info["width"], info["height"] = struct.unpack("<II", data[avih + 40:avih + 48])
+    if usec_per_frame and frames:
+        info["duration"] = frames * usec_per_frame / 1e6
+
+    position = avih
+    while True:
+        position = data.find(b"strh", position + 4)
+        if position < 0:
+            break
+        stream_type = data[position + 8:position + 12]
+        strf = data.find(b"strf", position)
+        if strf < 0:
+            break
+        if stream_type == b"vids" and info["video_codec"] is None:
+            fourcc = data[strf + 24:strf + 28].decode("latin-1").strip("\0 ").upper()
+            info["video_codec"] = _AVI_VIDEO_CODECS.get(fourcc, fourcc.lower() or None)
+        elif stream_type == b"auds" and info["audio_codec"] is None:
+            tag, channels, sample_rate = struct.unpack("<HHI", data[strf + 8:strf + 16])
+            info["audio_codec"] = _WAVE_CODECS.get(tag, f"0x{tag:04x}")
+            info["channels"], info["sample_rate"] = channels, sample_rate
+
+
+def _parse_wav(f, size, info):
+    """Read the sample format and duration from WAV chunks."""
+    f.seek(12)
+    byte_rate = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return
+        chunk_id, chunk_size = struct.unpack("<4sI", chunk)
+        if chunk_id == b"fmt ":
+            tag, channels, sample_rate, byte_rate = struct.unpack("<HHII", f.read(12))
+            info["audio_codec"] = _WAVE_CODECS.get(tag, f"0x{tag:04x}")
+            info["channels"], info["sample_rate"] = channels, sample_rate
+            info["bitrate"] = byte_rate * 8
+            f.seek(chunk_size - 12 + chunk_size % 2, os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if byte_rate:
+                info["duration"] = min(chunk_size, size - f.tell()) / byte_rate
+            return
+        else:
+            f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def _parse_flac(f, size, info):
+    """Read the sample format and duration from the FLAC STREAMINFO block."""
+    data = f.read(42)
+    bits = int.from_bytes(data[18:26], "big")
+    info["audio_codec"] = "flac"
+    info["sample_rate"] = bits >> 44
+    info["channels"] = ((bits >> 41) & 7) + 1
+    samples = bits & ((1 << 36) - 1)
+    if info["sample_rate"] and samples:
+        info["duration"] = samples / info["sample_rate"]
+
+
+def _parse_mp3(f, size, info):
+    """Read bitrate and duration from the first MP3 frame (and its Xing header, if any)."""
+    head = f.read(10)
+    offset = 0
+    if head[:3] == b"ID3":
+        offset = 10 + ((head[6] & 0x7F) << 21 | (head[7] & 0x7F) << 14 | (head[8] & 0x7F) << 7 | head[9] & 0x7F)
+        if head[5] & 0x10:
+            offset += 10
+    f.seek(offset)
+    data = f.read(SNIFF_BYTES)
+    for start in range(len(data) - 4):
+        if data[start] != 0xFF or data[start + 1] & 0xE0 != 0xE0:
+            continue
+        frame_header = int.from_bytes(data[start:start + 4], "big")
+        version = (frame_header >> 19) & 3  # 3: MPEG-1, 2: MPEG-2, 0: MPEG-2.5
+        layer = (frame_header >> 17) & 3  # 1: layer III
+        bitrate_index = (frame_header >> 12) & 15
+        rate_index = (frame_header >> 10) & 3
+        if version != 1 and layer == 1 and bitrate_index not in (0, 15) and rate_index != 3:
+            break
+    else:
+        raise ValueError("No MPEG audio frame found")
+
+    mpeg1 = version == 3
+    bitrate = _MP3_BITRATES["v1" if mpeg1 else "v2"][bitrate_index] * 1000
+    info["audio_codec"] = "mp3"
+    info["sample_rate"] = (44100, 48000, 32000)[rate_index] >> {3: 0, 2: 1, 0: 2}[version]
+    info["channels"] = 1 if (frame_header >> 6) & 3 == 3 else 2
+    audio_bytes = size - offset - start
+
+    frame = data[start:start + 200]
+    xing = max(frame.find(b"Xing"), frame.find(b"Info"))
+    if xing > 0 and frame[xing + 7] & 1:
+        # Variable bitrate: the frame count gives the exact length
+        frames = int.from_bytes(frame[xing + 8:xing + 12], "big")
+        info["duration"] = frames * (1152 if mpeg1 else 576) / info["sample_rate"]
+        if info["duration"]:
+            bitrate = int(audio_bytes * 8 / info["duration"])
+    elif bitrate:
+        info["duration"] = audio_bytes * 8 / bitrate
+    info["bitrate"] = bitrate
+
+
+def _parse_ogg(f, size, info):
+    """Read the codec from the first Ogg page and the duration from the last."""
+    data = f.read(SNIFF_BYTES)
+    if b"\x01vorbis" in data:
+        ident = data.find(b"\x01vorbis") + 7
+        info["audio_codec"] = "vorbis"
+        info["channels"] = data[ident + 4]
+        info["sample_rate"], = struct.unpack("<I", data[ident + 5:ident + 9])
+        clock, pre_skip = info["sample_rate"], 0
+    elif b"OpusHead" in data:
+        ident = data.find(b"OpusHead") + 8
+        info["audio_codec"] = "opus"
+        info["channels"] = data[ident + 1]
+        pre_skip, info["sample_rate"] = struct.unpack("<HI", data[ident + 2:ident + 8])
+        # Opus granule positions always count 48 kHz samples
+        clock = 48000
+    else:
+        # Theora and other streams are left to ffprobe
+        if b"\x80theora" in data:
+            info["video_codec"] = "theora"
+        return
+
+    f.seek(max(size - 65536, 0))
+    tail = f.read()
+    last = tail.rfind(b"OggS")
+    if last >= 0 and clock:
+        granule, = struct.unpack("<q", tail[last + 6:last + 14])
+        if granule > 0:
+            info["duration"] = max(granule - pre_skip, 0) / clock
+
+
+def _parse_image(f, size, info):
+    """Read the picture size of PNG, GIF, BMP, WebP and JPEG images."""
+    data = f.read(SNIFF_BYTES)
+    fmt = info["format"]
+    if fmt == "png":
+        info["width"], info["height"] = struct.unpack(">II", data[16:24])
+    elif fmt == "gif":
+        info["width"], info["height"] = struct.unpack("<HH", data[6:10])
+    elif fmt == "bmp":
+        width, height = struct.unpack("<ii", data[18:26])
+        info["width"], info["height"] = width, abs(height)
+    elif fmt == "webp":
+        chunk = data[12:16]
+        if chunk == b"VP8X":
+            info["width"] = int.from_bytes(data[24:27], "little") + 1
+            info["height"] = int.from_bytes(data[27:30], "little") + 1
+        elif chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", data[26:30])
+            info["width"], info["height"] = width & 0x3FFF, height & 0x3FFF
+        elif chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            info["width"], info["height"] = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    elif fmt == "jpeg":
+        # Walk the marker segments up to the first start-of-frame
+        position = 2
+        while True:
+            f.seek(position)
+            segment = f.read(9)
+            if len(segment) < 4 or segment[0] != 0xFF:
+                return
+            marker = segment[1]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                info["height"], info["width"] = struct.unpack(">HH", segment[5:9])
+                return
+            position += 2 + struct.unpack(">H", segment[2:4])[0]
+
+
+_PARSERS = {
+    "mp4": _parse_mp4,
+    "mov": _parse_mp4,
+    "m4a": _parse_mp4,
+    "matroska": _parse_matroska,
+    "webm": _parse_matroska,
+    "avi": _parse_avi,
+    "wav": _parse_wav,
+    "flac": _parse_flac,
+    "mp3": _parse_mp3,
+    "ogg": _parse_ogg,
+    "png": _parse_image,
+    "gif": _parse_image,
+    "bmp": _parse_image,
+    "webp": _parse_image,
+    "jpeg": _parse_image,
+}
+
+
+class MediaProber:
+    """Background prober keeping the upload index's media info cache filled.
+
+    Files are probed shortly after they are stored, and a periodic sweep
+    picks up files that reached the upload directory some other way. Results
+    are cached per name and stay valid while the size, mtime and digest are
+    unchanged, so a file is probed again only when it changes or is renamed
+    (a new extension may no longer match the content).
+    """
+
+    def __init__(self, store, workers=PROBE_WORKERS, interval=PROBE_INTERVAL):
+        """Set up the prober; call start() to begin probing.
+
+        Args:
+            store: UploadStore whose files are probed
+            workers: Threads probing files at once
+            interval: Seconds between sweeps for unprobed files
+        """
+        self.store = store
+        self.workers = workers
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._prune = True
+        self._thread = None
+        self.probed_files = 0
+        self.failed_files = 0
+        self.probe_seconds = 0.0
+
+    def start(self):
+        """Start the background prober.
+
+        Returns:
+            MediaProber: self, for chaining
+        """
+        if self._thread is None:
+            self.store.subscribe(self._on_change)
+            self._thread = threading.Thread(target=self._run, name="media-prober", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background prober."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        """Return counters of the probes run by this process as a dict."""
+        return {
+            "probed_files": self.probed_files,
+            "failed_files": self.failed_files,
+            # Wall time per file, with the pool's threads probing side by side
+            "ms_per_file": self.probe_seconds * 1000 / self.probed_files if self.probed_files else 0.0,
+        }
+
+    def _on_change(self, event, record):
+        if event in ("deleted", "renamed"):
+            self._prune = True
+        self._wake.set()
+
+    def _run(self):
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="media-probe") as pool:
+            while not self._stopped.is_set():
+                self._wake.clear()
+                try:
+                    self.probe_pending(pool)
+                except Exception:
+                    logger.exception("Media probing failed")
+                self._wake.wait(self.interval)
+
+    def probe_pending(self, pool=None):
+        """Probe every indexed file without current results.
+
+        Args:
+            pool: Executor to probe on; without one, files are probed one by one
+
+        Returns:
+            int: Number of files probed
+        """
+        index = self.store.index
+        if self._prune:
+            self._prune = False
+            index.prune_media_info()
+        mapper = pool.map if pool is not None else map
+        seen = set()
+        probed = 0
+        while not self._stopped.is_set():
+            # A file changing while it is probed shows up again; leave it for the next sweep
+            records = [
+                r for r in index.unprobed(PROBE_BATCH) if (r["name"], r["size"], r["mtime"]) not in seen
+            ]
+            if not records:
+                break
+            seen.update((r["name"], r["size"], r["mtime"]) for r in records)
+            start = time.perf_counter()
+            results = list(mapper(lambda r: probe_file(r["path"], r["name"]), records))
+            self.probe_seconds += time.perf_counter() - start
+            index.set_media_info(zip(records, results))
+            probed += len(records)
+            self.probed_files += len(records)
+            self.failed_files += sum(1 for info in results if info["error"])
+        return probed
@@ -0,0 +1,279 @@
+"""Downscaled image previews with an on-disk, byte-budgeted LRU cache."""
+import hashlib
+import os
+import threading
+import urllib.parse
+from http import HTTPStatus
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; previews fall back to the original
+    Image = None
+
+# Longest edge in pixels for each preview size
+THUMBNAIL_SIZES = {
+    "small": 256,
+    "medium": 1024,
+}
+
+# Total bytes the cache may hold before least recently used previews are evicted
+DEFAULT_CACHE_BYTES = int(os.environ.get("THUMBNAIL_CACHE_BYTES", 512 * 1024 * 1024))
+
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_MIME = "image/webp"
+
+
+def thumbnails_available():
+    """Check whether Pillow is installed."""
+    return Image is not None
+
+
+def cache_key(record):
+    """Return the cache key for a stored file record.
+
+    Content-addressed files are keyed by digest so renames and duplicate
+    uploads share previews; loose files fall back to (path, size, mtime).
+    """
+    if record.get("digest"):
+        return record["digest"]
+    identity = f"{record['path']}:{record['size']}:{record['mtime']}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def render_thumbnail(source_path, target_path, max_edge):
+    """Write a downscaled WebP copy of an image.
+
+    Args:
+        source_path: Original image
+        target_path: Where to write the preview
+        max_edge: Longest edge of the preview in pixels
+    """
+    with Image.open(source_path) as image:
+        # Let the JPEG decoder downscale while decoding
+        image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=2.0)
+
+        tmp_path = target_path.with_name(f".{target_path.name}.tmp")
+        image.save(tmp_path, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY, method=4)
+    os.replace(tmp_path, target_path)
+
+
+def preview_path(root, record, size):
+    """Return where the preview of a record is cached under a cache directory."""
+    key = cache_key(record)
+    return Path(root) / key[:2] / f"{key}-{size}.webp"
+
+
+def thumbnail_job(record, params, progress):
+    """Job rendering every preview size of an uploaded image ahead of its first view.
+
+    Runs in a JobScheduler worker process. Sizes already cached are skipped.
+
+    Args:
+        record: Index record of the image
+        params: {"cache_dir": ThumbnailCache directory}
+        progress: Progress callback
+
+    Returns:
+        dict: "bytes" written to the cache
+    """
+    if Image is None:
+        return {"bytes": 0}
+    written = 0
+    for i, (size, max_edge) in enumerate(THUMBNAIL_SIZES.items()):
+        target = preview_path(params["cache_dir"], record, size)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            render_thumbnail(record["path"], target, max_edge)
+            written += target.stat().st_size
+        progress((i + 1) / len(THUMBNAIL_SIZES))
+    return {"bytes": written}
+
+
+class ThumbnailCache:
+    """Generates previews on first request and keeps them within a byte budget.
+
+    Each hit refreshes the preview's modification time, and eviction removes
+    the least recently used previews once the cache grows beyond its budget.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_CACHE_BYTES):
+        """Open the cache directory.
+
+        Args:
+            root: Directory holding cached previews
+            max_bytes: Byte budget for the whole cache
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Per-preview locks so concurrent requests render each preview once
+        self._pending = {}
+        self.total_bytes = sum(p.stat().st_size for p in self.root.glob("*/*.webp"))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, record, size):
+        """Return where the preview of a record is cached."""
+        return preview_path(self.root, record, size)
+
+    def account(self, added_bytes):
+        """Count previews written by another process (see thumbnail_job) against the budget."""
+        with self._lock:
+            self.total_bytes += added_bytes
+            over_budget = self.total_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def get(self, record, size="medium"):
+        """Return the path of a preview, generating it if needed.
+
+        Args:
+            record: Upload index record of an image
+            size: One of THUMBNAIL_SIZES
+
+        Returns:
+            Path or None: Cached preview, or None if it cannot be produced
+        """
+        if Image is None or size not in THUMBNAIL_SIZES:
+            return None
+        target = self.path_for(record, size)
+        if self._touch(target):
+            self.hits += 1
+            return target
+
+        with self._lock:
+            pending = self._pending.setdefault(target, threading.Lock())
+        with pending:
+            # Another request may have rendered it while we waited
+            if self._touch(target):
+                self.hits += 1
+                return target
+            target.parent.mkdir(exist_ok=True)
+            try:
+                render_thumbnail(record["path"], target, THUMBNAIL_SIZES[size])
+            except (OSError, ValueError, Image.DecompressionBombError):
+                return None
+            finally:
+                with self._lock:
+                    self._pending.pop(target, None)
+            self.misses += 1
+            with self._lock:
+                self.total_bytes += target.stat().st_size
+                over_budget = self.total_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+        return target
+
+    @staticmethod
+    def _touch(path):
+        """Mark a cached preview as recently used; False if it is missing."""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def evict(self, target_bytes=None):
+        """Remove least recently used previews until the cache fits its budget.
+
+        Args:
+            target_bytes: Size to shrink to; defaults to 90% of the budget so
+                eviction does not run on every new preview
+
+        Returns:
+            int: Number of previews removed
+        """
+        if target_bytes is None:
+            target_bytes = int(self.max_bytes * 0.9)
+        entries = []
+        for path in self.root.glob("*/*.webp"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= target_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self.total_bytes = total
+            self.evictions += removed
+        return removed
+
+    def discard(self, record):
+        """Remove every cached preview of a record."""
+        for size in THUMBNAIL_SIZES:
+            path = self.path_for(record, size)
+            try:
+                removed = path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.total_bytes -= removed
+
+
+# Media server route prefix serving previews as /thumb/<size>/<cache key>/<name>
+THUMBNAIL_PREFIX = "/thumb/"
+
+# Preview URLs carry the content's cache key, so browsers may cache them indefinitely
+THUMBNAIL_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def thumbnail_path(record, size="medium"):
+    """Return the media server URL path of a stored image's preview.
+
+    The path holds the content's cache key as well as the name, so a name
+    reused for another picture gets a new URL instead of the cached preview.
+    """
+    return f"{THUMBNAIL_PREFIX}{size}/{cache_key(record)}/{urllib.parse.quote(record['name'])}"
+
+
+def thumbnail_route(cache):
+    """Build a media server route that serves previews from a ThumbnailCache.
+
+    Args:
+        cache: ThumbnailCache generating and holding the previews
+
+    Returns:
+        callable: Route for MediaServer(routes={THUMBNAIL_PREFIX: ...})
+    """
+    def route(request, subpath):
+        if request.command not in ("GET", "HEAD"):
+            request.send_error_text(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed")
+            return
+        size, _, rest = subpath.partition("/")
+        key, _, name = rest.partition("/")
+        record = request.store.index.get(name) if name else None
+        # A URL made for content since replaced under the same name no longer resolves
+        path = cache.get(record, size) if record and cache_key(record) == key else None
+        if path is None:
+            request.send_error_text(HTTPStatus.NOT_FOUND, "Not found")
+            return
+        request.send_file(
+            path,
+            etag=f'"{cache_key(record)}-{size}"',
+            mtime=record["mtime"],
+            content_type=THUMBNAIL_MIME,
+            cache_control=THUMBNAIL_CACHE_CONTROL,
+        )
+    return route
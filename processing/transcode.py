@@ -0,0 +1,304 @@
+"""Browser-playable renditions of videos in formats browsers cannot play.
+
+MOV, AVI and MKV uploads get an MP4 or WebM copy made with a local ffmpeg.
+When the streams already use codecs browsers play, they are only remuxed
+into a new container (seconds, no quality loss); otherwise they are
+transcoded to H.264/AAC. Renditions are cached by content next to the
+preview cache, and are generated as background jobs (see JobScheduler).
+"""
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import urllib.parse
+from http import HTTPStatus
+from pathlib import Path
+
+from .thumbnails import cache_key
+
+# ffmpeg is optional; without it videos are offered as uploaded
+FFMPEG = os.environ.get("FFMPEG_BINARY") or shutil.which("ffmpeg")
+# ffprobe reads stream details more reliably; ffmpeg's own summary is used without it
+FFPROBE = os.environ.get("FFPROBE_BINARY") or shutil.which("ffprobe")
+
+# Transcodes running at once (override with TRANSCODE_CONCURRENCY)
+TRANSCODE_CONCURRENCY = int(os.environ.get("TRANSCODE_CONCURRENCY", 1))
+# Encoder threads per transcode; defaults to half the cores so the app stays responsive
+TRANSCODE_THREADS = int(os.environ.get("TRANSCODE_THREADS", 0)) or max(1, (os.cpu_count() or 2) // 2)
+
+# Video formats browsers play natively; other videos get a rendition
+BROWSER_VIDEO_SUFFIXES = (".mp4", ".webm", ".ogg")
+
+# Codecs each rendition container can carry as they are
+REMUX_CODECS = {
+    "mp4": ({"h264"}, {"aac", "mp3"}),
+    "webm": ({"vp8", "vp9", "av1"}, {"opus", "vorbis"}),
+}
+
+RENDITION_MIME = {
+    "mp4": "video/mp4",
+    "webm": "video/webm",
+}
+
+# Encoder settings used when the video has to be transcoded
+H264_ARGS = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p"]
+AAC_ARGS = ["-c:a", "aac", "-b:a", "128k"]
+
+# Seconds to wait for a probe before giving up on a file
+PROBE_TIMEOUT = 30
+
+# Bytes of ffmpeg's error output kept to explain a failure
+ERROR_TAIL_BYTES = 4096
+
+_STREAM_RE = re.compile(r"Stream #\d+:\d+.*?: (Video|Audio): (\w+)(.*)")
+_SIZE_RE = re.compile(r", (\d{2,5})x(\d{2,5})\b")
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_OUT_TIME_RE = re.compile(r"^(\d+):(\d+):(\d+(?:\.\d+)?)$")
+
+
+def transcoding_available():
+    """Check whether an ffmpeg binary was found."""
+    return bool(FFMPEG)
+
+
+def needs_rendition(record):
+    """Check whether a stored file is a video browsers cannot play as uploaded."""
+    return record["type"] == "Video" and Path(record["name"]).suffix.lower() not in BROWSER_VIDEO_SUFFIXES
+
+
+def rendition_for(root, record):
+    """Return the cached rendition of a video, if it has been made.
+
+    Args:
+        root: Rendition cache directory
+        record: Index record of the video
+
+    Returns:
+        tuple or None: (path, MIME type)
+    """
+    key = cache_key(record)
+    for container, mime in RENDITION_MIME.items():
+        path = Path(root) / key[:2] / f"{key}.{container}"
+        if path.exists():
+            return path, mime
+    return None
+
+
+def discard_rendition(root, record):
+    """Remove the cached rendition of a video, if any."""
+    found = rendition_for(root, record)
+    if found:
+        found[0].unlink(missing_ok=True)
+
+
+def probe(path):
+    """Read the codecs and duration of a media file.
+
+    Returns:
+        dict: "video" and "audio" codec names (None if there is no such
+        stream), the video's "width" and "height" and "duration" in seconds
+        (None if unknown)
+    """
+    if FFPROBE:
+        output = subprocess.run(
+            [FFPROBE, "-v", "error", "-show_entries",
+             "stream=codec_type,codec_name,width,height:format=duration", "-of", "json", str(path)],
+            capture_output=True, timeout=PROBE_TIMEOUT, check=True,
+        ).stdout
+        info = json.loads(output)
+        streams = {}
+        for stream in info.get("streams", []):
+            streams.setdefault(stream.get("codec_type"), stream)
+        video = streams.get("video", {})
+        duration = info.get("format", {}).get("duration")
+        return {
+            "video": video.get("codec_name"),
+            "audio": streams.get("audio", {}).get("codec_name"),
+            "width": video.get("width"),
+            "height": video.get("height"),
+            "duration": float(duration) if duration not in (None, "N/A") else None,
+        }
+
+    # Without ffprobe, parse the summary ffmpeg prints for its input
+    summary = subprocess.run(
+        [FFMPEG, "-hide_banner", "-nostdin", "-i", str(path)],
+        capture_output=True, timeout=PROBE_TIMEOUT,
+    ).stderr.decode("utf-8", "replace")
+    info = {"video": None, "audio": None, "width": None, "height": None, "duration": None}
+    for kind, codec, details in _STREAM_RE.findall(summary):
+        if info[kind.lower()] is None:
+            info[kind.lower()] = codec
+            size = _SIZE_RE.search(details) if kind == "Video" else None
+            if size:
+                info["width"], info["height"] = int(size.group(1)), int(size.group(2))
+    match = _DURATION_RE.search(summary)
+    if match:
+        hours, minutes, seconds = match.groups()
+        info["duration"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    return info
+
+
+def plan(info):
+    """Choose the container and per-stream ffmpeg arguments for a rendition.
+
+    Streams in codecs the container carries are copied; anything else is
+    encoded to H.264/AAC in MP4.
+
+    Args:
+        info: Result of probe()
+
+    Returns:
+        tuple: (container, ffmpeg codec arguments, mode) where mode is
+        "remux" (everything copied), "audio" (video copied, audio encoded)
+        or "transcode"
+    """
+    video, audio = info["video"], info["audio"]
+    for container, (video_codecs, audio_codecs) in REMUX_CODECS.items():
+        if video in video_codecs and (audio is None or audio in audio_codecs):
+            return container, ["-c", "copy"], "remux"
+    if video in REMUX_CODECS["mp4"][0]:
+        return "mp4", ["-c:v", "copy"] + AAC_ARGS, "audio"
+    return "mp4", H264_ARGS + AAC_ARGS, "transcode"
+
+
+def run_ffmpeg(command, duration, progress, message=None):
+    """Run ffmpeg at a lower CPU priority, reporting its progress.
+
+    Args:
+        command: ffmpeg command line, including "-progress pipe:1"
+        duration: Length of the input in seconds, or None if unknown
+        progress: Progress callback; when it raises (e.g. JobCancelled),
+            ffmpeg is killed and the exception propagates
+        message: Message reported with the progress
+
+    Raises:
+        RuntimeError: If ffmpeg fails
+    """
+    # Errors go to a file rather than a pipe: on corrupt input ffmpeg can log an
+    # error per frame, and a full pipe nobody reads would stall it for good
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=stderr,
+            preexec_fn=(lambda: os.nice(10)) if hasattr(os, "nice") else None,
+        )
+        try:
+            for line in process.stdout:
+                name, _, value = line.decode("ascii", "replace").strip().partition("=")
+                match = _OUT_TIME_RE.match(value) if name == "out_time" and duration else None
+                if match:
+                    hours, minutes, seconds = match.groups()
+                    elapsed = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+                    progress(min(elapsed / duration, 0.99), message)
+            if process.wait() != 0:
+                errors = _tail(stderr)
+                raise RuntimeError(f"ffmpeg failed: {errors.splitlines()[-1] if errors else process.returncode}")
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+
+
+def _tail(f, max_bytes=ERROR_TAIL_BYTES):
+    """Return the last max_bytes of a binary file as stripped text."""
+    f.seek(max(f.seek(0, os.SEEK_END) - max_bytes, 0))
+    return f.read().decode("utf-8", "replace").strip()
+
+
+def transcode_job(record, params, progress):
+    """Job making the browser-playable rendition of a video.
+
+    Runs in a JobScheduler worker process; ffmpeg is stopped if the job is
+    cancelled.
+
+    Args:
+        record: Index record of the video
+        params: {"cache_dir": rendition cache directory, "threads": encoder threads}
+        progress: Progress callback
+
+    Returns:
+        dict: "path" and "mime" of the rendition, "mode" (see plan()) and
+        "bytes" written
+    """
+    existing = rendition_for(params["cache_dir"], record)
+    if existing:
+        return {"path": str(existing[0]), "mime": existing[1], "mode": "cached", "bytes": 0}
+
+    info = probe(record["path"])
+    if info["video"] is None:
+        raise ValueError("No video stream found")
+    container, codec_args, mode = plan(info)
+    key = cache_key(record)
+    target = Path(params["cache_dir"]) / key[:2] / f"{key}.{container}"
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.tmp")
+
+    command = [
+        FFMPEG, "-hide_banner", "-nostdin", "-loglevel", "error", "-y", "-i", record["path"],
+        # Subtitle and data streams often cannot be carried; keep the first picture and sound
+        "-map", "0:v:0", "-map", "0:a:0?", *codec_args, "-threads", str(params.get("threads", 0)),
+        "-progress", "pipe:1", "-nostats",
+    ]
+    if container == "mp4":
+        # Index up front so playback can start before the whole file has loaded
+        command += ["-movflags", "+faststart"]
+    command += ["-f", container, str(tmp_path)]
+
+    try:
+        run_ffmpeg(command, info["duration"], progress, mode)
+        os.replace(tmp_path, target)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    progress(1.0, mode)
+    return {"path": str(target), "mime": RENDITION_MIME[container], "mode": mode, "bytes": target.stat().st_size}
+
+
+# Media server route prefix serving renditions as /rendition/<cache key>/<name>
+RENDITION_PREFIX = "/rendition/"
+
+# Rendition URLs carry the content's cache key, so browsers may cache them indefinitely
+RENDITION_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def rendition_path(record):
+    """Return the media server URL path of a stored video's rendition.
+
+    The path holds the content's cache key as well as the name, so a name
+    reused for another video gets a new URL instead of the cached rendition.
+    """
+    return f"{RENDITION_PREFIX}{cache_key(record)}/{urllib.parse.quote(record['name'])}"
+
+
+def rendition_route(root):
+    """Build a media server route that serves cached renditions with byte ranges.
+
+    Args:
+        root: Rendition cache directory
+
+    Returns:
+        callable: Route for MediaServer(routes={RENDITION_PREFIX: ...})
+    """
+    def route(request, subpath):
+        if request.command not in ("GET", "HEAD"):
+            request.send_error_text(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed")
+            return
+        key, _, name = subpath.partition("/")
+        record = request.store.index.get(name) if name else None
+        # A URL made for content since replaced under the same name no longer resolves
+        found = rendition_for(root, record) if record and cache_key(record) == key else None
+        if found is None:
+            request.send_error_text(HTTPStatus.NOT_FOUND, "Not found")
+            return
+        if request.command == "GET":
+            request.store.touch(record["name"])
+        request.send_file(
+            found[0],
+            etag=f'"{cache_key(record)}-rendition"',
+            mtime=record["mtime"],
+            content_type=found[1],
+            cache_control=RENDITION_CACHE_CONTROL,
+        )
+    return route
+
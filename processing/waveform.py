@@ -0,0 +1,273 @@
+"""Precomputed waveform peaks of audio files.
+
+Each audio file is decoded once, by a local ffmpeg (or Python's wave module
+for WAV files without it), and reduced to the minimum and maximum sample of
+every short bucket. The peaks are stored as 8-bit values in the binary
+format of BBC audiowaveform (.dat), so even a multi-hour recording becomes a
+file of at most a few hundred kilobytes that players draw instantly. Peaks
+are cached by content and served by the media server under /waveform/.
+"""
+import os
+import struct
+import subprocess
+import urllib.parse
+import wave
+from http import HTTPStatus
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; audio then plays without a waveform
+    np = None
+
+from .metadata import probe_file
+from .thumbnails import cache_key
+from .transcode import FFMPEG
+
+# Audio formats that get waveform peaks
+WAVEFORM_SUFFIXES = (".mp3", ".wav", ".ogg", ".m4a", ".flac")
+
+# Peaks per second of audio for typical recordings (override with WAVEFORM_PEAKS_PER_SECOND)
+PEAKS_PER_SECOND = int(os.environ.get("WAVEFORM_PEAKS_PER_SECOND", 20))
+# Most peaks per file; longer recordings get wider buckets so the file stays small
+MAX_PEAKS = 65536
+
+# Audio is decoded to mono at this rate; peaks only need the envelope
+DECODE_SAMPLE_RATE = 8000
+
+# Bytes of decoded audio reduced at a time
+DECODE_CHUNK_BYTES = 1024 * 1024
+
+# audiowaveform .dat header: version, flags (1 = 8-bit), sample rate, samples per peak, peak count
+PEAKS_HEADER = struct.Struct("<iIiiI")
+PEAKS_VERSION = 1
+PEAKS_FLAG_8BIT = 1
+
+# Media server route prefix serving peaks as /waveform/<cache key>/<name>
+WAVEFORM_PREFIX = "/waveform/"
+
+# Peak URLs carry the content's cache key, so browsers may cache them indefinitely
+WAVEFORM_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def waveforms_available():
+    """Check whether NumPy is installed to reduce audio to peaks."""
+    return np is not None
+
+
+def needs_waveform(record):
+    """Check whether a stored file is audio that can get waveform peaks.
+
+    Without ffmpeg only WAV files can be decoded.
+    """
+    suffix = Path(record["name"]).suffix.lower()
+    return suffix in WAVEFORM_SUFFIXES and (bool(FFMPEG) or suffix == ".wav")
+
+
+def waveform_for(root, record):
+    """Return the cached peaks file of an audio file, or None if not computed yet."""
+    key = cache_key(record)
+    path = Path(root) / key[:2] / f"{key}.dat"
+    return path if path.exists() else None
+
+
+def discard_waveform(root, record):
+    """Remove the cached peaks of an audio file, if any."""
+    path = waveform_for(root, record)
+    if path:
+        path.unlink(missing_ok=True)
+
+
+def samples_per_peak(sample_rate, duration):
+    """Choose how many samples each peak covers.
+
+    Args:
+        sample_rate: Rate of the decoded audio
+        duration: Length in seconds, or None if unknown
+
+    Returns:
+        int: PEAKS_PER_SECOND resolution, made coarser for recordings that
+        would otherwise need more than MAX_PEAKS peaks
+    """
+    width = max(1, sample_rate // PEAKS_PER_SECOND)
+    if duration:
+        width = max(width, -(-int(duration * sample_rate) // MAX_PEAKS))
+    return width
+
+
+class PeakReducer:
+    """Reduces a stream of 16-bit samples to (min, max) pairs per bucket.
+
+    Memory use is bounded by the chunk being reduced plus the peaks, however
+    long the recording.
+    """
+
+    def __init__(self, width):
+        """Set up an empty reducer.
+
+        Args:
+            width: Samples per bucket (interleaved channels count separately)
+        """
+        self.width = width
+        self._rest = np.empty(0, dtype=np.int16)
+        self._peaks = []
+
+    def feed(self, samples):
+        """Reduce the next samples; an incomplete last bucket is kept for later."""
+        if self._rest.size:
+            samples = np.concatenate((self._rest, samples))
+        whole = samples.size - samples.size % self.width
+        if whole:
+            self._add(samples[:whole].reshape(-1, self.width))
+        self._rest = samples[whole:].copy()
+
+    def _add(self, buckets):
+        pairs = np.empty((buckets.shape[0], 2), dtype=np.int8)
+        # Keep the top 8 bits of each 16-bit sample
+        pairs[:, 0] = buckets.min(axis=1) >> 8
+        pairs[:, 1] = buckets.max(axis=1) >> 8
+        self._peaks.append(pairs)
+
+    def finish(self):
+        """Return every (min, max) pair, including the last partial bucket, as bytes."""
+        if self._rest.size:
+            self._add(self._rest.reshape(1, -1))
+            self._rest = self._rest[:0]
+        peaks = np.concatenate(self._peaks) if self._peaks else np.empty((0, 2), dtype=np.int8)
+        return peaks.tobytes()
+
+
+def _decode_ffmpeg(path, reducer, duration, progress):
+    """Stream mono 16-bit audio from ffmpeg into a reducer."""
+    process = subprocess.Popen(
+        [FFMPEG, "-hide_banner", "-nostdin", "-loglevel", "error", "-i", str(path),
+         "-vn", "-ac", "1", "-ar", str(DECODE_SAMPLE_RATE), "-f", "s16le", "pipe:1"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        preexec_fn=(lambda: os.nice(10)) if hasattr(os, "nice") else None,
+    )
+    decoded = 0
+    try:
+        while True:
+            chunk = process.stdout.read(DECODE_CHUNK_BYTES)
+            if not chunk:
+                break
+            # Keep whole samples; a stray odd byte joins the next read
+            if len(chunk) % 2:
+                chunk += process.stdout.read(1)
+            reducer.feed(np.frombuffer(chunk, dtype="<i2"))
+            decoded += len(chunk) // 2
+            if duration:
+                progress(min(decoded / DECODE_SAMPLE_RATE / duration, 0.99))
+        errors = process.stderr.read().decode("utf-8", "replace").strip()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {errors.splitlines()[-1] if errors else process.returncode}")
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+
+
+def _decode_wav(path, progress):
+    """Reduce a 16-bit PCM WAV file with the wave module.
+
+    Returns:
+        tuple: (sample rate, samples per peak, peak bytes)
+    """
+    with wave.open(str(path), "rb") as reader:
+        if reader.getsampwidth() != 2:
+            raise ValueError("Only 16-bit WAV files can be read without ffmpeg")
+        rate, channels, frames = reader.getframerate(), reader.getnchannels(), reader.getnframes()
+        width = samples_per_peak(rate, frames / rate if rate else None)
+        # Buckets span every channel of the same frames, so peaks cover all of them
+        reducer = PeakReducer(width * channels)
+        frames_per_chunk = DECODE_CHUNK_BYTES // (2 * channels)
+        done = 0
+        while True:
+            data = reader.readframes(frames_per_chunk)
+            if not data:
+                break
+            reducer.feed(np.frombuffer(data, dtype="<i2"))
+            done += len(data) // (2 * channels)
+            progress(min(done / frames, 0.99) if frames else 0.0)
+    return rate, width, reducer.finish()
+
+
+def waveform_job(record, params, progress):
+    """Job computing the waveform peaks of an audio file.
+
+    Runs in a JobScheduler worker process.
+
+    Args:
+        record: Index record of the audio file
+        params: {"cache_dir": peaks cache directory}
+        progress: Progress callback
+
+    Returns:
+        dict: "peaks" computed, "samples_per_peak" and "bytes" written
+    """
+    existing = waveform_for(params["cache_dir"], record)
+    if existing:
+        return {"peaks": 0, "samples_per_peak": 0, "bytes": 0}
+
+    if FFMPEG:
+        duration = probe_file(record["path"], record["name"])["duration"]
+        rate, width = DECODE_SAMPLE_RATE, samples_per_peak(DECODE_SAMPLE_RATE, duration)
+        reducer = PeakReducer(width)
+        _decode_ffmpeg(record["path"], reducer, duration, progress)
+        peaks = reducer.finish()
+    else:
+        rate, width, peaks = _decode_wav(record["path"], progress)
+
+    key = cache_key(record)
+    target = Path(params["cache_dir"]) / key[:2] / f"{key}.dat"
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(PEAKS_HEADER.pack(PEAKS_VERSION, PEAKS_FLAG_8BIT, rate, width, len(peaks) // 2))
+            f.write(peaks)
+        os.replace(tmp_path, target)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    progress(1.0)
+    return {"peaks": len(peaks) // 2, "samples_per_peak": width, "bytes": target.stat().st_size}
+
+
+def waveform_path(record):
+    """Return the media server URL path of a stored audio file's peaks.
+
+    The path holds the content's cache key as well as the name, so a name
+    reused for another recording gets a new URL instead of the cached peaks.
+    """
+    return f"{WAVEFORM_PREFIX}{cache_key(record)}/{urllib.parse.quote(record['name'])}"
+
+
+def waveform_route(root):
+    """Build a media server route that serves cached waveform peaks.
+
+    Args:
+        root: Peaks cache directory
+
+    Returns:
+        callable: Route for MediaServer(routes={WAVEFORM_PREFIX: ...})
+    """
+    def route(request, subpath):
+        if request.command not in ("GET", "HEAD"):
+            request.send_error_text(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed")
+            return
+        key, _, name = subpath.partition("/")
+        record = request.store.index.get(name) if name else None
+        # A URL made for content since replaced under the same name no longer resolves
+        path = waveform_for(root, record) if record and cache_key(record) == key else None
+        if path is None:
+            request.send_error_text(HTTPStatus.NOT_FOUND, "Not found")
+            return
+        request.send_file(
+            path,
+            etag=f'"{cache_key(record)}-peaks"',
+            mtime=record["mtime"],
+            content_type="application/octet-stream",
+            cache_control=WAVEFORM_CACHE_CONTROL,
+        )
+    return route
@@ -0,0 +1,65 @@
+"""Worker process for the background job scheduler.
+
+Started by JobScheduler as ``python -m processing.worker <job database>``.
+It claims ready jobs from the database, highest priority first, and runs
+them one at a time. A line on stdin wakes it early when jobs are queued, and
+stdin closing (the scheduler stopping or exiting) makes it exit once its
+current job is finished.
+"""
+import json
+import logging
+import os
+import select
+import sys
+import time
+import traceback
+
+from .jobs import JobCancelled, POLL_INTERVAL, _Progress, _connect, claim_job, finish_job, load_function
+
+
+def _wait(stdin):
+    """Sleep until woken or POLL_INTERVAL passes.
+
+    Returns:
+        bool: False once stdin has closed
+    """
+    try:
+        ready, _, _ = select.select([stdin], [], [], POLL_INTERVAL)
+    except OSError:
+        # select() cannot wait on pipes on Windows; just poll
+        time.sleep(POLL_INTERVAL)
+        return True
+    return not ready or bool(os.read(stdin, 4096))
+
+
+def run(db_path):
+    """Run jobs until stdin closes.
+
+    Args:
+        db_path: Path of the job database
+    """
+    conn = _connect(db_path)
+    stdin = sys.stdin.fileno()
+    pid = os.getpid()
+    while True:
+        job = claim_job(conn, pid)
+        if job is None:
+            if not _wait(stdin):
+                return
+            continue
+
+        result = error = None
+        try:
+            func = load_function(job["func"])
+            result = func(json.loads(job["record"]), json.loads(job["params"]), _Progress(db_path, job["id"]))
+        except JobCancelled:
+            pass
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finish_job(conn, job["id"], result, error)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(name)s: %(message)s")
+    run(sys.argv[1])
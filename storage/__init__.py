@@ -0,0 +1,36 @@
+"""Server-side storage for uploaded media files."""
+from .api import API_PREFIX, api_route
+from .assets import ASSETS_PREFIX, StaticAssets
+from .blobs import BlobStore, BLOB_DIRNAME, hash_stream
+from .catalog import CatalogSnapshot, UploadCatalog
+from .index import UploadIndex, INDEX_FILENAME
+from .quota import QuotaExceeded, StorageQuota
+from .resumable import RESUMABLE_PREFIX, ResumableUploads
+from .server import MediaServer, media_path
+from .store import UploadStore
+from .writer import copy_stream, save_stream, is_partial, remove_stale_partials
+
+__all__ = [
+    'UploadStore',
+    'UploadCatalog',
+    'CatalogSnapshot',
+    'StorageQuota',
+    'QuotaExceeded',
+    'MediaServer',
+    'media_path',
+    'API_PREFIX',
+    'api_route',
+    'StaticAssets',
+    'ASSETS_PREFIX',
+    'ResumableUploads',
+    'RESUMABLE_PREFIX',
+    'BlobStore',
+    'BLOB_DIRNAME',
+    'hash_stream',
+    'UploadIndex',
+    'INDEX_FILENAME',
+    'copy_stream',
+    'save_stream',
+    'is_partial',
+    'remove_stale_partials',
+]
@@ -0,0 +1,336 @@
+"""JSON admin API served by the media server.
+
+Handles listing, inspecting and deleting uploads without a Streamlit script
+run: each call is one index query or store operation on a plain HTTP thread.
+"""
+import hmac
+from datetime import datetime, timedelta
+from functools import partial
+from http import HTTPStatus
+
+from .index import SORT_COLUMNS
+
+# Media server route prefix for the API
+API_PREFIX = "/api/"
+
+# Page size used by GET /api/files when no limit is given, and the largest allowed
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Most files removed by one POST /api/bulk-delete
+MAX_BULK_DELETE = 10000
+
+# Bulk-delete body keys selecting files by predicate instead of by name
+PREDICATE_KEYS = ("pattern", "type", "min_size", "max_size", "older_than_days")
+
+# Job statuses accepted by GET /api/jobs?status=
+JOB_STATUSES = ("queued", "running", "done", "failed", "cancelled")
+
+
+def public_record(record):
+    """Return the fields of an index record exposed by the API."""
+    return {
+        "name": record["name"],
+        "size": record["size"],
+        "type": record["type"],
+        "uploaded_at": record["uploaded_at"],
+        "mtime": record["mtime"],
+        "digest": record["digest"],
+        "accessed_at": record["accessed_at"],
+        "pinned": bool(record["pinned"]),
+    }
+
+
+def content_removed(record):
+    """Whether deleting a record removed its content from disk.
+
+    Loose files always go with their name; blobs only once no name uses them.
+    """
+    return record["digest"] is None or record["orphaned"]
+
+
+def _error(message):
+    return {"status": "error", "message": message}
+
+
+def _request_token(request):
+    """Extract the admin token from the Authorization header, X-Admin-Token or ?admin=."""
+    authorization = request.headers.get("Authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip()
+    return request.headers.get("X-Admin-Token") or request.query.get("admin", [""])[0]
+
+
+def _int_param(query, name, default, minimum, maximum):
+    """Parse a bounded integer query parameter; raises ValueError when invalid."""
+    value = int(query.get(name, [default])[0])
+    if not minimum <= value <= maximum:
+        raise ValueError(name)
+    return value
+
+
+def _bool_param(query, name):
+    """Parse an optional true/false query parameter; raises ValueError when invalid."""
+    if name not in query:
+        return None
+    value = query[name][0].lower()
+    if value not in ("true", "false", "1", "0"):
+        raise ValueError(name)
+    return value in ("true", "1")
+
+
+def api_route(admin_token, jobs=None):
+    """Build the media server route for the JSON admin API.
+
+    Endpoints (all require the admin token):
+        GET    /api/files              List uploads, paginated and filterable
+        GET    /api/files/<name>       Details of one upload
+        DELETE /api/files/<name>       Delete one upload
+        POST   /api/bulk-delete        Delete uploads by name, {"filenames": [...]}, or
+                                       by predicate, {"pattern": "*.tmp",
+                                       "older_than_days": 30, ...}; add
+                                       "dry_run": true to only list matches
+        GET    /api/jobs               List background jobs (with a job scheduler)
+        GET    /api/jobs/metrics       Queue depth and latency of background jobs
+        GET    /api/jobs/<id>          Details of one job
+        DELETE /api/jobs/<id>          Cancel a queued or running job
+
+    Args:
+        admin_token: Callable returning the configured ADMIN_TOKEN, or "" if
+            none is set; called per request so rotated secrets apply at once
+        jobs: Optional JobScheduler exposed under /api/jobs
+
+    Returns:
+        callable: Route for MediaServer(routes={API_PREFIX: ...})
+    """
+    def route(request, subpath):
+        required = admin_token()
+        if not required:
+            request.send_json(HTTPStatus.UNAUTHORIZED, _error("Unauthorized: Admin token not configured"))
+            return
+        if not hmac.compare_digest(_request_token(request).encode("utf-8"), required.encode("utf-8")):
+            request.send_json(HTTPStatus.UNAUTHORIZED, _error("Unauthorized: Invalid or missing admin token"))
+            return
+
+        resource, _, name = subpath.partition("/")
+        if resource == "files" and not name:
+            handlers = {"GET": _list_files, "HEAD": _list_files}
+        elif resource == "files":
+            handlers = {"GET": _stat_file, "HEAD": _stat_file, "DELETE": _delete_file}
+        elif resource == "bulk-delete" and not name:
+            handlers = {"POST": _bulk_delete}
+        elif resource == "jobs" and jobs is not None and not name:
+            handlers = {"GET": partial(_list_jobs, jobs), "HEAD": partial(_list_jobs, jobs)}
+        elif resource == "jobs" and jobs is not None and name == "metrics":
+            handlers = {"GET": partial(_job_metrics, jobs), "HEAD": partial(_job_metrics, jobs)}
+        elif resource == "jobs" and jobs is not None:
+            handlers = {"GET": partial(_stat_job, jobs), "HEAD": partial(_stat_job, jobs),
+                        "DELETE": partial(_cancel_job, jobs)}
+        else:
+            request.send_json(HTTPStatus.NOT_FOUND, _error("Not found"))
+            return
+
+        handler = handlers.get(request.command)
+        if handler is None:
+            request.send_empty(HTTPStatus.METHOD_NOT_ALLOWED, {"Allow": ", ".join(handlers)})
+            return
+        handler(request, name)
+    return route
+
+
+def _list_files(request, _name):
+    query = request.query
+    try:
+        offset = _int_param(query, "offset", 0, 0, 2 ** 62)
+        limit = _int_param(query, "limit", DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        min_size = int(query["min_size"][0]) if "min_size" in query else None
+        max_size = int(query["max_size"][0]) if "max_size" in query else None
+        min_duration = float(query["min_duration"][0]) if "min_duration" in query else None
+        max_duration = float(query["max_duration"][0]) if "max_duration" in query else None
+        min_height = int(query["min_height"][0]) if "min_height" in query else None
+        mismatched = _bool_param(query, "mismatched")
+    except ValueError as e:
+        request.send_json(HTTPStatus.BAD_REQUEST, _error(f"Invalid parameter: {e}"))
+        return
+    sort = query.get("sort", ["uploaded_at"])[0]
+    order = query.get("order", ["desc"])[0]
+    if sort not in SORT_COLUMNS or order not in ("asc", "desc"):
+        request.send_json(HTTPStatus.BAD_REQUEST, _error("Invalid parameter: sort or order"))
+        return
+
+    filters = {
+        "media_type": query.get("type", [None])[0],
+        "search": query.get("search", [None])[0],
+        "min_size": min_size,
+        "max_size": max_size,
+        "uploaded_after": query.get("uploaded_after", [None])[0],
+        "uploaded_before": query.get("uploaded_before", [None])[0],
+        "min_duration": min_duration,
+        "max_duration": max_duration,
+        "min_height": min_height,
+        "codec": query.get("codec", [None])[0],
+        "mismatched": mismatched,
+    }
+    index = request.store.index
+    records = index.query(offset=offset, limit=limit, sort=sort, descending=order == "desc", **filters)
+    media = index.media_info(r["name"] for r in records)
+    request.send_json(HTTPStatus.OK, {
+        "status": "success",
+        "total": index.count(**filters),
+        "offset": offset,
+        "limit": limit,
+        "files": [dict(public_record(r), media=media.get(r["name"])) for r in records],
+    })
+
+
+def _stat_file(request, name):
+    record = request.store.index.get(name)
+    if record is None:
+        request.send_json(HTTPStatus.NOT_FOUND, _error(f"File '{name}' not found"))
+        return
+    media = request.store.index.media_info([name]).get(name)
+    request.send_json(HTTPStatus.OK, {"status": "success", "file": dict(public_record(record), media=media)})
+
+
+def _delete_file(request, name):
+    try:
+        record = request.store.delete(name)
+    except OSError as e:
+        request.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, _error(f"Failed to delete file: {e}"))
+        return
+    if record is None:
+        request.send_json(HTTPStatus.NOT_FOUND, _error(f"File '{name}' not found"))
+        return
+    request.send_json(HTTPStatus.OK, {
+        "status": "success",
+        "message": f"File '{name}' deleted successfully",
+        "content_removed": content_removed(record),
+    })
+
+
+def _bulk_delete(request, _name):
+    body = request.read_json()
+    if not isinstance(body, dict):
+        request.send_json(HTTPStatus.BAD_REQUEST, _error("Expected a JSON object body"))
+        return
+
+    if "filenames" in body:
+        filenames = body["filenames"]
+        if not isinstance(filenames, list) or not all(isinstance(f, str) for f in filenames):
+            request.send_json(HTTPStatus.BAD_REQUEST, _error('"filenames" must be a list of names'))
+            return
+    else:
+        try:
+            filters = _predicate_filters(body)
+        except (TypeError, ValueError) as e:
+            request.send_json(HTTPStatus.BAD_REQUEST, _error(f"Invalid predicate: {e}"))
+            return
+        if not filters:
+            request.send_json(HTTPStatus.BAD_REQUEST, _error(
+                'Give "filenames" or at least one of ' + ", ".join(f'"{k}"' for k in PREDICATE_KEYS)
+            ))
+            return
+        filenames = [r["name"] for r in request.store.index.query(limit=MAX_BULK_DELETE + 1, **filters)]
+    if len(filenames) > MAX_BULK_DELETE:
+        request.send_json(HTTPStatus.BAD_REQUEST, _error(
+            f"More than {MAX_BULK_DELETE} files; narrow the selection and repeat"
+        ))
+        return
+
+    if body.get("dry_run"):
+        request.send_json(HTTPStatus.OK, {
+            "status": "success", "dry_run": True, "matched": len(filenames), "files": filenames,
+        })
+        return
+
+    outcome = request.store.delete_many(filenames)
+    removed = {record["name"]: record for record in outcome["deleted"]}
+    results = []
+    for name in dict.fromkeys(filenames):
+        if name not in removed:
+            results.append({"name": name, "status": "not_found"})
+        elif name in outcome["errors"]:
+            results.append({"name": name, "status": "error", "message": outcome["errors"][name]})
+        else:
+            results.append({
+                "name": name, "status": "deleted", "content_removed": content_removed(removed[name]),
+            })
+    deleted = len(outcome["deleted"]) - len(outcome["errors"])
+    request.send_json(HTTPStatus.OK, {
+        "status": "success" if deleted == len(results) else "partial",
+        "matched": len(results),
+        "deleted": deleted,
+        "elapsed_ms": round(outcome["elapsed"] * 1000, 1),
+        "results": results,
+    })
+
+
+def _predicate_filters(body):
+    """Translate a bulk-delete predicate into upload index filters."""
+    filters = {}
+    if body.get("pattern"):
+        filters["pattern"] = str(body["pattern"])
+    if body.get("type"):
+        filters["media_type"] = str(body["type"])
+    if body.get("min_size") is not None:
+        filters["min_size"] = int(body["min_size"])
+    if body.get("max_size") is not None:
+        filters["max_size"] = int(body["max_size"])
+    if body.get("older_than_days") is not None:
+        cutoff = datetime.now() - timedelta(days=float(body["older_than_days"]))
+        filters["uploaded_before"] = cutoff.isoformat()
+    return filters
+
+
+def _list_jobs(jobs, request, _name):
+    query = request.query
+    status = query.get("status", [None])[0]
+    try:
+        limit = _int_param(query, "limit", DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        if status is not None and status not in JOB_STATUSES:
+            raise ValueError("status")
+    except ValueError as e:
+        request.send_json(HTTPStatus.BAD_REQUEST, _error(f"Invalid parameter: {e}"))
+        return
+    request.send_json(HTTPStatus.OK, {
+        "status": "success",
+        "jobs": jobs.jobs(status=status, kind=query.get("kind", [None])[0], limit=limit),
+    })
+
+
+def _job_metrics(jobs, request, _name):
+    request.send_json(HTTPStatus.OK, {"status": "success", "metrics": jobs.metrics()})
+
+
+def _job_id(request, name):
+    """Parse a job id from the path, answering 404 if it is not one."""
+    if not name.isdigit():
+        request.send_json(HTTPStatus.NOT_FOUND, _error(f"Job '{name}' not found"))
+        return None
+    return int(name)
+
+
+def _stat_job(jobs, request, name):
+    job_id = _job_id(request, name)
+    if job_id is None:
+        return
+    job = jobs.get(job_id)
+    if job is None:
+        request.send_json(HTTPStatus.NOT_FOUND, _error(f"Job '{name}' not found"))
+        return
+    request.send_json(HTTPStatus.OK, {"status": "success", "job": job})
+
+
+def _cancel_job(jobs, request, name):
+    job_id = _job_id(request, name)
+    if job_id is None:
+        return
+    if jobs.get(job_id) is None:
+        request.send_json(HTTPStatus.NOT_FOUND, _error(f"Job '{name}' not found"))
+        return
+    cancelled = jobs.cancel(job_id)
+    request.send_json(HTTPStatus.OK, {
+        "status": "success",
+        "cancelled": cancelled,
+        "message": f"Job {job_id} cancelled" if cancelled else f"Job {job_id} had already finished",
+    })
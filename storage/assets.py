@@ -0,0 +1,89 @@
+"""Versioned static assets served by the media server.
+
+A directory of front-end files (a component's scripts and styles) is served
+under a path that contains a hash of its contents:
+
+    GET /assets/<name>/<version>/<file>
+
+Because a change to any file changes the version, and with it every URL,
+responses can be cached by browsers for a year without ever going stale.
+Requests for another version are answered 404, so a page from before an
+upgrade fails loudly instead of mixing old and new files.
+"""
+import hashlib
+import mimetypes
+from http import HTTPStatus
+from pathlib import Path
+
+# Media server route prefix for static assets
+ASSETS_PREFIX = "/assets/"
+
+# Asset URLs change whenever their contents do, so browsers may cache them indefinitely
+ASSETS_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Characters of the content hash used as the version
+_VERSION_LENGTH = 12
+
+
+class StaticAssets:
+    """The files of one asset directory, with a version derived from their contents.
+
+    Only files directly inside the directory are served; subdirectories and
+    files added after construction are not.
+    """
+
+    def __init__(self, root):
+        """Hash the directory's files.
+
+        Args:
+            root: Directory holding the assets; its name becomes part of the URL
+        """
+        self.root = Path(root)
+        self.name = self.root.name
+        self.files = {}
+        digest = hashlib.sha256()
+        for path in sorted(self.root.iterdir()):
+            if not path.is_file():
+                continue
+            data = path.read_bytes()
+            digest.update(path.name.encode("utf-8") + b"\0")
+            digest.update(hashlib.sha256(data).digest())
+            self.files[path.name] = path
+        self.version = digest.hexdigest()[:_VERSION_LENGTH]
+
+    @property
+    def prefix(self):
+        """Route prefix of this directory, for MediaServer(routes={assets.prefix: ...})."""
+        return f"{ASSETS_PREFIX}{self.name}/"
+
+    @property
+    def path(self):
+        """URL path of the current version, ending in a slash; file names are appended to it."""
+        return f"{self.prefix}{self.version}/"
+
+    def route(self):
+        """Build a media server route that serves the current version's files.
+
+        Returns:
+            callable: Route for MediaServer(routes={assets.prefix: ...})
+        """
+        def route(request, subpath):
+            if request.command not in ("GET", "HEAD"):
+                request.send_error_text(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed")
+                return
+            version, _, name = subpath.partition("/")
+            path = self.files.get(name) if version == self.version else None
+            if path is None:
+                request.send_error_text(HTTPStatus.NOT_FOUND, "Not found")
+                return
+            content_type, _ = mimetypes.guess_type(name)
+            if content_type and content_type.startswith("text/"):
+                content_type += "; charset=utf-8"
+            request.send_file(
+                path,
+                etag=f'"{self.version}-{name}"',
+                mtime=path.stat().st_mtime,
+                content_type=content_type or "application/octet-stream",
+                cache_control=ASSETS_CACHE_CONTROL,
+            )
+        return route
@@ -0,0 +1,103 @@
+"""Content-addressed blob storage for uploaded files."""
+import hashlib
+import os
+import uuid
+from pathlib import Path
+
+from .writer import DEFAULT_CHUNK_SIZE, PARTIAL_PREFIX, PARTIAL_SUFFIX, save_stream
+
+# Blobs live in a hidden directory inside the upload directory
+BLOB_DIRNAME = ".blobs"
+
+HASH_ALGORITHM = "sha256"
+
+
+def hash_stream(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Hash a binary stream from its current position to the end.
+
+    Args:
+        source: Readable binary file-like object
+        chunk_size: Size of the reusable read buffer in bytes
+
+    Returns:
+        tuple: (hex digest, number of bytes read)
+    """
+    hasher = hashlib.new(HASH_ALGORITHM)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    size = 0
+    while True:
+        n = source.readinto(view)
+        if not n:
+            break
+        hasher.update(view[:n])
+        size += n
+    return hasher.hexdigest(), size
+
+
+class BlobStore:
+    """Files stored once per unique content, keyed by their SHA-256 digest.
+
+    Blobs are sharded by the first two hex digits of the digest to keep
+    directories small: ``<root>/ab/abcdef...``.
+    """
+
+    def __init__(self, root):
+        """Create the blob directory if needed.
+
+        Args:
+            root: Directory holding the blobs
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest):
+        """Return the on-disk location of a blob."""
+        return self.root / digest[:2] / digest
+
+    def exists(self, digest):
+        """Check whether a blob is stored."""
+        return self.path_for(digest).is_file()
+
+    def stage(self, source, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Stream a source into a hidden staging file, hashing as it is written.
+
+        The staged file must be passed to commit() (or discarded) afterwards.
+
+        Args:
+            source: Readable binary file-like object
+            chunk_size: Size of the reusable copy buffer in bytes
+
+        Returns:
+            tuple: (staging path, hex digest, size in bytes)
+        """
+        hasher = hashlib.new(HASH_ALGORITHM)
+        staging = self.root / f"{PARTIAL_PREFIX}{uuid.uuid4().hex}{PARTIAL_SUFFIX}"
+        size = save_stream(source, staging, chunk_size=chunk_size, hasher=hasher)
+        return staging, hasher.hexdigest(), size
+
+    def commit(self, staging, digest):
+        """Move a staged file into place, or drop it if the blob already exists.
+
+        Returns:
+            Path: Location of the blob
+        """
+        target = self.path_for(digest)
+        if target.is_file():
+            os.unlink(staging)
+        else:
+            target.parent.mkdir(exist_ok=True)
+            os.replace(staging, target)
+        return target
+
+    def delete(self, digest):
+        """Remove a blob from disk.
+
+        Returns:
+            bool: True if the blob existed
+        """
+        try:
+            self.path_for(digest).unlink()
+            return True
+        except FileNotFoundError:
+            return False
@@ -0,0 +1,213 @@
+"""Process-wide catalog of the upload store that follows changes as they happen.
+
+Every session reads the same immutable snapshot, so its cost does not grow
+with the number of sessions. Changes made through the store update the
+snapshot incrementally; files added, changed or removed in the upload
+directory by other means are picked up by a filesystem watcher (watchdog,
+when installed) or, failing that, by polling.
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional; the catalog falls back to polling
+    Observer = None
+    FileSystemEventHandler = object
+
+logger = logging.getLogger(__name__)
+
+# Seconds between directory scans when no filesystem watcher is available
+POLL_INTERVAL = float(os.environ.get("CATALOG_POLL_INTERVAL", 2.0))
+
+# Quiet period that lets a burst of filesystem events trigger a single resync
+SETTLE_SECONDS = 0.25
+
+CatalogSnapshot = namedtuple("CatalogSnapshot", ["version", "files", "bytes", "by_type"])
+CatalogSnapshot.__doc__ = """Immutable summary of the store at one version.
+
+by_type maps each media type to a (file count, total bytes) tuple.
+"""
+
+
+class _DirectoryEvents(FileSystemEventHandler):
+    """Flags the catalog as dirty for changes to visible upload files."""
+
+    def __init__(self, dirty):
+        self._dirty = dirty
+
+    def on_any_event(self, event):
+        # The index, blobs, caches and partial uploads all live in dotfiles
+        paths = [event.src_path, getattr(event, "dest_path", "")]
+        if any(path and not os.path.basename(path).startswith(".") for path in paths):
+            self._dirty.set()
+
+
+class UploadCatalog:
+    """Shared, versioned view of an UploadStore.
+
+    ``snapshot`` is a single attribute read. ``version`` increases with every
+    change, so sessions can detect changes by remembering the last version
+    they rendered, or block in ``wait_for_change()``.
+    """
+
+    def __init__(self, store, classify, poll_interval=POLL_INTERVAL):
+        """Build the first snapshot and subscribe to store changes.
+
+        Args:
+            store: UploadStore to follow
+            classify: Callable mapping a file suffix to a media type, used for
+                files that appear in the upload directory
+            poll_interval: Seconds between scans when polling
+        """
+        self.store = store
+        self.classify = classify
+        self.poll_interval = poll_interval
+        self.mode = None
+        self._condition = threading.Condition()
+        self._dirty = threading.Event()
+        self._stopped = threading.Event()
+        self._observer = None
+        self._thread = None
+        self._snapshot = self._build(0)
+        store.subscribe(self._on_store_event)
+
+    @property
+    def snapshot(self):
+        """Current CatalogSnapshot."""
+        return self._snapshot
+
+    @property
+    def version(self):
+        """Version of the current snapshot."""
+        return self._snapshot.version
+
+    def start(self):
+        """Start following the upload directory.
+
+        Returns:
+            UploadCatalog: self, for chaining
+        """
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_DirectoryEvents(self._dirty), str(self.store.root), recursive=False)
+                self._observer.daemon = True
+                self._observer.start()
+                self.mode = "watch"
+            except OSError as e:
+                # e.g. the inotify watch limit is exhausted
+                logger.warning("Filesystem watcher unavailable, polling uploads instead: %s", e)
+                self._observer = None
+        if self._observer is None:
+            self.mode = "poll"
+        self._thread = threading.Thread(target=self._run, name="upload-catalog", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop following the upload directory."""
+        self._stopped.set()
+        self._dirty.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread is not None:
+            self._thread.join()
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the catalog is newer than a version.
+
+        Args:
+            version: Last version the caller has seen
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            CatalogSnapshot: The current snapshot, which is unchanged on timeout
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._snapshot.version != version, timeout)
+            return self._snapshot
+
+    def refresh(self):
+        """Reconcile the index with the upload directory and publish any changes.
+
+        Returns:
+            bool: True if the directory had changed
+        """
+        if not self.store.index.sync_directory(self.store.root, self.classify):
+            return False
+        # Rebuilding from the index also corrects any drift in the incremental
+        # totals, e.g. from a store change that raced a previous rebuild
+        with self._condition:
+            self._publish(self._build(self._snapshot.version + 1))
+        return True
+
+    def _build(self, version):
+        """Summarise the whole index into a snapshot."""
+        summary = self.store.index.summary()
+        return CatalogSnapshot(
+            version=version,
+            files=sum(count for count, _ in summary.values()),
+            bytes=sum(size for _, size in summary.values()),
+            by_type=MappingProxyType(summary),
+        )
+
+    def _publish(self, snapshot):
+        """Swap in a new snapshot and wake waiters; caller holds the condition."""
+        self._snapshot = snapshot
+        self._condition.notify_all()
+
+    def _on_store_event(self, event, record):
+        """Apply one store change to the snapshot without querying the index."""
+        with self._condition:
+            current = self._snapshot
+            by_type = dict(current.by_type)
+            files, size = current.files, current.bytes
+            if event in ("added", "deleted"):
+                sign = 1 if event == "added" else -1
+                count, total = by_type.get(record["type"], (0, 0))
+                by_type[record["type"]] = (count + sign, total + sign * record["size"])
+                if not by_type[record["type"]][0]:
+                    del by_type[record["type"]]
+                files += sign
+                size += sign * record["size"]
+            self._publish(CatalogSnapshot(current.version + 1, files, size, MappingProxyType(by_type)))
+
+    def _signature(self):
+        """Cheap fingerprint of the visible files in the upload directory."""
+        entries = []
+        with os.scandir(self.store.root) as it:
+            for entry in it:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        return frozenset(entries)
+
+    def _run(self):
+        """Resync after filesystem events, or whenever a poll sees a difference."""
+        signature = self._signature() if self._observer is None else None
+        while not self._stopped.is_set():
+            if self._observer is not None:
+                self._dirty.wait()
+                if self._stopped.is_set():
+                    break
+                time.sleep(SETTLE_SECONDS)
+                self._dirty.clear()
+            else:
+                if self._stopped.wait(self.poll_interval):
+                    break
+                current = self._signature()
+                if current == signature:
+                    continue
+                signature = current
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Upload catalog refresh failed")
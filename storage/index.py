@@ -0,0 +1,571 @@
+"""Persistent SQLite metadata index for the upload store."""
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from .writer import is_partial
+
+# Index database lives inside the upload directory; dotfiles are never listed
+INDEX_FILENAME = ".index.sqlite3"
+
+SORT_COLUMNS = ("uploaded_at", "name", "size", "mtime", "media_type", "accessed_at")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    media_type TEXT NOT NULL,
+    uploaded_at TEXT NOT NULL,
+    digest TEXT,
+    accessed_at REAL,
+    pinned INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS files_uploaded_at ON files (uploaded_at);
+CREATE INDEX IF NOT EXISTS files_media_type ON files (media_type, uploaded_at);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS media_info (
+    name TEXT PRIMARY KEY,
+    digest TEXT,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    format TEXT,
+    kind TEXT,
+    duration REAL,
+    width INTEGER,
+    height INTEGER,
+    video_codec TEXT,
+    audio_codec TEXT,
+    bitrate INTEGER,
+    sample_rate INTEGER,
+    channels INTEGER,
+    mismatched INTEGER NOT NULL DEFAULT 0,
+    parser TEXT,
+    error TEXT,
+    probed_at REAL NOT NULL
+);
+"""
+
+# Columns added after the first release, applied to existing databases
+_MIGRATIONS = {
+    "files": [
+        ("digest", "TEXT"),
+        ("accessed_at", "REAL"),
+        ("pinned", "INTEGER NOT NULL DEFAULT 0"),
+    ],
+}
+
+_COLUMNS = "name, path, size, mtime, media_type AS type, uploaded_at, digest, accessed_at, pinned"
+
+# Probe results of a file, valid while its content is what was probed; keyed by
+# name because whether the content matches the extension depends on the name
+_INFO_MATCH = (
+    "m.name = files.name AND m.digest IS files.digest "
+    "AND m.size = files.size AND m.mtime = files.mtime"
+)
+
+MEDIA_INFO_FIELDS = (
+    "format", "kind", "duration", "width", "height", "video_codec", "audio_codec",
+    "bitrate", "sample_rate", "channels", "mismatched", "parser", "error",
+)
+
+# Names bound per IN (...) query; stays below SQLite's host parameter limit
+_BATCH_SIZE = 500
+
+
+class UploadIndex:
+    """Metadata index of uploaded files, shared by every session in the process.
+
+    Each thread gets its own SQLite connection; the database runs in WAL mode
+    so page loads reading the index never wait on an upload being recorded.
+    """
+
+    def __init__(self, db_path):
+        """Open (and create if needed) the index database.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        with conn:
+            self._migrate(conn)
+
+    @staticmethod
+    def _migrate(conn):
+        """Add columns missing from databases created by older versions."""
+        for table, columns in _MIGRATIONS.items():
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column, decl in columns:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        # Files indexed before access tracking count as last used when modified
+        conn.execute("UPDATE files SET accessed_at = mtime WHERE accessed_at IS NULL")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_digest ON files (digest)")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_accessed_at ON files (pinned, accessed_at)")
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, name, path, size, mtime, media_type, uploaded_at=None):
+        """Insert or replace the record for a file stored under its own name.
+
+        Used for loose files in the upload directory that are not in the
+        blob store; content-addressed files are recorded with add().
+
+        Args:
+            name: File name as shown to users
+            path: Location of the file on disk
+            size: Size in bytes
+            mtime: Modification time (seconds since the epoch)
+            media_type: "Video", "Audio", "Image", "Document" or "Unknown"
+            uploaded_at: ISO timestamp; defaults to now
+        """
+        uploaded_at = uploaded_at or datetime.now().isoformat()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (name, path, size, mtime, media_type, uploaded_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, str(path), size, mtime, media_type, uploaded_at, mtime),
+            )
+
+    def add(self, name, digest, path, size, mtime, media_type, uploaded_at=None):
+        """Record a name pointing at a blob and take a reference on the blob.
+
+        Args:
+            name: File name as shown to users; must not already be indexed
+            digest: Content digest of the blob
+            path: Location of the blob on disk
+            size: Size in bytes
+            mtime: Modification time (seconds since the epoch)
+            media_type: "Video", "Audio", "Image", "Document" or "Unknown"
+            uploaded_at: ISO timestamp; defaults to now
+        """
+        uploaded_at = uploaded_at or datetime.now().isoformat()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO files (name, path, size, mtime, media_type, uploaded_at, digest, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, str(path), size, mtime, media_type, uploaded_at, digest, mtime),
+            )
+            conn.execute(
+                "INSERT INTO blobs (digest, size, refcount) VALUES (?, ?, 1) "
+                "ON CONFLICT (digest) DO UPDATE SET refcount = refcount + 1",
+                (digest, size),
+            )
+
+    def remove(self, name):
+        """Delete the record for a file and drop its blob reference.
+
+        Returns:
+            dict or None: The removed record, with an extra "orphaned" key that
+            is True when no other name references the same blob any more
+        """
+        conn = self._connection()
+        with conn:
+            row = conn.execute(
+                f"SELECT {_COLUMNS} FROM files WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                return None
+            record = dict(row)
+            conn.execute("DELETE FROM files WHERE name = ?", (name,))
+            record["orphaned"] = False
+            if record["digest"]:
+                conn.execute(
+                    "UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?",
+                    (record["digest"],),
+                )
+                deleted = conn.execute(
+                    "DELETE FROM blobs WHERE digest = ? AND refcount <= 0",
+                    (record["digest"],),
+                )
+                record["orphaned"] = deleted.rowcount > 0
+        return record
+
+    def remove_many(self, names):
+        """Delete the records for several files in a single transaction.
+
+        Args:
+            names: File names; names that are not indexed are skipped
+
+        Returns:
+            list: Removed records, each with an "orphaned" key as in remove().
+            Every record of a blob that lost its last reference is orphaned.
+        """
+        names = list(dict.fromkeys(names))
+        conn = self._connection()
+        records = []
+        with conn:
+            for start in range(0, len(names), _BATCH_SIZE):
+                batch = names[start:start + _BATCH_SIZE]
+                placeholders = ", ".join("?" * len(batch))
+                records.extend(dict(row) for row in conn.execute(
+                    f"SELECT {_COLUMNS} FROM files WHERE name IN ({placeholders})", batch
+                ))
+                conn.execute(f"DELETE FROM files WHERE name IN ({placeholders})", batch)
+
+            released = Counter(r["digest"] for r in records if r["digest"])
+            conn.executemany(
+                "UPDATE blobs SET refcount = refcount - ? WHERE digest = ?",
+                [(count, digest) for digest, count in released.items()],
+            )
+            digests = list(released)
+            orphaned = set()
+            for start in range(0, len(digests), _BATCH_SIZE):
+                batch = digests[start:start + _BATCH_SIZE]
+                placeholders = ", ".join("?" * len(batch))
+                orphaned.update(row[0] for row in conn.execute(
+                    f"SELECT digest FROM blobs WHERE refcount <= 0 AND digest IN ({placeholders})",
+                    batch,
+                ))
+            conn.executemany("DELETE FROM blobs WHERE digest = ?", [(d,) for d in orphaned])
+        for record in records:
+            record["orphaned"] = record["digest"] in orphaned
+        return records
+
+    def rename(self, name, new_name, path=None):
+        """Change the name of a file without touching its content.
+
+        Args:
+            name: Current file name
+            new_name: New file name; must not already be indexed
+            path: New on-disk location, for loose files that were moved
+
+        Returns:
+            bool: True if a record was renamed
+        """
+        conn = self._connection()
+        with conn:
+            if path is None:
+                cursor = conn.execute(
+                    "UPDATE files SET name = ? WHERE name = ?", (new_name, name)
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE files SET name = ?, path = ? WHERE name = ?",
+                    (new_name, str(path), name),
+                )
+        return cursor.rowcount > 0
+
+    def refcount(self, digest):
+        """Return the number of names referencing a blob."""
+        row = self._connection().execute(
+            "SELECT refcount FROM blobs WHERE digest = ?", (digest,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get(self, name):
+        """Look up a single file record.
+
+        Returns:
+            dict or None: Record with name, path, size, mtime, type, uploaded_at,
+            digest (None for loose files), accessed_at and pinned
+        """
+        row = self._connection().execute(
+            f"SELECT {_COLUMNS} FROM files WHERE name = ?", (name,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def query(self, offset=0, limit=None, sort="uploaded_at", descending=True, **filters):
+        """Return a page of file records.
+
+        Args:
+            offset: Number of matching records to skip
+            limit: Maximum number of records to return (None for all)
+            sort: Column to sort by, one of SORT_COLUMNS
+            descending: Sort direction
+            **filters: Filters accepted by filter_clause()
+
+        Returns:
+            list: Record dicts in the requested order
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort column: {sort}")
+        where, params = self.filter_clause(**filters)
+        direction = "DESC" if descending else "ASC"
+        sql = (
+            f"SELECT {_COLUMNS} FROM files{where} "
+            f"ORDER BY {sort} {direction}, name {direction} LIMIT ? OFFSET ?"
+        )
+        params += [-1 if limit is None else limit, offset]
+        return [dict(row) for row in self._connection().execute(sql, params)]
+
+    def count(self, **filters):
+        """Count records matching the same filters as query()."""
+        where, params = self.filter_clause(**filters)
+        return self._connection().execute(
+            f"SELECT COUNT(*) FROM files{where}", params
+        ).fetchone()[0]
+
+    def touch(self, name, when):
+        """Record that a file was accessed.
+
+        Args:
+            name: File name
+            when: Access time (seconds since the epoch)
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("UPDATE files SET accessed_at = ? WHERE name = ?", (when, name))
+
+    def set_pinned(self, name, pinned):
+        """Pin a file so eviction never removes it, or unpin it.
+
+        Returns:
+            bool: False if no file has that name
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("UPDATE files SET pinned = ? WHERE name = ?", (int(pinned), name))
+        return cursor.rowcount > 0
+
+    def stored_bytes(self):
+        """Return the bytes on disk: every blob once, plus loose files."""
+        return self._connection().execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM blobs)"
+            " + (SELECT COALESCE(SUM(size), 0) FROM files WHERE digest IS NULL)"
+        ).fetchone()[0]
+
+    def summary(self):
+        """Return {media type: (file count, total bytes)} over all records."""
+        return {
+            row[0]: (row[1], row[2])
+            for row in self._connection().execute(
+                "SELECT media_type, COUNT(*), SUM(size) FROM files GROUP BY media_type"
+            )
+        }
+
+    def set_media_info(self, entries):
+        """Cache probe results for several files in a single transaction.
+
+        Args:
+            entries: (record, info) pairs, where info is a dict with the keys
+                in MEDIA_INFO_FIELDS (missing keys are stored as NULL)
+        """
+        now = time.time()
+        rows = [
+            (record["name"], record["digest"], record["size"], record["mtime"],
+             *(info.get(field) for field in MEDIA_INFO_FIELDS), now)
+            for record, info in entries
+        ]
+        placeholders = ", ".join("?" * (len(MEDIA_INFO_FIELDS) + 5))
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO media_info (name, digest, size, mtime, {', '.join(MEDIA_INFO_FIELDS)}, "
+                f"probed_at) VALUES ({placeholders})",
+                rows,
+            )
+
+    def media_info(self, names):
+        """Look up the cached probe results of several files.
+
+        Args:
+            names: File names
+
+        Returns:
+            dict: {name: info dict with the keys in MEDIA_INFO_FIELDS} for the
+            names with current results; files not (re)probed yet are left out
+        """
+        names = list(dict.fromkeys(names))
+        columns = ", ".join(f"m.{field}" for field in MEDIA_INFO_FIELDS)
+        found = {}
+        for start in range(0, len(names), _BATCH_SIZE):
+            batch = names[start:start + _BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            for row in self._connection().execute(
+                f"SELECT files.name, {columns} FROM files JOIN media_info m ON {_INFO_MATCH} "
+                f"WHERE files.name IN ({placeholders})",
+                batch,
+            ):
+                info = dict(row)
+                info["mismatched"] = bool(info["mismatched"])
+                found[info.pop("name")] = info
+        return found
+
+    def unprobed(self, limit):
+        """Return up to `limit` records without current probe results, newest first."""
+        return [dict(row) for row in self._connection().execute(
+            f"SELECT {_COLUMNS} FROM files "
+            f"WHERE NOT EXISTS (SELECT 1 FROM media_info m WHERE {_INFO_MATCH}) "
+            "ORDER BY uploaded_at DESC LIMIT ?",
+            (limit,),
+        )]
+
+    def prune_media_info(self):
+        """Drop probe results that no indexed file refers to any more.
+
+        Returns:
+            int: Number of results dropped
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("DELETE FROM media_info WHERE name NOT IN (SELECT name FROM files)")
+        return cursor.rowcount
+
+    def media_info_summary(self):
+        """Summarise the probe results of indexed files.
+
+        Returns:
+            dict: "probed" files, "mismatched" ones whose content does not
+            match their extension, "failed" probes and "duration" in seconds
+            summed over every probed file
+        """
+        row = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(m.mismatched), 0), COALESCE(SUM(m.error IS NOT NULL), 0), "
+            f"COALESCE(SUM(m.duration), 0) FROM files JOIN media_info m ON {_INFO_MATCH}"
+        ).fetchone()
+        return {"probed": row[0], "mismatched": row[1], "failed": row[2], "duration": row[3]}
+
+    @staticmethod
+    def filter_clause(media_type=None, search=None, min_size=None, max_size=None,
+                      uploaded_after=None, uploaded_before=None, pattern=None, pinned=None,
+                      min_duration=None, max_duration=None, min_height=None, codec=None,
+                      mismatched=None):
+        """Build the WHERE clause shared by query() and count().
+
+        Duration, height, codec and mismatch filters use cached probe results,
+        so files that have not been probed yet never match them.
+
+        Args:
+            media_type: Only include this media type
+            search: Case-insensitive substring the file name must contain
+            min_size: Minimum size in bytes
+            max_size: Maximum size in bytes
+            uploaded_after: ISO timestamp; only files uploaded at or after it
+            uploaded_before: ISO timestamp; only files uploaded before it
+            pattern: Shell-style glob the whole file name must match, e.g.
+                "*.tmp" (case-sensitive)
+            pinned: Only pinned (True) or only unpinned (False) files
+            min_duration: Minimum duration in seconds
+            max_duration: Maximum duration in seconds
+            min_height: Minimum picture height in pixels
+            codec: Only files with this video or audio codec, e.g. "h264"
+            mismatched: Only files whose content does (True) or does not
+                (False) match their extension
+
+        Returns:
+            tuple: (SQL fragment starting with " WHERE " or empty, parameter list)
+        """
+        clauses, params = [], []
+        if media_type:
+            clauses.append("media_type = ?")
+            params.append(media_type)
+        if min_size is not None:
+            clauses.append("size >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            clauses.append("size <= ?")
+            params.append(max_size)
+        if uploaded_after:
+            clauses.append("uploaded_at >= ?")
+            params.append(uploaded_after)
+        if uploaded_before:
+            clauses.append("uploaded_at < ?")
+            params.append(uploaded_before)
+        if search:
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        if pattern:
+            clauses.append("name GLOB ?")
+            params.append(pattern)
+        if pinned is not None:
+            clauses.append("pinned = ?")
+            params.append(int(pinned))
+
+        probed = []
+        if min_duration is not None:
+            probed.append("m.duration >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            probed.append("m.duration <= ?")
+            params.append(max_duration)
+        if min_height is not None:
+            probed.append("m.height >= ?")
+            params.append(min_height)
+        if codec:
+            probed.append("(m.video_codec = ? OR m.audio_codec = ?)")
+            params += [codec, codec]
+        if mismatched is not None:
+            probed.append("m.mismatched = ?")
+            params.append(int(mismatched))
+        if probed:
+            clauses.append(
+                f"EXISTS (SELECT 1 FROM media_info m WHERE {_INFO_MATCH} AND {' AND '.join(probed)})"
+            )
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def sync_directory(self, directory, classify):
+        """Reconcile the index with the files actually present in a directory.
+
+        Adds loose files that are not yet indexed (e.g. copied in by hand),
+        refreshes changed ones and drops records whose files are gone. Files
+        in the blob store are left alone. Runs once per process and whenever
+        the upload catalog sees the directory change, never per session.
+
+        Args:
+            directory: Upload directory to scan
+            classify: Callable mapping a file suffix to a media type
+
+        Returns:
+            int: Number of records added, refreshed or dropped
+        """
+        directory = Path(directory)
+        conn = self._connection()
+        known = {
+            row["name"]: (row["size"], row["mtime"])
+            for row in conn.execute("SELECT name, size, mtime FROM files WHERE digest IS NULL")
+        }
+
+        seen = set()
+        updates = []
+        for file_path in directory.iterdir():
+            if file_path.name.startswith(".") or is_partial(file_path) or not file_path.is_file():
+                continue
+            stat = file_path.stat()
+            seen.add(file_path.name)
+            if known.get(file_path.name) == (stat.st_size, stat.st_mtime):
+                continue
+            updates.append((
+                file_path.name, str(file_path), stat.st_size, stat.st_mtime,
+                classify(file_path.suffix),
+                datetime.fromtimestamp(stat.st_mtime).isoformat(), stat.st_mtime,
+            ))
+
+        missing = [(name,) for name in known if name not in seen]
+        with conn:
+            # Never overwrite a content-addressed record that shares the name
+            upserted = conn.executemany(
+                "INSERT INTO files (name, path, size, mtime, media_type, uploaded_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET path = excluded.path, size = excluded.size, "
+                "mtime = excluded.mtime, media_type = excluded.media_type, "
+                "uploaded_at = excluded.uploaded_at WHERE files.digest IS NULL",
+                updates,
+            )
+            dropped = conn.executemany("DELETE FROM files WHERE name = ?", missing)
+        return upserted.rowcount + dropped.rowcount
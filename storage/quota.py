@@ -0,0 +1,301 @@
+"""Storage budget for the upload store, with background eviction.
+
+Uploads reserve their size before anything is written. When the store grows
+past its high watermark, a background thread evicts unpinned files (least
+recently accessed first, or oldest first) until usage is back under the low
+watermark; uploads that do not fit wait briefly for that to free space and
+are rejected otherwise.
+"""
+import errno
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Total bytes the store may hold; 0 means unlimited (override with UPLOAD_QUOTA_BYTES)
+DEFAULT_MAX_BYTES = int(os.environ.get("UPLOAD_QUOTA_BYTES", 0))
+# Largest single upload in bytes; 0 means unlimited (override with UPLOAD_MAX_FILE_BYTES)
+DEFAULT_MAX_FILE_BYTES = int(os.environ.get("UPLOAD_MAX_FILE_BYTES", 0))
+# Which files go first: "lru" (least recently accessed) or "age" (oldest upload)
+DEFAULT_POLICY = os.environ.get("UPLOAD_EVICTION_POLICY", "lru")
+
+# Index column each eviction policy orders candidates by
+EVICTION_POLICIES = {
+    "lru": "accessed_at",
+    "age": "uploaded_at",
+}
+
+# Eviction starts above the high watermark and frees space down to the low one
+HIGH_WATERMARK = 0.95
+LOW_WATERMARK = 0.85
+
+# Longest an upload waits for eviction to make room before it is rejected
+RESERVE_TIMEOUT = 30
+
+# Candidates fetched from the index per query while planning an eviction
+PLAN_BATCH = 500
+
+
+class QuotaExceeded(OSError):
+    """Raised when an upload does not fit the storage budget."""
+
+    def __init__(self, message):
+        super().__init__(errno.ENOSPC, message)
+
+
+class StorageQuota:
+    """Byte budget for an UploadStore.
+
+    Usage counts bytes on disk, so content shared by several names counts
+    once. Uploads in progress hold reservations so concurrent writers cannot
+    overshoot the budget together.
+    """
+
+    def __init__(self, store, max_bytes=DEFAULT_MAX_BYTES, max_file_bytes=DEFAULT_MAX_FILE_BYTES,
+                 policy=DEFAULT_POLICY):
+        """Set up the budget; call start() to run background eviction.
+
+        Args:
+            store: UploadStore to keep within budget
+            max_bytes: Total budget in bytes (0 for unlimited)
+            max_file_bytes: Per-file limit in bytes (0 for unlimited)
+            policy: One of EVICTION_POLICIES
+        """
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.store = store
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.policy = policy
+        self._condition = threading.Condition()
+        self._reserved = 0
+        self._needed = 0  # Largest upload waiting for room
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.eviction_runs = 0
+        self.rejected_uploads = 0
+
+    @property
+    def used_bytes(self):
+        """Bytes currently stored on disk."""
+        return self.store.index.stored_bytes()
+
+    def stats(self):
+        """Return usage and counters as a dict."""
+        with self._condition:
+            reserved = self._reserved
+        return {
+            "max_bytes": self.max_bytes,
+            "max_file_bytes": self.max_file_bytes,
+            "policy": self.policy,
+            "used_bytes": self.used_bytes,
+            "reserved_bytes": reserved,
+            "evicted_files": self.evicted_files,
+            "evicted_bytes": self.evicted_bytes,
+            "eviction_runs": self.eviction_runs,
+            "rejected_uploads": self.rejected_uploads,
+        }
+
+    def start(self):
+        """Start the background evictor (only needed when there is a total budget).
+
+        Returns:
+            StorageQuota: self, for chaining
+        """
+        if self.max_bytes and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="upload-evictor", daemon=True)
+            self._thread.start()
+            # Bring a store that is already over budget back under it
+            self._wake.set()
+        return self
+
+    def stop(self):
+        """Stop the background evictor."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def check_file(self, size):
+        """Reject a file larger than the per-file limit.
+
+        Raises:
+            QuotaExceeded: If the file is too large
+        """
+        if self.max_file_bytes and size > self.max_file_bytes:
+            self.rejected_uploads += 1
+            raise QuotaExceeded(
+                f"File is {size:,} bytes; the limit per file is {self.max_file_bytes:,} bytes"
+            )
+
+    def acquire(self, size, timeout=RESERVE_TIMEOUT):
+        """Reserve space for an upload, waiting for eviction if needed.
+
+        Every successful call must be matched by release(), usually via
+        reserve().
+
+        Args:
+            size: Bytes the upload will add
+            timeout: Seconds to wait for eviction to make room
+
+        Raises:
+            QuotaExceeded: If the file is too large or no room could be made
+        """
+        self.check_file(size)
+        if not self.max_bytes:
+            return
+
+        deadline = time.monotonic() + timeout
+        waited = False
+        with self._condition:
+            while True:
+                free = self.max_bytes - self.used_bytes - self._reserved
+                if size <= free:
+                    break
+                remaining = deadline - time.monotonic()
+                if size > self.max_bytes or remaining <= 0 or self._thread is None:
+                    if waited:
+                        # Other waiting uploads re-register what they still need
+                        self._needed = 0
+                    self.rejected_uploads += 1
+                    raise QuotaExceeded(
+                        f"Storage is full: {size:,} bytes needed, {max(free, 0):,} of "
+                        f"{self.max_bytes:,} bytes free"
+                    )
+                self._needed = max(self._needed, size)
+                waited = True
+                self._wake.set()
+                self._condition.wait(min(remaining, 1.0))
+            if waited:
+                self._needed = 0
+            self._reserved += size
+
+    def release(self, size):
+        """Return space taken by acquire() once the upload is stored or abandoned."""
+        if not self.max_bytes:
+            return
+        with self._condition:
+            self._reserved -= size
+            self._condition.notify_all()
+        if self.used_bytes > self.max_bytes * HIGH_WATERMARK:
+            self._wake.set()
+
+    @contextmanager
+    def reserve(self, size, timeout=RESERVE_TIMEOUT):
+        """Hold space for an upload while it is written (acquire + release).
+
+        Raises:
+            QuotaExceeded: If the file is too large or no room could be made
+        """
+        self.acquire(size, timeout)
+        try:
+            yield
+        finally:
+            self.release(size)
+
+    def plan(self, bytes_to_free):
+        """Choose the files to evict to free a number of bytes.
+
+        Pinned files are never chosen. Content shared by several names only
+        counts as freed once all of its names are chosen.
+
+        Returns:
+            tuple: (records to evict in order, bytes they free)
+        """
+        index = self.store.index
+        chosen, freed = [], 0
+        released = Counter()
+        offset = 0
+        while freed < bytes_to_free:
+            batch = index.query(
+                offset=offset, limit=PLAN_BATCH, sort=EVICTION_POLICIES[self.policy],
+                descending=False, pinned=False,
+            )
+            if not batch:
+                break
+            offset += len(batch)
+            for record in batch:
+                chosen.append(record)
+                if record["digest"] is None:
+                    freed += record["size"]
+                else:
+                    released[record["digest"]] += 1
+                    if released[record["digest"]] >= index.refcount(record["digest"]):
+                        freed += record["size"]
+                if freed >= bytes_to_free:
+                    break
+        return chosen, freed
+
+    def evict(self, target_bytes=None, dry_run=False):
+        """Evict files until usage is at or below a target.
+
+        Args:
+            target_bytes: Usage to shrink to; defaults to the low watermark,
+                lowered further for uploads waiting for room
+            dry_run: Only report what would be evicted
+
+        Returns:
+            dict: "files" (names chosen), "freed_bytes" (bytes freed, or
+            expected to be freed in a dry run) and "dry_run"
+        """
+        with self._condition:
+            needed = 0
+            if target_bytes is None:
+                target_bytes = int(self.max_bytes * LOW_WATERMARK)
+                needed = self._needed
+                room = self.max_bytes - self._reserved - needed
+                if room < target_bytes:
+                    target_bytes = max(room, 0)
+                else:
+                    needed = 0
+        used = self.used_bytes
+        records, expected = self.plan(used - target_bytes) if used > target_bytes else ([], 0)
+        if needed and used - expected > target_bytes:
+            # Evicting cannot make room for the waiting upload, which will be
+            # rejected; only bring usage back under the low watermark
+            needed = 0
+            target_bytes = int(self.max_bytes * LOW_WATERMARK)
+            records, expected = self.plan(used - target_bytes) if used > target_bytes else ([], 0)
+        names = [record["name"] for record in records]
+        if dry_run or not names:
+            return {"files": names, "freed_bytes": expected, "dry_run": dry_run}
+
+        with self._condition:
+            # Hold off new reservations until the files are gone from disk,
+            # not just from the index; listeners run after, as they may take
+            # locks of their own
+            outcome = self.store.delete_many(names, notify=False)
+            freed = used - self.used_bytes
+            self.evicted_files += len(outcome["deleted"])
+            self.evicted_bytes += max(freed, 0)
+            self.eviction_runs += 1
+            # Waiting uploads re-register what they still need
+            self._needed = max(self._needed - needed, 0)
+            self._condition.notify_all()
+        self.store.notify_deleted(outcome["deleted"])
+        logger.info("Evicted %d upload(s), freeing %d bytes", len(outcome["deleted"]), freed)
+        return {"files": names, "freed_bytes": freed, "dry_run": False}
+
+    def _run(self):
+        """Evict whenever woken and the store is above its high watermark."""
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                with self._condition:
+                    pressure = self._needed > 0
+                if pressure or self.used_bytes > self.max_bytes * HIGH_WATERMARK:
+                    self.evict()
+            except Exception:
+                logger.exception("Upload eviction failed")
+            with self._condition:
+                self._condition.notify_all()
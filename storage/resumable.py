@@ -0,0 +1,518 @@
+"""Resumable, chunked uploads served by the media server.
+
+A small tus-like protocol for files too large to send in one request:
+
+    POST   /uploads/         {"name": ..., "size": ...} creates an upload
+    PATCH  /uploads/<id>     writes the body at the byte offset in Upload-Offset
+    HEAD   /uploads/<id>     reports progress in Upload-Offset / Upload-Ranges
+    GET    /uploads/<id>     the same progress as JSON
+    DELETE /uploads/<id>     abandons the upload (409 once it is complete and being stored)
+
+Unlike tus, a PATCH may target any offset, so a client can send several
+chunks in parallel and, after a dropped connection, only resend the ones the
+server does not have. Chunks are written in place into one temp file inside
+the upload directory; once every byte has arrived the file is moved into the
+UploadStore like any other upload. Progress is kept in a small sidecar, so
+uploads can also resume after a server restart.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http import HTTPStatus
+from pathlib import Path
+
+from .quota import QuotaExceeded
+
+logger = logging.getLogger(__name__)
+
+# Media server route prefix for resumable uploads
+RESUMABLE_PREFIX = "/uploads/"
+
+# Hidden directory inside the upload directory holding uploads in progress
+RESUMABLE_DIRNAME = ".resumable"
+
+# Chunk size suggested to clients (override with RESUMABLE_CHUNK_SIZE)
+CHUNK_SIZE = int(os.environ.get("RESUMABLE_CHUNK_SIZE", 8 * 1024 * 1024))
+# Largest body accepted by one PATCH
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Uploads untouched for this many seconds are discarded (override with RESUMABLE_EXPIRY)
+EXPIRY_SECONDS = int(os.environ.get("RESUMABLE_EXPIRY", 24 * 3600))
+
+# Lifetime of the upload tokens handed to browser sessions
+TOKEN_TTL = 12 * 3600
+
+# Size of the reusable buffer a PATCH body is copied through
+_COPY_BUFFER = 1024 * 1024
+
+_TOKEN_HEADER = "Upload-Token"
+
+
+def _merge(ranges, start, end):
+    """Add the half-open range [start, end) to a sorted list of disjoint ranges."""
+    merged = []
+    for low, high in ranges:
+        if high < start or low > end:
+            merged.append([low, high])
+        else:
+            start, end = min(low, start), max(high, end)
+    merged.append([start, end])
+    merged.sort()
+    return merged
+
+
+def _format_ranges(ranges):
+    """Format ranges as ``start-end`` pairs (end exclusive), comma separated."""
+    return ",".join(f"{low}-{high}" for low, high in ranges)
+
+
+class _Upload:
+    """One upload in progress and the lock serialising its bookkeeping."""
+
+    def __init__(self, state):
+        self.state = state
+        self.lock = threading.Lock()
+        self.finalizing = False
+        self.writers = 0  # Chunks being written; the upload is only finalized once none are
+
+    @property
+    def received(self):
+        return sum(high - low for low, high in self.state["ranges"])
+
+    @property
+    def offset(self):
+        """End of the contiguous data from the start of the file."""
+        ranges = self.state["ranges"]
+        return ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+
+    def status(self):
+        return {
+            "id": self.state["id"],
+            "name": self.state["name"],
+            "size": self.state["size"],
+            "offset": self.offset,
+            "received": self.received,
+            "ranges": self.state["ranges"],
+            "complete": False,
+        }
+
+
+class ResumableUploads:
+    """Uploads written chunk by chunk and stored in an UploadStore when complete.
+
+    Browser sessions authenticate with tokens from ``issue_token()``; each
+    token names an owner (the session). As in tus, the random upload id is
+    what grants access to an upload, so a new session that knows the id can
+    resume it and becomes its owner. Finished uploads are collected per owner
+    so the session can pick them up with ``completed()``.
+    """
+
+    def __init__(self, store, classify, suffixes=None, secret=None, expiry=EXPIRY_SECONDS,
+                 chunk_size=CHUNK_SIZE):
+        """Open the in-progress directory and resume uploads left in it.
+
+        Args:
+            store: UploadStore finished uploads are saved to
+            classify: Callable mapping a file suffix to a media type
+            suffixes: Lowercase file suffixes (with the dot) accepted, or None
+                to accept any file
+            secret: Key signing upload tokens; random per process by default
+            expiry: Seconds after which idle uploads are discarded
+            chunk_size: Chunk size suggested to clients in bytes
+        """
+        self.store = store
+        self.classify = classify
+        self.suffixes = set(suffixes) if suffixes is not None else None
+        self.expiry = expiry
+        self.chunk_size = chunk_size
+        self.root = store.root / RESUMABLE_DIRNAME
+        self.root.mkdir(exist_ok=True)
+        self._secret = secret or secrets.token_bytes(32)
+        self._lock = threading.Lock()
+        self._uploads = {}
+        self._completed = defaultdict(list)
+        self._load()
+
+    # -- tokens ---------------------------------------------------------------
+
+    def issue_token(self, owner, ttl=TOKEN_TTL):
+        """Return a signed token allowing uploads on behalf of an owner.
+
+        Args:
+            owner: Opaque owner id, e.g. a random per-session string
+            ttl: Seconds the token stays valid
+        """
+        expires = int(time.time() + ttl)
+        return f"{owner}.{expires}.{self._sign(owner, expires)}"
+
+    def verify_token(self, token):
+        """Return the owner named by a valid token, or None."""
+        owner, _, rest = (token or "").rpartition(".")
+        owner, _, expires = owner.rpartition(".")
+        if not owner or not expires.isdigit() or int(expires) < time.time():
+            return None
+        if not hmac.compare_digest(rest, self._sign(owner, int(expires))):
+            return None
+        return owner
+
+    def _sign(self, owner, expires):
+        message = f"{owner}.{expires}".encode("utf-8")
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    # -- uploads --------------------------------------------------------------
+
+    def create(self, owner, name, size):
+        """Start an upload, reserving its size with the store's quota.
+
+        Returns:
+            dict: Status of the new upload (see status())
+
+        Raises:
+            ValueError: If the name or size is invalid
+            QuotaExceeded: If the upload does not fit the storage budget
+        """
+        if not name or Path(name).name != name or name.startswith("."):
+            raise ValueError(f"Invalid file name: {name!r}")
+        if self.suffixes is not None and Path(name).suffix.lower() not in self.suffixes:
+            raise ValueError(f"Unsupported file type: {name!r}")
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise ValueError(f"Invalid size: {size!r}")
+        if self.store.quota is not None:
+            self.store.quota.acquire(size)
+
+        upload_id = uuid.uuid4().hex
+        state = {
+            "id": upload_id,
+            "owner": owner,
+            "name": name,
+            "size": size,
+            "ranges": [],
+            "created": time.time(),
+            "updated": time.time(),
+        }
+        upload = _Upload(state)
+        try:
+            with open(self._data_path(upload_id), "wb") as f:
+                f.truncate(size)
+            self._save_state(state)
+        except OSError:
+            self._discard(state)
+            raise
+        with self._lock:
+            self._uploads[upload_id] = upload
+        if size == 0:
+            return self._finalize(upload)
+        return upload.status()
+
+    def get(self, upload_id):
+        """Return the in-progress upload with an id, or None."""
+        with self._lock:
+            return self._uploads.get(upload_id)
+
+    def write(self, upload, offset, source, length):
+        """Write one chunk at an offset.
+
+        The chunk only counts as received once all of it is on disk, so a
+        chunk cut off by a dropped connection is simply sent again.
+
+        Args:
+            upload: Upload from get()
+            offset: Byte offset of the chunk
+            source: Readable binary stream positioned at the chunk
+            length: Chunk length in bytes
+
+        Returns:
+            dict: Status after the write; "complete" is True and "name" is the
+            stored name once the upload has been saved to the store
+
+        Raises:
+            ValueError: If the chunk falls outside the file, or the upload is
+                already being stored or was abandoned
+            EOFError: If the stream ended before the whole chunk was read
+        """
+        state = upload.state
+        if offset < 0 or length <= 0 or offset + length > state["size"]:
+            raise ValueError(f"Chunk {offset}+{length} is outside the {state['size']}-byte upload")
+
+        with upload.lock:
+            # Once hashed for the store, the file must not change; once discarded, it is gone
+            self._check_writable(upload)
+            upload.writers += 1
+        try:
+            self._write_chunk(upload, offset, source, length)
+        except FileNotFoundError:
+            raise ValueError("Upload was abandoned") from None
+        finally:
+            with upload.lock:
+                upload.writers -= 1
+
+        with upload.lock:
+            self._check_writable(upload)
+            state["ranges"] = _merge(state["ranges"], offset, offset + length)
+            state["updated"] = time.time()
+            done = upload.received == state["size"] and not upload.writers
+            if done:
+                upload.finalizing = True
+            else:
+                self._save_state(state)
+        if done:
+            return self._finalize(upload)
+        return upload.status()
+
+    def _check_writable(self, upload):
+        """Raise ValueError unless chunks may still be written; caller holds upload.lock."""
+        if upload.finalizing:
+            raise ValueError("Upload is complete and being stored")
+        with self._lock:
+            if self._uploads.get(upload.state["id"]) is not upload:
+                raise ValueError("Upload was abandoned")
+
+    def _write_chunk(self, upload, offset, source, length):
+        """Copy one chunk from the stream into the data file at its offset."""
+        buffer = bytearray(min(length, _COPY_BUFFER))
+        view = memoryview(buffer)
+        fd = os.open(self._data_path(upload.state["id"]), os.O_WRONLY)
+        try:
+            position, remaining = offset, length
+            while remaining:
+                n = source.readinto(view[:min(remaining, len(buffer))])
+                if not n:
+                    raise EOFError(f"Chunk ended after {length - remaining} of {length} bytes")
+                written = 0
+                while written < n:
+                    written += os.pwrite(fd, view[written:n], position + written)
+                position += n
+                remaining -= n
+        finally:
+            os.close(fd)
+
+    def abort(self, upload):
+        """Discard an upload and release its reservation.
+
+        Returns:
+            bool: False if the upload is complete and being moved into the
+            store, which can no longer be stopped
+        """
+        with upload.lock:
+            if upload.finalizing:
+                return False
+            with self._lock:
+                if self._uploads.pop(upload.state["id"], None) is None:
+                    return True
+        self._discard(upload.state)
+        return True
+
+    def completed(self, owner):
+        """Names of the uploads an owner has finished, oldest first."""
+        with self._lock:
+            return list(self._completed.get(owner, ()))
+
+    def expire(self):
+        """Discard uploads idle for longer than the expiry.
+
+        Returns:
+            int: Number of uploads discarded
+        """
+        cutoff = time.time() - self.expiry
+        with self._lock:
+            stale = [u for u in self._uploads.values()
+                     if u.state["updated"] < cutoff and not u.finalizing and not u.writers]
+            for upload in stale:
+                del self._uploads[upload.state["id"]]
+        for upload in stale:
+            self._discard(upload.state)
+        return len(stale)
+
+    def _finalize(self, upload):
+        """Move a complete upload into the store."""
+        state = upload.state
+        data_path = self._data_path(state["id"])
+        try:
+            with open(data_path, "rb+") as f:
+                os.fsync(f.fileno())
+            media_type = self.classify(Path(state["name"]).suffix.lower())
+            name = self.store.save_file(data_path, state["name"], media_type)
+        finally:
+            # Whoever unregisters the upload discards it, so its reservation is released once
+            with self._lock:
+                registered = self._uploads.pop(state["id"], None) is not None
+            if registered:
+                self._discard(state)
+        with self._lock:
+            self._completed[state["owner"]].append(name)
+        logger.info("Resumable upload %s stored as %s", state["id"], name)
+        status = upload.status()
+        status.update(complete=True, name=name, offset=state["size"])
+        return status
+
+    def _discard(self, state):
+        """Remove an upload's files and release its quota reservation."""
+        self._data_path(state["id"]).unlink(missing_ok=True)
+        self._state_path(state["id"]).unlink(missing_ok=True)
+        if self.store.quota is not None:
+            self.store.quota.release(state["size"])
+
+    def _data_path(self, upload_id):
+        return self.root / f"{upload_id}.part"
+
+    def _state_path(self, upload_id):
+        return self.root / f"{upload_id}.json"
+
+    def _save_state(self, state):
+        """Persist an upload's progress atomically."""
+        path = self._state_path(state["id"])
+        staging = path.with_suffix(".json.tmp")
+        staging.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(staging, path)
+
+    def _load(self):
+        """Pick up uploads in progress from before a restart."""
+        cutoff = time.time() - self.expiry
+        for path in self.root.glob("*.json"):
+            try:
+                state = json.loads(path.read_text(encoding="utf-8"))
+                data_path = self._data_path(state["id"])
+                if state["updated"] < cutoff or not data_path.is_file():
+                    raise ValueError("expired")
+                if self.store.quota is not None:
+                    self.store.quota.acquire(state["size"], timeout=0)
+            except (OSError, ValueError, KeyError) as e:
+                # Expired, damaged, or no longer fits the budget
+                logger.info("Discarding resumable upload %s: %s", path.stem, e)
+                path.unlink(missing_ok=True)
+                self._data_path(path.stem).unlink(missing_ok=True)
+                continue
+            self._uploads[state["id"]] = _Upload(state)
+        # Data files whose sidecar was lost cannot be resumed
+        for path in self.root.glob("*.part"):
+            if path.stem not in self._uploads:
+                path.unlink(missing_ok=True)
+
+    # -- HTTP -----------------------------------------------------------------
+
+    def route(self):
+        """Build the media server route for the upload protocol.
+
+        Every request needs a token from issue_token(), sent as a Bearer
+        token or in the Upload-Token header.
+
+        Returns:
+            callable: Route for MediaServer(routes={RESUMABLE_PREFIX: ...})
+        """
+        def route(request, subpath):
+            authorization = request.headers.get("Authorization", "")
+            token = authorization[7:].strip() if authorization[:7].lower() == "bearer " else \
+                request.headers.get(_TOKEN_HEADER, "")
+            owner = self.verify_token(token)
+            if owner is None:
+                request.send_json(HTTPStatus.UNAUTHORIZED, _error("Invalid or expired upload token"))
+                return
+            self.expire()
+
+            if not subpath:
+                if request.command != "POST":
+                    request.send_empty(HTTPStatus.METHOD_NOT_ALLOWED, {"Allow": "POST"})
+                    return
+                self._handle_create(request, owner)
+                return
+
+            upload = self.get(subpath)
+            if upload is None:
+                request.send_json(HTTPStatus.NOT_FOUND, _error("Unknown upload"))
+                return
+            with upload.lock:
+                # Report completion to the session that resumed the upload
+                upload.state["owner"] = owner
+            handlers = {
+                "HEAD": self._handle_status,
+                "GET": self._handle_status,
+                "PATCH": self._handle_patch,
+                "DELETE": self._handle_delete,
+            }
+            handler = handlers.get(request.command)
+            if handler is None:
+                request.send_empty(HTTPStatus.METHOD_NOT_ALLOWED, {"Allow": ", ".join(handlers)})
+                return
+            handler(request, upload)
+        return route
+
+    def _handle_create(self, request, owner):
+        body = request.read_json()
+        if not isinstance(body, dict):
+            request.send_json(HTTPStatus.BAD_REQUEST, _error("Expected a JSON object body"))
+            return
+        try:
+            status = self.create(owner, body.get("name"), body.get("size"))
+        except ValueError as e:
+            request.send_json(HTTPStatus.BAD_REQUEST, _error(str(e)))
+            return
+        except QuotaExceeded as e:
+            request.send_json(HTTPStatus.INSUFFICIENT_STORAGE, _error(e.strerror))
+            return
+        status["chunk_size"] = self.chunk_size
+        status["max_chunk_size"] = MAX_CHUNK_SIZE
+        _send_status(request, HTTPStatus.CREATED, status, {"Location": RESUMABLE_PREFIX + status["id"]})
+
+    def _handle_status(self, request, upload):
+        with upload.lock:
+            status = upload.status()
+        _send_status(request, HTTPStatus.OK, status)
+
+    def _handle_patch(self, request, upload):
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+        except ValueError:
+            offset = None
+        body = request.take_body()
+        if offset is None or body is None:
+            request.close_connection = True
+            request.send_json(HTTPStatus.BAD_REQUEST, _error("Upload-Offset and Content-Length are required"))
+            return
+        source, length = body
+        if length > MAX_CHUNK_SIZE:
+            request.close_connection = True
+            request.send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                              _error(f"Chunks are limited to {MAX_CHUNK_SIZE} bytes"))
+            return
+        try:
+            status = self.write(upload, offset, source, length)
+        except ValueError as e:
+            request.close_connection = True
+            request.send_json(HTTPStatus.CONFLICT, _error(str(e)))
+            return
+        except (EOFError, ConnectionError, TimeoutError):
+            # The client went away mid-chunk; it resends the whole chunk
+            request.close_connection = True
+            return
+        except OSError as e:
+            logger.exception("Resumable upload %s failed", upload.state["id"])
+            request.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, _error(f"Failed to store upload: {e}"))
+            return
+        _send_status(request, HTTPStatus.OK, status)
+
+    def _handle_delete(self, request, upload):
+        if not self.abort(upload):
+            request.send_json(HTTPStatus.CONFLICT, _error("Upload is complete and being stored"))
+            return
+        request.send_empty(HTTPStatus.NO_CONTENT)
+
+
+def _error(message):
+    return {"status": "error", "message": message}
+
+
+def _send_status(request, status_code, status, headers=None):
+    """Send upload progress as JSON plus the tus-style progress headers."""
+    request.send_json(status_code, status, {
+        "Upload-Offset": str(status["offset"]),
+        "Upload-Length": str(status["size"]),
+        "Upload-Ranges": _format_ranges(status["ranges"]),
+        **(headers or {}),
+    })
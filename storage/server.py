@@ -0,0 +1,416 @@
+"""HTTP server that streams stored uploads with range request support.
+
+Runs next to the Streamlit server so browsers fetch media directly from disk
+instead of through Streamlit's in-memory media file manager.
+"""
+import email.utils
+import ipaddress
+import json
+import mimetypes
+import os
+import re
+import threading
+import urllib.parse
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Address the media server binds to (override with MEDIA_SERVER_HOST / MEDIA_SERVER_PORT).
+# Stored uploads are served without authentication, so only this machine can reach them
+# unless the server is exposed on purpose (e.g. MEDIA_SERVER_HOST=0.0.0.0).
+DEFAULT_HOST = os.environ.get("MEDIA_SERVER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.environ.get("MEDIA_SERVER_PORT", 8502))
+
+MEDIA_PREFIX = "/media/"
+
+# Cache policy for stored content; revalidation is cheap thanks to ETags
+CACHE_CONTROL = "public, max-age=3600"
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    """Parse a single-range ``Range`` header.
+
+    Args:
+        header: Value of the Range header
+        size: Size of the resource in bytes
+
+    Returns:
+        tuple or None: (start, end) inclusive byte positions, None if the header
+        should be ignored (malformed or multi-range), or ``()`` if the range
+        cannot be satisfied
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        # No byte of an empty file can be addressed
+        return ()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return ()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return ()
+    return start, min(end, size - 1)
+
+
+def make_etag(record):
+    """Build a strong ETag for a stored file record."""
+    if record.get("digest"):
+        return f'"{record["digest"]}"'
+    return f'"{record["size"]:x}-{int(record["mtime"] * 1e6):x}"'
+
+
+def content_disposition(name):
+    """Build an attachment Content-Disposition header for a file name."""
+    fallback = name.encode("ascii", "replace").decode("ascii").replace('"', "'").replace("\\", "_")
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{urllib.parse.quote(name)}"
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    """Serves ``/media/<name>`` from the upload store, plus any extra routes.
+
+    Supports HEAD, single byte ranges (206), If-Range, ETag/Last-Modified
+    validators with 304 responses, and zero-copy bodies via ``sendfile``.
+    Adding ``?download=1`` serves the file as an attachment; downloads can be
+    resumed with Range like any other request.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "LocalMediaPlayer"
+    # Headers and small bodies are separate writes; without this, delayed ACKs
+    # stall every keep-alive response by ~40 ms
+    disable_nagle_algorithm = True
+
+    # Set on the subclass created by MediaServer
+    store = None
+    routes = {}
+
+    def log_message(self, format, *args):
+        """Keep request logging out of the Streamlit console."""
+        pass
+
+    def do_OPTIONS(self):
+        """Answer CORS preflight requests from players on the Streamlit origin."""
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self._send_cors_headers()
+        self.send_header("Access-Control-Allow-Methods", "GET, HEAD, POST, PATCH, DELETE, OPTIONS")
+        self.send_header(
+            "Access-Control-Allow-Headers",
+            "Range, If-None-Match, If-Modified-Since, If-Range, Authorization, Content-Type, Upload-Offset",
+        )
+        self.send_header("Access-Control-Max-Age", "86400")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._dispatch()
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_PATCH(self):
+        self._dispatch()
+
+    def do_DELETE(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        """Route a request by path prefix."""
+        path = urllib.parse.urlsplit(self.path).path
+        if path.startswith(MEDIA_PREFIX):
+            if self.command not in ("GET", "HEAD"):
+                self.send_error_text(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed")
+                return
+            self._serve_media(urllib.parse.unquote(path[len(MEDIA_PREFIX):]))
+            return
+        self._body_read = False
+        for prefix, route in self.routes.items():
+            if path.startswith(prefix):
+                route(self, urllib.parse.unquote(path[len(prefix):]))
+                break
+        else:
+            self.send_error_text(HTTPStatus.NOT_FOUND, "Not found")
+        if not self._body_read:
+            self._discard_body()
+
+    def _discard_body(self, max_bytes=1024 * 1024):
+        """Drain an unread request body so the connection can be reused."""
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if 0 <= length <= max_bytes:
+            self.rfile.read(length)
+        else:
+            self.close_connection = True
+
+    @property
+    def query(self):
+        """Parsed query string of the request."""
+        return urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+
+    def _send_cors_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header(
+            "Access-Control-Expose-Headers",
+            "Content-Range, Content-Length, Accept-Ranges, ETag, Location, "
+            "Upload-Offset, Upload-Length, Upload-Ranges",
+        )
+
+    def read_json(self, max_bytes=1024 * 1024):
+        """Read and decode a JSON request body.
+
+        Returns:
+            object: Decoded body, or None if it is missing, too large or invalid
+        """
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            return None
+        if not 0 < length <= max_bytes:
+            return None
+        self._body_read = True
+        try:
+            return json.loads(self.rfile.read(length))
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+    def take_body(self):
+        """Hand the raw request body to a route that streams it itself.
+
+        Returns:
+            tuple or None: (stream, length in bytes), or None without a valid
+            Content-Length
+        """
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            return None
+        if length < 0:
+            return None
+        self._body_read = True
+        return self.rfile, length
+
+    def send_empty(self, status, headers=None):
+        """Send a response without a body.
+
+        Args:
+            status: HTTP status
+            headers: Extra headers as a dict
+        """
+        self.send_response(status)
+        self._send_cors_headers()
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def send_json(self, status, payload, headers=None):
+        """Send a JSON response.
+
+        Args:
+            status: HTTP status
+            payload: JSON-serialisable body
+            headers: Extra headers as a dict
+        """
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self._send_cors_headers()
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_error_text(self, status, message=""):
+        """Send a short plain-text error response."""
+        body = message.encode("utf-8")
+        self.send_response(status)
+        self._send_cors_headers()
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _serve_media(self, name):
+        """Serve a stored upload by name."""
+        record = self.store.index.get(name) if name else None
+        if record is None:
+            self.send_error_text(HTTPStatus.NOT_FOUND, "Not found")
+            return
+        if self.command == "GET":
+            self.store.touch(record["name"])
+        content_type = mimetypes.guess_type(record["name"])[0] or "application/octet-stream"
+        query = self.query
+        download = query.get("download", ["0"])[0] not in ("", "0", "false")
+        self.send_file(
+            record["path"],
+            etag=make_etag(record),
+            mtime=record["mtime"],
+            content_type=content_type,
+            download_name=record["name"] if download else None,
+        )
+
+    def _not_modified(self, etag, mtime):
+        """Evaluate If-None-Match / If-Modified-Since against the validators."""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            # Weak comparison: ignore the W/ prefix
+            tags = [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+            return "*" in tags or etag in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since
+        return False
+
+    def _range_applies(self, etag, last_modified):
+        """Honour If-Range: only use the Range header if the validator matches."""
+        if_range = self.headers.get("If-Range")
+        if not if_range:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"'):
+            return if_range == etag
+        return if_range == last_modified
+
+    def send_file(self, path, etag, mtime, content_type, cache_control=CACHE_CONTROL,
+                  download_name=None):
+        """Send a file with conditional GET and byte range support.
+
+        Args:
+            path: File to send
+            etag: Quoted strong ETag of the file
+            mtime: Modification time used for Last-Modified
+            content_type: MIME type of the body
+            cache_control: Cache-Control header value
+            download_name: Serve as an attachment with this file name
+        """
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            self.send_error_text(HTTPStatus.NOT_FOUND, "Not found")
+            return
+
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            last_modified = email.utils.formatdate(mtime, usegmt=True)
+
+            if self._not_modified(etag, mtime):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self._send_cors_headers()
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.send_header("Cache-Control", cache_control)
+                self.end_headers()
+                return
+
+            start, end = 0, size - 1
+            status = HTTPStatus.OK
+            range_header = self.headers.get("Range")
+            if range_header and self._range_applies(etag, last_modified):
+                byte_range = parse_range(range_header, size)
+                if byte_range == ():
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self._send_cors_headers()
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if byte_range is not None:
+                    start, end = byte_range
+                    status = HTTPStatus.PARTIAL_CONTENT
+            length = max(end - start + 1, 0)
+
+            self.send_response(status)
+            self._send_cors_headers()
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(length))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.send_header("Cache-Control", cache_control)
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            if download_name:
+                self.send_header("Content-Disposition", content_disposition(download_name))
+            self.end_headers()
+
+            if self.command == "HEAD" or not length:
+                return
+            try:
+                # Zero-copy from the page cache to the socket where supported
+                self.connection.sendfile(f, offset=start, count=length)
+            except (BrokenPipeError, ConnectionResetError):
+                # Players routinely abort requests when seeking
+                self.close_connection = True
+
+
+class MediaServer:
+    """Threaded HTTP server for stored uploads, run on a daemon thread."""
+
+    def __init__(self, store, host=DEFAULT_HOST, port=DEFAULT_PORT, routes=None):
+        """Bind the server.
+
+        Args:
+            store: UploadStore to serve files from
+            host: Interface to bind
+            port: TCP port to bind (0 picks a free port)
+            routes: Extra routes, mapping a path prefix to a callable
+                ``route(request, subpath)``; the route checks request.command
+        """
+        handler = type(
+            "BoundMediaRequestHandler",
+            (MediaRequestHandler,),
+            {"store": store, "routes": dict(routes or {})},
+        )
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        # Only reachable from this machine, so URLs must not point other browsers at it
+        self.loopback = ipaddress.ip_address(self.httpd.server_address[0]).is_loopback
+        self._thread = None
+
+    def start(self):
+        """Start serving in the background."""
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, name="media-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def media_path(name, download=False):
+    """Return the URL path serving a stored file.
+
+    Args:
+        name: Stored file name
+        download: Serve as an attachment instead of inline
+    """
+    path = MEDIA_PREFIX + urllib.parse.quote(name)
+    return path + "?download=1" if download else path
@@ -0,0 +1,307 @@
+"""Deduplicating upload store combining the blob store and the metadata index."""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+from .blobs import BLOB_DIRNAME, BlobStore, hash_stream
+from .index import INDEX_FILENAME, UploadIndex
+from .quota import QuotaExceeded
+from .writer import DEFAULT_CHUNK_SIZE, remove_stale_partials
+
+logger = logging.getLogger(__name__)
+
+# Concurrent unlinks used by delete_many (override with DELETE_WORKERS)
+DELETE_WORKERS = int(os.environ.get("DELETE_WORKERS", 8))
+
+# Seconds within which repeated accesses to a file are recorded once
+ACCESS_RESOLUTION = 60
+
+
+def _unlink(path):
+    """Remove a file, returning an error message instead of raising."""
+    try:
+        path.unlink(missing_ok=True)
+    except OSError as e:
+        return str(e)
+    return None
+
+
+class UploadStore:
+    """Named uploads backed by content-addressed blobs.
+
+    Every name maps to a blob digest; blobs are reference counted so the same
+    content uploaded twice (or under several names) is stored once, and a
+    delete only removes the blob when its last name goes away.
+    """
+
+    def __init__(self, root):
+        """Open the store rooted at an upload directory.
+
+        Args:
+            root: Upload directory; the index and blobs are kept in hidden
+                entries inside it
+        """
+        self.root = Path(root)
+        self.root.mkdir(exist_ok=True)
+        self.index = UploadIndex(self.root / INDEX_FILENAME)
+        self.blobs = BlobStore(self.root / BLOB_DIRNAME)
+        # Serialises reference changes with blob creation and removal
+        self._lock = threading.Lock()
+        self._listeners = []
+        # Optional StorageQuota checked before anything is written
+        self.quota = None
+        self._last_access = {}
+
+    def subscribe(self, callback):
+        """Register a callback for store changes.
+
+        Args:
+            callback: Called as ``callback(event, record)`` after a change, where
+                event is "added", "deleted" or "renamed" and record is the
+                index record (for "renamed", the record under its new name)
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, event, record):
+        """Call every listener; one failing listener does not affect the rest."""
+        for callback in self._listeners:
+            try:
+                callback(event, record)
+            except Exception:
+                logger.exception("Upload store listener failed for %s event", event)
+
+    def cleanup(self):
+        """Remove temp files left behind by interrupted writes."""
+        return remove_stale_partials(self.root) + remove_stale_partials(self.blobs.root)
+
+    def save(self, source, name, media_type, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Store an upload under a name, skipping the write if the content exists.
+
+        Seekable sources are hashed first so content already in the store is
+        never written again. Otherwise the hash is computed while streaming to
+        a staging file.
+
+        Args:
+            source: Readable binary file-like object, read from its current position
+            name: Requested file name
+            media_type: Media type recorded in the index
+            chunk_size: Size of the reusable copy buffer in bytes
+
+        Returns:
+            str: Name the upload was stored under. Differs from ``name`` when a
+            different file already uses that name.
+
+        Raises:
+            QuotaExceeded: If a quota is set and the upload does not fit it
+        """
+        linked = None
+        expected_size = 0
+        if source.seekable():
+            start = source.tell()
+            digest, expected_size = hash_stream(source, chunk_size)
+            source.seek(start)
+            if self.quota is not None:
+                self.quota.check_file(expected_size)
+            with self._lock:
+                if self.blobs.exists(digest):
+                    linked = self._link(name, digest, expected_size, media_type)
+
+        if linked is None:
+            # Content already stored needs no room; new content reserves its size
+            with self.quota.reserve(expected_size) if self.quota is not None else nullcontext():
+                staging, digest, size = self.blobs.stage(source, chunk_size)
+                extra = 0
+                if self.quota is not None and size > expected_size:
+                    # The size of a non-seekable source is only known now: the rest of it
+                    # must fit the budget too, unless the content turned out to be stored
+                    try:
+                        self.quota.check_file(size)
+                        if not self.blobs.exists(digest):
+                            self.quota.acquire(size - expected_size)
+                            extra = size - expected_size
+                    except QuotaExceeded:
+                        staging.unlink()
+                        raise
+                try:
+                    with self._lock:
+                        self.blobs.commit(staging, digest)
+                        linked = self._link(name, digest, size, media_type)
+                finally:
+                    if extra:
+                        self.quota.release(extra)
+
+        name, added = linked
+        if added:
+            self._notify("added", self.index.get(name))
+        return name
+
+    def save_file(self, path, name, media_type, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Store a complete file that is already on disk inside the upload directory.
+
+        The file is moved into the blob store rather than copied (or removed
+        if the content is already stored). Space for it must already be
+        reserved with the quota, if there is one.
+
+        Args:
+            path: Finished file on the same filesystem as the store
+            name: Requested file name
+            media_type: Media type recorded in the index
+            chunk_size: Size of the reusable hashing buffer in bytes
+
+        Returns:
+            str: Name the file was stored under (see save())
+        """
+        with open(path, "rb") as f:
+            digest, size = hash_stream(f, chunk_size)
+        with self._lock:
+            self.blobs.commit(path, digest)
+            name, added = self._link(name, digest, size, media_type)
+        if added:
+            self._notify("added", self.index.get(name))
+        return name
+
+    def _link(self, name, digest, size, media_type):
+        """Point a name at a blob; caller must hold the lock.
+
+        Returns:
+            tuple: (stored name, whether a new record was added)
+        """
+        existing = self.index.get(name)
+        if existing and existing["digest"] == digest:
+            return name, False
+        if existing:
+            name = self._unique_name(name)
+
+        path = self.blobs.path_for(digest)
+        self.index.add(
+            name=name,
+            digest=digest,
+            path=path,
+            size=size,
+            mtime=time.time(),
+            media_type=media_type,
+        )
+        return name, True
+
+    def _unique_name(self, name):
+        """Return ``name`` with a " (n)" suffix that is not yet indexed."""
+        stem, suffix = Path(name).stem, Path(name).suffix
+        counter = 2
+        while True:
+            candidate = f"{stem} ({counter}){suffix}"
+            if self.index.get(candidate) is None:
+                return candidate
+            counter += 1
+
+    def touch(self, name):
+        """Record an access to a file for least-recently-used eviction.
+
+        Accesses within ACCESS_RESOLUTION seconds of the last recorded one
+        are not written, so streaming a file does not write on every request.
+        """
+        now = time.time()
+        if now - self._last_access.get(name, 0) < ACCESS_RESOLUTION:
+            return
+        self._last_access[name] = now
+        self.index.touch(name, now)
+
+    def delete(self, name):
+        """Delete a name, removing its blob only if nothing else references it.
+
+        Returns:
+            dict or None: The removed record (see UploadIndex.remove), or None
+            if no file has that name
+        """
+        with self._lock:
+            record = self.index.remove(name)
+            if record is None:
+                return None
+            if record["digest"] is None:
+                # Loose file stored under its own name
+                Path(record["path"]).unlink(missing_ok=True)
+            elif record["orphaned"]:
+                self.blobs.delete(record["digest"])
+        self._notify("deleted", record)
+        return record
+
+    def delete_many(self, names, workers=DELETE_WORKERS, notify=True):
+        """Delete several names with one index transaction.
+
+        Content that lost its last reference is unlinked concurrently by a
+        bounded thread pool, so large batches are not limited by per-file
+        filesystem latency.
+
+        Args:
+            names: File names to delete
+            workers: Maximum number of concurrent unlinks
+            notify: Tell listeners about the deleted records; callers holding
+                a lock listeners may need pass False and call notify_deleted()
+                once they have released it
+
+        Returns:
+            dict: "deleted" (removed records, as from delete()), "missing"
+            (names that were not indexed), "errors" (name to error message for
+            content that could not be unlinked) and "elapsed" (seconds)
+        """
+        started = time.perf_counter()
+        names = list(dict.fromkeys(names))
+        errors = {}
+        with self._lock:
+            records = self.index.remove_many(names)
+            # One unlink per path; names sharing a blob share its unlink
+            targets = {}
+            for record in records:
+                if record["digest"] is None:
+                    targets.setdefault(Path(record["path"]), []).append(record["name"])
+                elif record["orphaned"]:
+                    targets.setdefault(self.blobs.path_for(record["digest"]), []).append(record["name"])
+            if targets:
+                with ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets)))) as pool:
+                    outcomes = pool.map(_unlink, targets)
+                    for path, error in zip(targets, outcomes):
+                        if error is not None:
+                            errors.update((name, error) for name in targets[path])
+
+        if notify:
+            self.notify_deleted(records)
+        removed = {record["name"] for record in records}
+        return {
+            "deleted": records,
+            "missing": [name for name in names if name not in removed],
+            "errors": errors,
+            "elapsed": time.perf_counter() - started,
+        }
+
+    def notify_deleted(self, records):
+        """Tell listeners about records removed by delete_many(notify=False)."""
+        for record in records:
+            self._notify("deleted", record)
+
+    def rename(self, name, new_name):
+        """Rename a file; only metadata changes, the content is not rewritten.
+
+        Raises:
+            ValueError: If the new name is not a plain, visible file name
+            FileNotFoundError: If no file has the current name
+            FileExistsError: If the new name is already taken
+        """
+        if not new_name or Path(new_name).name != new_name or new_name.startswith("."):
+            raise ValueError(f"Invalid file name: {new_name!r}")
+        with self._lock:
+            record = self.index.get(name)
+            if record is None:
+                raise FileNotFoundError(name)
+            if self.index.get(new_name) is not None:
+                raise FileExistsError(new_name)
+            if record["digest"] is None:
+                # Loose files are named after themselves, so move them too
+                new_path = self.root / new_name
+                os.rename(record["path"], new_path)
+                self.index.rename(name, new_name, path=new_path)
+            else:
+                self.index.rename(name, new_name)
+        self._notify("renamed", self.index.get(new_name))
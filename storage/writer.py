@@ -0,0 +1,146 @@
+"""Streaming, crash-safe writes into the upload store."""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# Size of each copy chunk in bytes (override with UPLOAD_CHUNK_SIZE)
+DEFAULT_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+# Bytes written between fsync() calls; 0 only syncs once the copy is complete
+DEFAULT_FSYNC_INTERVAL = int(os.environ.get("UPLOAD_FSYNC_INTERVAL", 64 * 1024 * 1024))
+
+# Temp files are hidden so directory listings never pick up half-written uploads
+PARTIAL_PREFIX = ".upload-"
+PARTIAL_SUFFIX = ".part"
+
+
+def copy_stream(source, target, chunk_size=DEFAULT_CHUNK_SIZE, fsync_interval=DEFAULT_FSYNC_INTERVAL,
+                hasher=None):
+    """Copy a binary stream into an open file using one fixed-size buffer.
+
+    Args:
+        source: Readable binary file-like object
+        target: Writable binary file object backed by a real file descriptor
+        chunk_size: Size of the reusable copy buffer in bytes
+        fsync_interval: Bytes to write between fsync() calls (0 disables)
+        hasher: Optional hashlib object updated with every chunk written
+
+    Returns:
+        int: Number of bytes copied
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    readinto = getattr(source, "readinto", None)
+    copied = 0
+    unsynced = 0
+
+    while True:
+        if readinto is not None:
+            n = readinto(view)
+            chunk = view[:n] if n else None
+        else:
+            data = source.read(chunk_size)
+            n = len(data)
+            chunk = data
+        if not n:
+            break
+
+        _write_all(target, chunk, n)
+        if hasher is not None:
+            hasher.update(chunk)
+        copied += n
+        unsynced += n
+        if fsync_interval and unsynced >= fsync_interval:
+            target.flush()
+            os.fsync(target.fileno())
+            unsynced = 0
+
+    return copied
+
+
+def _write_all(target, chunk, n):
+    """Write all n bytes of chunk; unbuffered files may accept only part of it per call."""
+    view = memoryview(chunk)
+    written = 0
+    while written < n:
+        count = target.write(view[written:n])
+        if not count:
+            raise OSError(f"Short write: {written} of {n} bytes written")
+        written += count
+
+
+def save_stream(source, dest_path, chunk_size=DEFAULT_CHUNK_SIZE, fsync_interval=DEFAULT_FSYNC_INTERVAL,
+                hasher=None):
+    """Atomically write a binary stream to dest_path.
+
+    Data is copied in chunks into a hidden temp file next to the destination,
+    synced, and renamed into place, so readers never see a partial file and a
+    crash leaves at most a stale temp file behind.
+
+    Args:
+        source: Readable binary file-like object, read from its current position
+        dest_path: Final location of the file
+        chunk_size: Size of the reusable copy buffer in bytes
+        fsync_interval: Bytes to write between fsync() calls (0 disables)
+        hasher: Optional hashlib object updated with every chunk written
+
+    Returns:
+        int: Number of bytes written
+    """
+    dest_path = Path(dest_path)
+    fd, tmp_name = tempfile.mkstemp(
+        prefix=PARTIAL_PREFIX, suffix=PARTIAL_SUFFIX, dir=dest_path.parent
+    )
+    try:
+        with os.fdopen(fd, "wb", buffering=0) as out:
+            written = copy_stream(source, out, chunk_size, fsync_interval, hasher)
+            os.fsync(out.fileno())
+        os.replace(tmp_name, dest_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+    _fsync_directory(dest_path.parent)
+    return written
+
+
+def is_partial(path):
+    """Check whether a path is an in-progress (or abandoned) upload temp file."""
+    name = Path(path).name
+    return name.startswith(PARTIAL_PREFIX) and name.endswith(PARTIAL_SUFFIX)
+
+
+def remove_stale_partials(directory, max_age=3600):
+    """Delete temp files left behind by interrupted uploads.
+
+    Args:
+        directory: Upload directory to clean
+        max_age: Only remove temp files older than this many seconds
+
+    Returns:
+        int: Number of files removed
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in Path(directory).glob(f"{PARTIAL_PREFIX}*{PARTIAL_SUFFIX}"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _fsync_directory(directory):
+    """Persist a rename by syncing the containing directory (POSIX only)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,63 @@
+"""Tests for queueing derived-asset jobs as uploads come and go."""
+import io
+
+import pytest
+
+from processing import JobScheduler
+from storage import UploadStore
+
+
+def make_preview(record, params, progress):
+    return {}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(tmp_path)
+
+
+@pytest.fixture
+def scheduler(store):
+    scheduler = JobScheduler(store)
+    scheduler.register("preview", make_preview, applies=lambda record: record["type"] == "Image")
+    return scheduler
+
+
+def jobs(scheduler, status):
+    return scheduler._connection().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+
+def finish_all(scheduler):
+    conn = scheduler._connection()
+    with conn:
+        conn.execute("UPDATE jobs SET status = 'done' WHERE status = 'queued'")
+
+
+def test_uploads_queue_matching_jobs(store, scheduler):
+    store.save(io.BytesIO(b"picture"), "a.png", "Image")
+    store.save(io.BytesIO(b"sound"), "a.mp3", "Audio")
+    assert jobs(scheduler, "queued") == 1
+
+
+def test_done_job_is_not_queued_again(store, scheduler):
+    store.save(io.BytesIO(b"picture"), "a.png", "Image")
+    finish_all(scheduler)
+    assert scheduler.submit("preview", store.index.get("a.png")) is None
+    assert scheduler.submit("preview", store.index.get("a.png"), force=True) is not None
+
+
+def test_reuploaded_content_is_queued_again(store, scheduler):
+    store.save(io.BytesIO(b"picture"), "a.png", "Image")
+    finish_all(scheduler)
+    store.delete("a.png")
+    assert jobs(scheduler, "done") == 0
+    store.save(io.BytesIO(b"picture"), "b.png", "Image")
+    assert jobs(scheduler, "queued") == 1
+
+
+def test_content_kept_by_another_name_keeps_its_jobs(store, scheduler):
+    store.save(io.BytesIO(b"picture"), "a.png", "Image")
+    store.save(io.BytesIO(b"picture"), "copy.png", "Image")
+    finish_all(scheduler)
+    store.delete("a.png")
+    assert jobs(scheduler, "done") == 1
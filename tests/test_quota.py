@@ -0,0 +1,243 @@
+"""Tests for the upload storage quota and its eviction."""
+import io
+import threading
+import time
+
+import pytest
+
+from storage import QuotaExceeded, StorageQuota, UploadStore
+from storage.quota import HIGH_WATERMARK, LOW_WATERMARK
+
+
+class Unseekable(io.RawIOBase):
+    """Readable stream whose size is unknown until it has been read."""
+
+    def __init__(self, data):
+        self._source = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readinto(self, buffer):
+        return self._source.readinto(buffer)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = UploadStore(tmp_path)
+    yield store
+    if store.quota is not None:
+        store.quota.stop()
+
+
+def wait_for(condition, timeout=10):
+    """Poll until condition() is true, failing the test after timeout seconds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def fill(store, count, size=100):
+    """Store count files of distinct content, named f00, f01, ..."""
+    for i in range(count):
+        store.save(io.BytesIO(bytes([i]) * size), f"f{i:02d}", "Video")
+    return [f"f{i:02d}" for i in range(count)]
+
+
+def test_acquire_and_release_track_reservations(store):
+    quota = StorageQuota(store, max_bytes=1000)
+    quota.acquire(300)
+    quota.acquire(200)
+    assert quota.stats()["reserved_bytes"] == 500
+    quota.release(300)
+    assert quota.stats()["reserved_bytes"] == 200
+
+
+def test_acquire_rejects_what_does_not_fit(store):
+    quota = StorageQuota(store, max_bytes=1000)
+    quota.acquire(800)
+    with pytest.raises(QuotaExceeded):
+        quota.acquire(300, timeout=0)
+    assert quota.stats()["reserved_bytes"] == 800
+    assert quota.rejected_uploads == 1
+
+
+def test_acquire_counts_stored_bytes(store):
+    fill(store, 9)
+    quota = StorageQuota(store, max_bytes=1000)
+    quota.acquire(100)
+    with pytest.raises(QuotaExceeded):
+        quota.acquire(1, timeout=0)
+
+
+def test_reserve_releases_on_error(store):
+    quota = StorageQuota(store, max_bytes=1000)
+    with pytest.raises(RuntimeError):
+        with quota.reserve(600):
+            assert quota.stats()["reserved_bytes"] == 600
+            raise RuntimeError
+    assert quota.stats()["reserved_bytes"] == 0
+
+
+def test_per_file_limit(store):
+    quota = StorageQuota(store, max_file_bytes=100)
+    quota.acquire(100)
+    with pytest.raises(QuotaExceeded):
+        quota.acquire(101)
+
+
+def test_unlimited_quota_reserves_nothing(store):
+    quota = StorageQuota(store)
+    with quota.reserve(10 ** 12):
+        assert quota.stats()["reserved_bytes"] == 0
+
+
+def test_evict_shrinks_to_low_watermark(store):
+    fill(store, 10)
+    store.quota = StorageQuota(store, max_bytes=1000)
+    result = store.quota.evict()
+    assert store.quota.used_bytes <= 1000 * LOW_WATERMARK
+    assert result["freed_bytes"] == 200
+    assert store.index.count() == 8
+
+
+def test_evictor_starts_above_high_watermark(store):
+    fill(store, 10)
+    store.quota = StorageQuota(store, max_bytes=int(1000 / HIGH_WATERMARK) - 10)
+    store.quota.start()
+    wait_for(lambda: store.quota.eviction_runs)
+    store.quota.stop()
+    assert store.quota.used_bytes <= store.quota.max_bytes * LOW_WATERMARK
+    assert store.quota.eviction_runs >= 1
+
+
+def test_evictor_leaves_store_below_high_watermark(store):
+    fill(store, 9)
+    store.quota = StorageQuota(store, max_bytes=1000).start()
+    store.quota.stop()
+    assert store.quota.eviction_runs == 0
+    assert store.index.count() == 9
+
+
+def test_lru_evicts_least_recently_accessed_first(store):
+    names = fill(store, 5)
+    for when, name in enumerate(["f03", "f01", "f04", "f00", "f02"]):
+        store.index.touch(name, 1000 + when)
+    quota = StorageQuota(store, max_bytes=500, policy="lru")
+    records, _ = quota.plan(300)
+    assert [record["name"] for record in records] == ["f03", "f01", "f04"]
+    assert set(names) == {record["name"] for record in store.index.query()}
+
+
+def test_age_evicts_oldest_upload_first(store):
+    fill(store, 5)
+    for when, name in enumerate(["f03", "f01", "f04", "f00", "f02"]):
+        store.index.touch(name, 1000 + when)
+    quota = StorageQuota(store, max_bytes=500, policy="age")
+    records, _ = quota.plan(300)
+    assert [record["name"] for record in records] == ["f00", "f01", "f02"]
+
+
+def test_pinned_files_are_never_evicted(store):
+    fill(store, 10)
+    store.index.set_pinned("f00", True)
+    store.quota = StorageQuota(store, max_bytes=1000, policy="age")
+    result = store.quota.evict(target_bytes=0)
+    assert "f00" not in result["files"]
+    assert [record["name"] for record in store.index.query()] == ["f00"]
+
+
+def test_shared_content_is_freed_once_every_name_goes(store):
+    store.save(io.BytesIO(b"a" * 100), "first", "Video")
+    store.save(io.BytesIO(b"b" * 100), "other", "Video")
+    store.save(io.BytesIO(b"a" * 100), "second", "Video")
+    quota = StorageQuota(store, max_bytes=1000, policy="age")
+    records, freed = quota.plan(100)
+    assert [record["name"] for record in records] == ["first", "other"]
+    assert freed == 100
+
+
+def test_dry_run_evicts_nothing(store):
+    fill(store, 10)
+    store.quota = StorageQuota(store, max_bytes=1000)
+    result = store.quota.evict(target_bytes=0, dry_run=True)
+    assert len(result["files"]) == 10
+    assert store.index.count() == 10
+
+
+def test_acquire_waits_for_eviction(store):
+    fill(store, 9)
+    store.quota = StorageQuota(store, max_bytes=1000).start()
+    store.quota.acquire(400, timeout=10)
+    assert store.quota.used_bytes + 400 <= 1000
+    store.quota.release(400)
+
+
+def test_unseekable_upload_counts_against_the_budget(store, tmp_path):
+    fill(store, 9)
+    store.quota = StorageQuota(store, max_bytes=1000)
+    with pytest.raises(QuotaExceeded):
+        store.save(Unseekable(b"x" * 200), "late", "Video")
+    assert store.index.get("late") is None
+    assert store.quota.stats()["reserved_bytes"] == 0
+    assert not [path for path in tmp_path.rglob("*") if path.name.endswith(".part")]
+
+
+def test_unseekable_upload_that_fits_is_stored(store):
+    store.quota = StorageQuota(store, max_bytes=1000)
+    assert store.save(Unseekable(b"x" * 200), "fits", "Video") == "fits"
+    assert store.quota.used_bytes == 200
+    assert store.quota.stats()["reserved_bytes"] == 0
+
+
+def test_concurrent_reservations_never_overshoot(store):
+    quota = StorageQuota(store, max_bytes=1000)
+    granted = []
+
+    def take():
+        try:
+            quota.acquire(300, timeout=0)
+            granted.append(300)
+        except QuotaExceeded:
+            pass
+
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(granted) == 900
+
+
+def test_upload_that_cannot_fit_does_not_empty_the_store(store):
+    names = fill(store, 9)
+    for name in names[:5]:
+        store.index.set_pinned(name, True)
+    store.quota = StorageQuota(store, max_bytes=1000).start()
+    with pytest.raises(QuotaExceeded):
+        store.quota.acquire(800, timeout=0.5)
+    store.quota.stop()
+    # Only the watermark eviction ran; the unpinned files were not all thrown away for nothing
+    assert store.index.count() == 8
+    assert store.quota.evict(dry_run=True)["files"] == []
+
+
+def test_listeners_run_outside_the_quota_lock(store):
+    fill(store, 10)
+    store.quota = StorageQuota(store, max_bytes=1000)
+    blocked = []
+
+    def listener(event, record):
+        # A listener that needs the quota from another thread must not deadlock
+        reader = threading.Thread(target=store.quota.stats)
+        reader.start()
+        reader.join(timeout=2)
+        blocked.append(reader.is_alive())
+
+    store.subscribe(listener)
+    store.quota.evict()
+    assert blocked == [False, False]
@@ -0,0 +1,82 @@
+"""Tests for resumable uploads and their quota reservations."""
+import io
+
+import pytest
+
+from storage import ResumableUploads, StorageQuota, UploadStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = UploadStore(tmp_path)
+    store.quota = StorageQuota(store, max_bytes=1000)
+    return store
+
+
+@pytest.fixture
+def uploads(store):
+    return ResumableUploads(store, lambda suffix: "Video")
+
+
+def test_complete_upload_releases_its_reservation(store, uploads):
+    upload = uploads.get(uploads.create("owner", "clip.mp4", 100)["id"])
+    assert store.quota.stats()["reserved_bytes"] == 100
+    status = uploads.write(upload, 0, io.BytesIO(b"x" * 100), 100)
+    assert status["complete"]
+    assert store.index.get("clip.mp4")["size"] == 100
+    assert store.quota.stats()["reserved_bytes"] == 0
+
+
+def test_abort_releases_its_reservation_once(store, uploads):
+    upload = uploads.get(uploads.create("owner", "clip.mp4", 100)["id"])
+    assert uploads.abort(upload)
+    assert uploads.abort(upload)
+    assert uploads.get(upload.state["id"]) is None
+    assert store.quota.stats()["reserved_bytes"] == 0
+
+
+def test_abort_while_finalizing_is_refused(store, uploads):
+    upload = uploads.get(uploads.create("owner", "clip.mp4", 100)["id"])
+    aborted = []
+    save_file = store.save_file
+
+    def save_file_aborting(*args, **kwargs):
+        # A DELETE arriving while the finished file is hashed and committed
+        aborted.append(uploads.abort(upload))
+        return save_file(*args, **kwargs)
+
+    store.save_file = save_file_aborting
+    status = uploads.write(upload, 0, io.BytesIO(b"x" * 100), 100)
+    assert aborted == [False]
+    assert status["complete"]
+    assert store.index.get("clip.mp4")["size"] == 100
+    assert store.quota.stats()["reserved_bytes"] == 0
+
+
+def test_write_while_finalizing_is_refused(store, uploads):
+    upload = uploads.get(uploads.create("owner", "clip.mp4", 100)["id"])
+    refused = []
+    save_file = store.save_file
+
+    def save_file_with_late_chunk(*args, **kwargs):
+        # A retried chunk arriving while the finished file is hashed and committed
+        with pytest.raises(ValueError):
+            uploads.write(upload, 0, io.BytesIO(b"y" * 50), 50)
+        refused.append(True)
+        return save_file(*args, **kwargs)
+
+    store.save_file = save_file_with_late_chunk
+    uploads.write(upload, 0, io.BytesIO(b"x" * 100), 100)
+    assert refused == [True]
+    with open(store.index.get("clip.mp4")["path"], "rb") as f:
+        assert f.read() == b"x" * 100
+
+
+def test_write_after_abort_is_refused(store, uploads):
+    upload = uploads.get(uploads.create("owner", "clip.mp4", 100)["id"])
+    uploads.write(upload, 0, io.BytesIO(b"x" * 50), 50)
+    uploads.abort(upload)
+    with pytest.raises(ValueError):
+        uploads.write(upload, 50, io.BytesIO(b"x" * 50), 50)
+    assert not list(uploads.root.iterdir())
+    assert store.quota.stats()["reserved_bytes"] == 0
@@ -0,0 +1,88 @@
+"""Tests for the media server's byte ranges and conditional requests."""
+import http.client
+import io
+
+import pytest
+
+from storage import UploadStore
+from storage.server import MediaServer, make_etag, media_path, parse_range
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=1000-", (1000, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=-100", (924, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("bytes=1024-", ()),
+    ("bytes=200-100", ()),
+    ("bytes=-0", ()),
+    ("bytes=-", None),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(DATA)) == expected
+
+
+def test_parse_range_of_empty_file():
+    assert parse_range("bytes=0-", 0) == ()
+    assert parse_range("bytes=-10", 0) == ()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = UploadStore(tmp_path)
+    store.save(io.BytesIO(DATA), "clip.mp4", "Video")
+    return store
+
+
+@pytest.fixture
+def server(store):
+    server = MediaServer(store, "127.0.0.1", port=0).start()
+    yield server
+    server.stop()
+
+
+def get(server, path, **headers):
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+    try:
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        return response, response.read()
+    finally:
+        conn.close()
+
+
+def test_suffix_range_returns_the_tail(server):
+    response, body = get(server, media_path("clip.mp4"), Range="bytes=-100")
+    assert response.status == 206
+    assert response.getheader("Content-Range") == f"bytes 924-1023/{len(DATA)}"
+    assert body == DATA[-100:]
+
+
+def test_unsatisfiable_range_returns_416(server):
+    response, body = get(server, media_path("clip.mp4"), Range=f"bytes={len(DATA)}-")
+    assert response.status == 416
+    assert response.getheader("Content-Range") == f"bytes */{len(DATA)}"
+    assert response.getheader("Access-Control-Allow-Origin") == "*"
+    assert body == b""
+
+
+def test_matching_etag_returns_304(store, server):
+    response, _ = get(server, media_path("clip.mp4"))
+    etag = response.getheader("ETag")
+    assert etag == make_etag(store.index.get("clip.mp4"))
+
+    response, body = get(server, media_path("clip.mp4"), **{"If-None-Match": f'W/"other", {etag}'})
+    assert response.status == 304
+    assert response.getheader("ETag") == etag
+    assert body == b""
+
+
+def test_stale_etag_returns_the_file(server):
+    response, body = get(server, media_path("clip.mp4"), **{"If-None-Match": '"stale"'})
+    assert response.status == 200
+    assert body == DATA
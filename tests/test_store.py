@@ -0,0 +1,75 @@
+"""Tests for the upload store's content deduplication."""
+import io
+from pathlib import Path
+
+import pytest
+
+from storage import UploadStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(tmp_path)
+
+
+def save(store, data, name):
+    return store.index.get(store.save(io.BytesIO(data), name, "Video"))
+
+
+def test_same_content_is_stored_once(store):
+    first = save(store, b"a" * 100, "first.mp4")
+    second = save(store, b"a" * 100, "second.mp4")
+    assert first["digest"] == second["digest"]
+    assert first["path"] == second["path"]
+    assert store.index.refcount(first["digest"]) == 2
+    assert store.index.stored_bytes() == 100
+
+
+def test_deleting_one_name_keeps_shared_content(store):
+    first = save(store, b"a" * 100, "first.mp4")
+    save(store, b"a" * 100, "second.mp4")
+    deleted = store.delete("first.mp4")
+    assert not deleted["orphaned"]
+    assert store.index.get("first.mp4") is None
+    assert Path(store.index.get("second.mp4")["path"]).read_bytes() == b"a" * 100
+    assert store.index.refcount(first["digest"]) == 1
+
+    assert store.delete("second.mp4")["orphaned"]
+    assert not store.blobs.exists(first["digest"])
+    assert store.delete("second.mp4") is None
+
+
+def test_delete_many_removes_content_with_its_last_name(store):
+    shared = save(store, b"a" * 100, "first.mp4")
+    save(store, b"a" * 100, "second.mp4")
+    other = save(store, b"b" * 100, "other.mp4")
+
+    outcome = store.delete_many(["first.mp4", "other.mp4", "missing.mp4"])
+    assert {record["name"] for record in outcome["deleted"]} == {"first.mp4", "other.mp4"}
+    assert outcome["missing"] == ["missing.mp4"]
+    assert outcome["errors"] == {}
+    assert store.blobs.exists(shared["digest"])
+    assert not store.blobs.exists(other["digest"])
+
+    store.delete_many(["second.mp4"])
+    assert not store.blobs.exists(shared["digest"])
+    assert store.index.stored_bytes() == 0
+
+
+def test_delete_many_tells_listeners(store):
+    save(store, b"a" * 100, "first.mp4")
+    save(store, b"a" * 100, "second.mp4")
+    events = []
+    store.subscribe(lambda event, record: events.append((event, record["name"])))
+    store.delete_many(["first.mp4", "second.mp4"])
+    assert sorted(events) == [("deleted", "first.mp4"), ("deleted", "second.mp4")]
+
+
+def test_delete_many_can_defer_listeners(store):
+    save(store, b"a" * 100, "first.mp4")
+    events = []
+    store.subscribe(lambda event, record: events.append(record["name"]))
+    outcome = store.delete_many(["first.mp4"], notify=False)
+    assert events == []
+    store.notify_deleted(outcome["deleted"])
+    assert events == ["first.mp4"]
@@ -0,0 +1,29 @@
+"""Tests for running ffmpeg and following its progress."""
+import sys
+
+import pytest
+
+from processing.transcode import run_ffmpeg
+
+# Stands in for ffmpeg: reports progress on stdout while flooding stderr
+# with far more than a pipe buffer holds, as ffmpeg does on corrupt input
+FAKE_FFMPEG = """
+import sys
+for second in range(1, 11):
+    sys.stderr.write("[h264] error while decoding MB %d\\n" % second * 2000)
+    print("out_time=00:00:%02d.000000" % second, flush=True)
+sys.stderr.write("Conversion failed!\\n")
+sys.exit(int(sys.argv[1]))
+"""
+
+
+def test_progress_is_reported_despite_heavy_error_output():
+    reported = []
+    run_ffmpeg([sys.executable, "-c", FAKE_FFMPEG, "0"], 10, lambda value, message: reported.append(value))
+    assert reported[0] == pytest.approx(0.1)
+    assert reported[-1] == 0.99
+
+
+def test_failure_reports_the_last_error_line():
+    with pytest.raises(RuntimeError, match="Conversion failed!"):
+        run_ffmpeg([sys.executable, "-c", FAKE_FFMPEG, "1"], 10, lambda value, message: None)